@@ -1,20 +1,42 @@
 import os
+import sys
 import json
+import hmac
+import time
+import gc
+import difflib
+import threading
+import unicodedata
+from datetime import datetime, timedelta
 # import glob # 不再需要 glob
 import pandas as pd
 # import math # pandas 处理 NaN
 import requests
-from io import BytesIO
-from flask import Flask, jsonify, request, send_file, Response
+from flask import Flask, jsonify, request, Response, abort, make_response
 from flask_cors import CORS
-from urllib.parse import urlparse, parse_qs, unquote
+
+import snapshot_store
+import image_proxy
 
 # --- 配置 --- #
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, '..', 'data')
+# 主 Excel 的历史版本由数据收集脚本写入 (scripts/snapshot_history.py)，后端只读取
+HISTORY_DIR = os.path.join(DATA_DIR, 'history')
+SCRIPTS_DIR = os.path.join(BASE_DIR, '..', 'scripts')
+if SCRIPTS_DIR not in sys.path:
+    sys.path.append(SCRIPTS_DIR)
+import snapshot_history
 # JSON_FILE_PATH = os.path.join(DATA_DIR, 'all_games.json') # 不再使用
 EXCEL_FILE_PATH = os.path.join(DATA_DIR, 'all_games_data.xlsx') # 改为 Excel 文件路径
 
+# 热重载配置：轮询间隔与防抖时间 (秒)，以及重载接口的访问令牌 (未设置时接口禁用)
+WATCH_INTERVAL_SECONDS = float(os.environ.get('GAME_MONITOR_WATCH_INTERVAL', '5'))
+WATCH_DEBOUNCE_SECONDS = float(os.environ.get('GAME_MONITOR_WATCH_DEBOUNCE', '3'))
+RELOAD_TOKEN = os.environ.get('GAME_MONITOR_RELOAD_TOKEN', '')
+# 生产多进程模式下的共享快照目录 (由 serve.py 设置)，为空时使用进程内快照
+SHARED_SNAPSHOT_DIR = os.environ.get('GAME_MONITOR_SNAPSHOT_DIR', '')
+
 # 创建 Flask 应用实例
 app = Flask(__name__)
 
@@ -22,6 +44,87 @@ app = Flask(__name__)
 CORS(app)
 
 # --- 数据加载函数 (修改后) --- #
+def _game_from_row(index, row):
+    """把一行 Excel 数据 (表头 -> 单元格取值，pandas 行或字典) 转换为 API 记录字典"""
+    # --- 基本信息 --- #
+    name = row.get('名称')
+    date = str(row.get('日期'))[:10] if pd.notna(row.get('日期')) else None # 确保日期为 YYYY-MM-DD
+    status = row.get('状态')
+    platform = row.get('平台')
+    category = row.get('分类')
+    publisher = row.get('厂商')
+    source = row.get('来源')
+    link = row.get('链接')
+    icon_url = row.get('图标')
+    description = row.get('简介')
+
+    # --- 评分处理 (尝试转为 float) --- #
+    score_raw = row.get('评分')
+    score = None
+    if pd.notna(score_raw):
+        try:
+            score = float(score_raw)
+        except (ValueError, TypeError):
+            print(f"警告: 无法将评分 '{score_raw}' (行 {index + 2}) 转换为浮点数。将设置为 None。")
+            score = None # 转换失败则设为 None
+
+    # --- 是否重点处理 (布尔值) --- #
+    is_featured_raw = row.get('是否重点')
+    # 检查是否非空、非 NaN，并且不是明确的否定词（如果需要的话）
+    is_featured = pd.notna(is_featured_raw) and str(is_featured_raw).strip().lower() in ['true', '是', 'yes', '1']
+
+    # --- 版号相关信息 --- #
+    license_checked_raw = row.get('版号已查') # 读取原始值
+    license_checked = pd.notna(license_checked_raw) and str(license_checked_raw).strip().lower() in ['true', '是', 'yes', '1'] # 转换布尔值
+    license_name = row.get('版号名称')
+    approval_number = row.get('批准文号')
+    publication_number = row.get('出版物号')
+    approval_date = str(row.get('批准日期'))[:10] if pd.notna(row.get('批准日期')) else None # 确保日期格式
+    publishing_unit = row.get('出版单位')
+    operating_unit = row.get('运营单位')
+    license_game_type = row.get('版号游戏类型')
+    application_category = row.get('申报类别')
+    license_multiple_results = row.get('版号多结果')
+
+    # --- 其他信息 (修改) --- #
+    manual_checked_raw = row.get('是否人工校对') # 读取原始值
+    # 保留原始状态字符串，用于过滤"错误"
+    manual_check_status = str(manual_checked_raw).strip() if pd.notna(manual_checked_raw) else ''
+    # 布尔值，表示是否明确标记为 '是/True/1/Yes'
+    manual_checked_bool = manual_check_status.lower() in ['是', 'true', '1', 'yes']
+
+    game_data = {
+        'id': index, # 使用行索引作为临时 ID
+        # 基础信息
+        'name': name,
+        'date': date,
+        'status': status,
+        'platform': platform,
+        'category': category,
+        'score': score, # 评分
+        'publisher': publisher,
+        'source': source,
+        'is_featured': is_featured, # 是否重点
+        'link': link,
+        'icon_url': icon_url,
+        'description': description,
+        # 版号信息
+        'license_checked': license_checked,
+        'license_name': license_name,
+        'approval_number': approval_number,
+        'publication_number': publication_number,
+        'approval_date': approval_date,
+        'publishing_unit': publishing_unit,
+        'operating_unit': operating_unit,
+        'license_game_type': license_game_type,
+        'application_category': application_category,
+        'license_multiple_results': license_multiple_results,
+        # 其他
+        'manual_checked': manual_checked_bool, # 布尔值，表示是否校对过 (是)
+        'manual_check_status': manual_check_status # 原始字符串，用于过滤 '错误'
+    }
+    return game_data
+
 def load_game_data():
     """加载游戏数据，从 data/all_games_data.xlsx 文件读取，并包含所有指定列"""
     all_games = []
@@ -41,84 +144,7 @@ def load_game_data():
 
         # 将 DataFrame 转换为字典列表，并进行键名映射和处理
         for index, row in df.iterrows():
-            # --- 基本信息 --- #
-            name = row.get('名称')
-            date = str(row.get('日期'))[:10] if pd.notna(row.get('日期')) else None # 确保日期为 YYYY-MM-DD
-            status = row.get('状态')
-            platform = row.get('平台')
-            category = row.get('分类')
-            publisher = row.get('厂商')
-            source = row.get('来源')
-            link = row.get('链接')
-            icon_url = row.get('图标')
-            description = row.get('简介')
-
-            # --- 评分处理 (尝试转为 float) --- #
-            score_raw = row.get('评分')
-            score = None
-            if pd.notna(score_raw):
-                try:
-                    score = float(score_raw)
-                except (ValueError, TypeError):
-                    print(f"警告: 无法将评分 '{score_raw}' (行 {index + 2}) 转换为浮点数。将设置为 None。")
-                    score = None # 转换失败则设为 None
-
-            # --- 是否重点处理 (布尔值) --- #
-            is_featured_raw = row.get('是否重点')
-            # 检查是否非空、非 NaN，并且不是明确的否定词（如果需要的话）
-            is_featured = pd.notna(is_featured_raw) and str(is_featured_raw).strip().lower() in ['true', '是', 'yes', '1']
-
-            # --- 版号相关信息 --- #
-            license_checked_raw = row.get('版号已查') # 读取原始值
-            license_checked = pd.notna(license_checked_raw) and str(license_checked_raw).strip().lower() in ['true', '是', 'yes', '1'] # 转换布尔值
-            license_name = row.get('版号名称')
-            approval_number = row.get('批准文号')
-            publication_number = row.get('出版物号')
-            approval_date = str(row.get('批准日期'))[:10] if pd.notna(row.get('批准日期')) else None # 确保日期格式
-            publishing_unit = row.get('出版单位')
-            operating_unit = row.get('运营单位')
-            license_game_type = row.get('版号游戏类型')
-            application_category = row.get('申报类别')
-            license_multiple_results = row.get('版号多结果')
-
-            # --- 其他信息 (修改) --- #
-            manual_checked_raw = row.get('是否人工校对') # 读取原始值
-            # 保留原始状态字符串，用于过滤"错误"
-            manual_check_status = str(manual_checked_raw).strip() if pd.notna(manual_checked_raw) else ''
-            # 布尔值，表示是否明确标记为 '是/True/1/Yes'
-            manual_checked_bool = manual_check_status.lower() in ['是', 'true', '1', 'yes']
-
-            game_data = {
-                'id': index, # 使用行索引作为临时 ID
-                # 基础信息
-                'name': name,
-                'date': date,
-                'status': status,
-                'platform': platform,
-                'category': category,
-                'score': score, # 评分
-                'publisher': publisher,
-                'source': source,
-                'is_featured': is_featured, # 是否重点
-                'link': link,
-                'icon_url': icon_url,
-                'description': description,
-                # 版号信息
-                'license_checked': license_checked,
-                'license_name': license_name,
-                'approval_number': approval_number,
-                'publication_number': publication_number,
-                'approval_date': approval_date,
-                'publishing_unit': publishing_unit,
-                'operating_unit': operating_unit,
-                'license_game_type': license_game_type,
-                'application_category': application_category,
-                'license_multiple_results': license_multiple_results,
-                # 其他
-                'manual_checked': manual_checked_bool, # 布尔值，表示是否校对过 (是)
-                'manual_check_status': manual_check_status # 原始字符串，用于过滤 '错误'
-            }
-            all_games.append(game_data)
+            all_games.append(snapshot_store.GameRecord(_game_from_row(index, row))) # 紧凑的 __slots__ 记录
 
     except FileNotFoundError:
         print(f"错误：找不到 Excel 文件 {EXCEL_FILE_PATH}")
@@ -133,6 +159,302 @@ def load_game_data():
     print(f"总共从 Excel 文件加载了 {len(all_games)} 条游戏数据，包含扩展列。")
     return all_games
 
+# --- 数据快照与名称索引 --- #
+# 快照由后台线程构建后整体替换 (单次引用赋值)，请求之间共享同一份只读数据
+_snapshot = None
+_snapshot_lock = threading.Lock() # 串行化快照构建
+_watcher_thread = None
+
+# 首屏数据缓存：(数据版本, 日期, 每页条数) -> 已序列化的 JSON 响应体
+BOOTSTRAP_CACHE_SIZE = 32
+_bootstrap_cache = {}
+_bootstrap_lock = threading.Lock()
+
+def normalize_name_key(name):
+    """生成名称索引使用的键：Unicode 规范化、合并空白、忽略大小写"""
+    if name is None:
+        return ''
+    normalized = unicodedata.normalize('NFKC', str(name))
+    return ' '.join(normalized.split()).lower()
+
+def _get_data_version():
+    """以 Excel 文件的修改时间和大小作为数据版本号，文件不存在时返回 None"""
+    try:
+        stat = os.stat(EXCEL_FILE_PATH)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+TWM_FILTER_VALUE = 'TENCENT,NETEASE,MIHOYO' # 前端 "腾网米" 选项对应的特殊厂商过滤值
+TWM_PUBLISHERS = ['腾讯', 'tencent', '网易', 'netease', '米哈游', 'mihoyo']
+
+class GameSnapshot:
+    """内存数据快照：有效记录 (排除 '错误') 及 cleaned_name -> 记录位置 索引
+
+    记录位置 (position) 是记录在 valid_games 中的下标；路由只通过
+    filter_positions / get_records / lookup_name 等方法访问数据，
+    以便与生产环境的内存映射快照 (snapshot_store.ArrowGameSnapshot) 共用同一套路由代码。
+    """
+
+    def __init__(self, version, games):
+        self.version = version
+        self.total_count = len(games)
+        self.valid_games = [game for game in games if str(game.get('manual_check_status', '')).lower() != '错误']
+        self.name_index = {}
+        for position, game in enumerate(self.valid_games):
+            key = normalize_name_key(game.get('name'))
+            if key:
+                self.name_index.setdefault(key, []).append(position)
+        self._name_keys = list(self.name_index) # 模糊匹配时使用，构建一次
+
+    def __len__(self):
+        return len(self.valid_games)
+
+    def filter_positions(self, filters):
+        """按 /api/games 的过滤参数返回符合条件的记录位置 (保持原始顺序)"""
+        games = self.valid_games
+        positions = range(len(games))
+
+        # 按是否重点关注过滤
+        if filters.get('featured'):
+            positions = [i for i in positions if games[i].get('is_featured', False)]
+
+        # 按状态、来源、平台过滤 (忽略大小写的包含匹配)
+        for field in ['status', 'source', 'platform']:
+            value = filters.get(field)
+            if value:
+                value_lower = value.lower()
+                positions = [
+                    i for i in positions
+                    if games[i].get(field) and value_lower in str(games[i].get(field, '')).lower()
+                ]
+
+        # 按厂商过滤 (任一目标厂商名称包含匹配即可，TWM 特殊值已在路由中展开)
+        target_publishers = filters.get('publishers')
+        if target_publishers:
+            positions = [
+                i for i in positions
+                if games[i].get('publisher') and any(p.lower() in str(games[i].get('publisher', '')).lower() for p in target_publishers)
+            ]
+
+        # 搜索功能
+        search = filters.get('search')
+        if search:
+            search_lower = search.lower()
+            positions = [
+                i for i in positions
+                if (search_lower in str(games[i].get('name', '')).lower() or
+                    search_lower in str(games[i].get('category', '')).lower() or
+                    search_lower in str(games[i].get('publisher', '')).lower() or
+                    search_lower in str(games[i].get('platform', '')).lower())
+            ]
+
+        # 按日期范围过滤 (简单起见只比较 YYYY-MM-DD 字符串)
+        start_date = filters.get('start_date')
+        if start_date:
+            positions = [i for i in positions if games[i].get('date') and str(games[i].get('date')) >= start_date]
+        end_date = filters.get('end_date')
+        if end_date:
+            positions = [i for i in positions if games[i].get('date') and str(games[i].get('date')) <= end_date]
+
+        return list(positions)
+
+    def get_records(self, positions):
+        """按位置取出记录并转换为字典"""
+        return [self.valid_games[i].to_dict() for i in positions]
+
+    def name_keys(self):
+        """所有名称索引键 (调用方不应修改)"""
+        return self._name_keys
+
+    def column_values(self, field):
+        """返回所有有效记录中某个字段的值 (按记录顺序)"""
+        return [game.get(field) for game in self.valid_games]
+
+    def lookup_name(self, key):
+        """返回名称索引键对应的记录位置列表，不存在时返回 None"""
+        return self.name_index.get(key)
+
+    def featured_group_records(self):
+        """返回所有 "至少有一条重点记录" 的游戏的全部有效记录"""
+        featured_names = {game.get('name') for game in self.valid_games if game.get('is_featured', False)}
+        return [game for game in self.valid_games if game.get('name') and game.get('name') in featured_names]
+
+def build_snapshot():
+    """加载数据并构建快照；设置了共享快照目录 (生产多进程模式) 时发布内存映射快照文件"""
+    version = _get_data_version()
+    games = load_game_data()
+    snapshot = GameSnapshot(version, games)
+    if SHARED_SNAPSHOT_DIR:
+        # 写出列式快照文件后改用内存映射版本，释放本进程中的记录副本
+        snapshot = snapshot_store.publish_snapshot(SHARED_SNAPSHOT_DIR, snapshot)
+    print(f"数据快照已构建 (版本 {version})：{len(snapshot)} 条有效记录。")
+    return snapshot
+
+def get_snapshot():
+    """返回当前数据快照；仅在尚未构建任何快照时同步构建"""
+    if SHARED_SNAPSHOT_DIR:
+        # 多进程模式：各 worker 从 CURRENT 指针打开同一份内存映射快照文件
+        shared = snapshot_store.get_shared_snapshot(SHARED_SNAPSHOT_DIR)
+        if shared is not None:
+            return shared
+    current = _snapshot
+    if current is not None:
+        return current
+    with _snapshot_lock:
+        if _snapshot is None:
+            _swap_snapshot(build_snapshot())
+            if not SHARED_SNAPSHOT_DIR:
+                # 启动时只做一次：先回收构建期间的临时垃圾，再把首个快照的记录 (长期存活、无循环引用)
+                # 移出分代回收范围，避免每次完整回收都遍历全部记录。热重载不再冻结，旧快照和请求垃圾照常回收。
+                gc.collect()
+                gc.freeze()
+        return _snapshot
+
+def _swap_snapshot(new_snapshot):
+    """原子替换当前快照，进行中的请求继续使用它们已取得的旧快照"""
+    global _snapshot
+    if SHARED_SNAPSHOT_DIR:
+        # 多进程模式：切换 CURRENT 指针，所有 worker 在下一个请求时改用新版本
+        snapshot_store.activate_snapshot(SHARED_SNAPSHOT_DIR, new_snapshot)
+    _snapshot = new_snapshot
+
+def reload_snapshot(reason=''):
+    """重新构建快照并替换；加载期间文件再次变化或加载结果异常时保留旧快照
+
+    返回 True 表示已替换为新快照。
+    """
+    with _snapshot_lock:
+        version_before = _get_data_version()
+        started = time.time()
+        new_snapshot = build_snapshot()
+        version_after = _get_data_version()
+        if version_before != version_after:
+            print(f"快照重建期间数据文件发生变化 ({reason})，保留旧快照，等待下次重载。")
+            return False
+        current = _snapshot
+        if current is not None and current.total_count and not new_snapshot.total_count:
+            print(f"重建后的快照为空 ({reason})，可能文件正在写入或读取失败，保留旧快照。")
+            return False
+        _swap_snapshot(new_snapshot)
+        print(f"快照已热重载 ({reason})，耗时 {time.time() - started:.2f} 秒，版本 {new_snapshot.version}。")
+        return True
+
+# --- 历史版本 (as_of 参数) --- #
+# 带 as_of 参数的请求按需读取对应的历史版本。生产多进程模式下历史版本与当前快照一样
+# 写为共享目录中的 Arrow 文件 (snapshot_store.open_history_snapshot)，各 worker 只映射文件；
+# 开发服务器在本进程中构建快照。最近使用的若干个版本缓存在本进程中。
+HISTORY_CACHE_SIZE = 4
+_history_cache = {} # 版本号 -> 快照，按最近使用顺序排列
+_history_lock = threading.Lock()
+_history = snapshot_history.SnapshotHistory(HISTORY_DIR) # 缓存各版本的创建时间，按日期解析 as_of 时不再逐个读取清单
+
+def load_history_snapshot(version):
+    """读取历史版本中的所有行并构建快照 (字段处理与 load_game_data 相同)"""
+    manifest = _history.load_manifest(version)
+    header = manifest['header']
+    games = []
+    for index, row in enumerate(_history.iter_rows(version, manifest)):
+        # 空字符串单元格按 Excel 中的空单元格处理，与 pandas 读取主 Excel 的结果一致
+        cells = {name: (None if value == '' else value) for name, value in zip(header, row)}
+        games.append(snapshot_store.GameRecord(_game_from_row(index, cells)))
+    return GameSnapshot(f"history-{version}", games)
+
+def get_history_snapshot(version):
+    """返回历史版本的快照，首次访问时加载 (历史版本不可变，缓存无需失效)"""
+    with _history_lock:
+        snapshot = _history_cache.pop(version, None)
+        if snapshot is None:
+            started = time.time()
+            if SHARED_SNAPSHOT_DIR:
+                snapshot = snapshot_store.open_history_snapshot(SHARED_SNAPSHOT_DIR, version, load_history_snapshot)
+            else:
+                snapshot = load_history_snapshot(version)
+            print(f"已加载历史版本 {version}：{len(snapshot)} 条有效记录，耗时 {time.time() - started:.2f} 秒。")
+        _history_cache[version] = snapshot
+        while len(_history_cache) > HISTORY_CACHE_SIZE:
+            _history_cache.pop(next(iter(_history_cache)))
+    return snapshot
+
+def _json_error(message, status):
+    return make_response(jsonify({'error': message}), status)
+
+def request_snapshot():
+    """返回本次请求使用的快照：默认为当前快照，带 as_of 参数 (版本号、日期或 ISO 时间) 时为对应的历史版本"""
+    as_of = request.args.get('as_of')
+    if not as_of:
+        return get_snapshot()
+    try:
+        version = _history.resolve(as_of)
+    except ValueError as e:
+        abort(_json_error(str(e), 400))
+    if version is None:
+        abort(_json_error(f"没有与 as_of={as_of} 对应的历史版本", 404))
+    try:
+        return get_history_snapshot(version)
+    except (OSError, ValueError) as e:
+        print(f"读取历史版本 {version} 失败: {e}")
+        abort(_json_error(f"读取历史版本 {version} 失败", 500))
+
+def _watch_data_file():
+    """轮询 Excel 文件版本，变化并稳定超过防抖时间后在本线程中重建快照"""
+    pending_version = None
+    pending_since = None
+    while True:
+        time.sleep(WATCH_INTERVAL_SECONDS)
+        try:
+            current = get_snapshot() if SHARED_SNAPSHOT_DIR else _snapshot
+            version = _get_data_version()
+            if version is None or (current is not None and version == current.version):
+                pending_version = None
+                continue
+            if version != pending_version:
+                # 检测到新变化，开始 (或重新开始) 防抖计时
+                pending_version = version
+                pending_since = time.monotonic()
+                continue
+            if time.monotonic() - pending_since >= WATCH_DEBOUNCE_SECONDS:
+                reload_snapshot(reason='数据文件变化')
+                pending_version = None
+        except Exception as e:
+            print(f"数据文件监听线程出错: {e}")
+
+def start_data_watcher():
+    """预热快照并启动后台数据文件监听线程 (重复调用无副作用)"""
+    global _watcher_thread
+    get_snapshot()
+    if _watcher_thread is not None and _watcher_thread.is_alive():
+        return
+    _watcher_thread = threading.Thread(target=_watch_data_file, name='data-watcher', daemon=True)
+    _watcher_thread.start()
+    print(f"已启动数据文件监听 (间隔 {WATCH_INTERVAL_SECONDS}s, 防抖 {WATCH_DEBOUNCE_SECONDS}s)。")
+
+def find_name_in_index(snapshot, name, max_candidates=5):
+    """在名称索引中查找游戏名称，精确匹配失败时回退到模糊匹配
+
+    返回 (匹配到的索引键, 匹配类型, 候选键列表)，未找到时索引键为 None。
+    """
+    key = normalize_name_key(name)
+    if not key:
+        return None, None, []
+    if snapshot.lookup_name(key) is not None:
+        return key, 'exact', []
+
+    all_keys = snapshot.name_keys()
+    # 1. 包含关系 (例如查询 "原神" 命中 "原神 国际服")，按长度差排序取最接近的
+    contained = [k for k in all_keys if key in k or k in key]
+    contained.sort(key=lambda k: (abs(len(k) - len(key)), k))
+    # 2. 相似度匹配
+    similar = difflib.get_close_matches(key, all_keys, n=max_candidates, cutoff=0.6)
+
+    candidates = []
+    for k in contained + similar:
+        if k not in candidates:
+            candidates.append(k)
+    if not candidates:
+        return None, None, []
+    return candidates[0], 'fuzzy', candidates[1:max_candidates]
+
 # --- 路由定义 --- #
 
 # 根路由 (用于测试)
@@ -144,103 +466,47 @@ def home():
 @app.route('/api/games')
 def get_games():
     """返回游戏数据的 JSON 响应，支持过滤和分页"""
-    game_data = load_game_data()
-    # --- 新增：在这里过滤掉 manual_check_status 为 '错误' 的记录 ---
-    game_data_filtered = [game for game in game_data if str(game.get('manual_check_status', '')).lower() != '错误']
-    # --- 后续处理使用 game_data_filtered ---
+    # 快照中只包含已过滤掉 manual_check_status 为 '错误' 的有效记录
+    snapshot = request_snapshot()
 
-    if not game_data_filtered:
+    if not len(snapshot):
          return jsonify({'games': [], 'pagination': {'total_items': 0, 'total_pages': 1, 'current_page': 1, 'per_page': 15}})
 
     # 获取请求参数
-    is_featured_query = request.args.get('featured', '').lower() in ['true', '1', 'yes']
-    status = request.args.get('status', None)
-    search = request.args.get('search', None)
-    source = request.args.get('source', None)
+    filters = {
+        'featured': request.args.get('featured', '').lower() in ['true', '1', 'yes'],
+        'status': request.args.get('status', None),
+        'search': request.args.get('search', None),
+        'source': request.args.get('source', None),
+        'publishers': None, # 厂商过滤目标列表，见下方
+        'platform': request.args.get('platform', None),
+        'start_date': request.args.get('start_date', None),
+        'end_date': request.args.get('end_date', None),
+    }
+    # 新增：按厂商过滤 (处理特殊值 TWM)
     publisher_filter = request.args.get('publisher', None) # 新增厂商过滤参数
-    platform_filter = request.args.get('platform', None)
+    if publisher_filter:
+        if publisher_filter == TWM_FILTER_VALUE: # 特殊值处理
+            filters['publishers'] = TWM_PUBLISHERS
+            print(f"Filtering for TWM publishers: {TWM_PUBLISHERS}")
+        else:
+            # 普通厂商名称过滤
+            filters['publishers'] = [publisher_filter.lower()]
+            print(f"Filtering for publisher: {publisher_filter}")
     page = request.args.get('page', default=1, type=int)
     # 修改：根据是否有日期过滤调整默认 per_page 值
     default_per_page = 15
-    start_date_str = request.args.get('start_date', None)
-    end_date_str = request.args.get('end_date', None)
-    if start_date_str or end_date_str:
+    if filters['start_date'] or filters['end_date']:
         default_per_page = 100 # 如果有日期过滤，默认获取更多条目
 
     per_page = request.args.get('per_page', default=default_per_page, type=int)
 
-    # 根据参数过滤数据
-    filtered_data = game_data_filtered
-
-    # 按是否重点关注过滤
-    if is_featured_query:
-        filtered_data = [game for game in filtered_data if game.get('is_featured', False)]
-
-    # 按状态过滤
-    if status:
-        filtered_data = [
-            game for game in filtered_data
-            if game.get('status') and status.lower() in str(game.get('status', '')).lower()
-        ]
-
-    # 按来源过滤
-    if source:
-        filtered_data = [
-            game for game in filtered_data
-            if game.get('source') and source.lower() in str(game.get('source', '')).lower()
-        ]
-
-    # 新增：按厂商过滤 (处理特殊值 TWM)
-    if publisher_filter:
-        target_publishers = []
-        if publisher_filter == 'TENCENT,NETEASE,MIHOYO': # 特殊值处理
-            target_publishers = ['腾讯', 'tencent', '网易', 'netease', '米哈游', 'mihoyo']
-            print(f"Filtering for TWM publishers: {target_publishers}")
-            filtered_data = [
-                game for game in filtered_data
-                if game.get('publisher') and any(p.lower() in str(game.get('publisher', '')).lower() for p in target_publishers)
-            ]
-        else:
-            # 普通厂商名称过滤
-            target_publishers = [publisher_filter.lower()]
-            print(f"Filtering for publisher: {publisher_filter}")
-            filtered_data = [
-                game for game in filtered_data
-                if game.get('publisher') and publisher_filter.lower() in str(game.get('publisher', '')).lower()
-            ]
-
-    # 按平台过滤
-    if platform_filter:
-        filtered_data = [
-            game for game in filtered_data
-            if game.get('platform') and platform_filter.lower() in str(game.get('platform', '')).lower()
-        ]
-
-    # 搜索功能
-    if search:
-        search_lower = search.lower()
-        filtered_data = [
-            game for game in filtered_data
-            if (search_lower in str(game.get('name', '')).lower() or
-                search_lower in str(game.get('category', '')).lower() or
-                search_lower in str(game.get('publisher', '')).lower() or
-                search_lower in str(game.get('platform', '')).lower())
-        ]
-
-    # 新增：按日期范围过滤 (确保日期格式兼容比较)
-    if start_date_str:
-        try:
-            # 尝试解析日期，简单起见只比较字符串
-            filtered_data = [game for game in filtered_data if game.get('date') and str(game.get('date')) >= start_date_str]
-        except Exception as e:
-            print(f"处理 start_date 过滤时出错: {e}") # 记录潜在错误
+    return jsonify(paginate_games(snapshot, filters, page, per_page))
 
-    if end_date_str:
-        try:
-            # 尝试解析日期，简单起见只比较字符串
-            filtered_data = [game for game in filtered_data if game.get('date') and str(game.get('date')) <= end_date_str]
-        except Exception as e:
-            print(f"处理 end_date 过滤时出错: {e}") # 记录潜在错误
+def paginate_games(snapshot, filters, page, per_page):
+    """按过滤条件和分页参数从快照中取出一页数据，返回 /api/games 的响应结构"""
+    # 根据参数过滤数据 (得到记录位置，只有当前页的记录会被取出)
+    filtered_positions = snapshot.filter_positions(filters)
 
     # 排序 (可选，例如按日期降序)
     # try:
@@ -250,7 +516,7 @@ def get_games():
     #     print(f"排序时出错: {sort_e}")
 
     # 统计总条目数和页数
-    total_items = len(filtered_data)
+    total_items = len(filtered_positions)
     total_pages = max(1, (total_items + per_page - 1) // per_page)
 
     # 计算分页
@@ -259,7 +525,7 @@ def get_games():
     end_idx = min(start_idx + per_page, total_items)
 
     # 获取当前页的数据
-    paged_data = filtered_data[start_idx:end_idx]
+    paged_data = snapshot.get_records(filtered_positions[start_idx:end_idx])
 
     # 构建响应
     response = {
@@ -271,26 +537,24 @@ def get_games():
             'per_page': per_page
         }
     }
-
-    return jsonify(response)
+    return response
 
 # 重点游戏 API 路由 (重构逻辑)
 @app.route('/api/featured-games')
 def get_featured_games():
     """返回重点关注的游戏数据，合并同名游戏的历史记录，并排除错误条目"""
-    all_games = load_game_data()
-    if not all_games:
-        return jsonify([])
+    return jsonify(build_featured_groups(request_snapshot()))
 
-    # --- 新增：在这里过滤掉 manual_check_status 为 '错误' 的记录 ---
-    all_games_valid = [game for game in all_games if str(game.get('manual_check_status', '')).lower() != '错误']
-    # --- 后续处理使用 all_games_valid ---
+def build_featured_groups(snapshot):
+    """合并同名游戏的历史记录，生成重点关注游戏组列表"""
+    # 快照中只包含有效记录；这里只取出含重点记录的游戏组，避免遍历全部数据
+    featured_candidates = snapshot.featured_group_records()
 
-    if not all_games_valid: return jsonify([]) # 如果过滤后为空
+    if not featured_candidates: return [] # 没有重点游戏
 
     # 1. 按游戏名称分组 (使用过滤后的数据)
     games_by_name = {}
-    for game in all_games_valid: # 使用 all_games_valid
+    for game in featured_candidates:
         name = game.get('name')
         if name:
             if name not in games_by_name:
@@ -346,9 +610,156 @@ def get_featured_games():
     )
 
     print(f"重构后返回 {len(featured_groups)} 个重点关注游戏组 (已过滤错误条目)。")
-    return jsonify(featured_groups)
+    return featured_groups
+
+# 首屏数据 API 路由：一次返回过滤器选项、重点游戏、今日、本周和第一页列表
+@app.route('/api/bootstrap')
+def get_bootstrap():
+    """返回首屏所需的全部数据 (按数据版本和日期缓存已序列化的响应)"""
+    date_str = request.args.get('date') or datetime.now().strftime('%Y-%m-%d')
+    try:
+        day = datetime.strptime(date_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': '日期格式应为 YYYY-MM-DD'}), 400
+    per_page = max(1, request.args.get('per_page', default=15, type=int))
+
+    snapshot = request_snapshot()
+    if request.args.get('as_of'):
+        # 历史版本的首屏数据不缓存，避免挤掉当前版本的缓存条目
+        return Response(app.json.dumps(build_bootstrap_payload(snapshot, day, per_page)), mimetype='application/json')
+    cache_key = (snapshot.version, day.isoformat(), per_page)
+    body = _bootstrap_cache.get(cache_key)
+    if body is None:
+        started = time.time()
+        body = app.json.dumps(build_bootstrap_payload(snapshot, day, per_page))
+        with _bootstrap_lock:
+            # 只保留当前数据版本的条目，旧版本的缓存随快照切换一起丢弃
+            for key in [k for k in _bootstrap_cache if k[0] != snapshot.version]:
+                del _bootstrap_cache[key]
+            if len(_bootstrap_cache) >= BOOTSTRAP_CACHE_SIZE:
+                _bootstrap_cache.pop(next(iter(_bootstrap_cache)))
+            _bootstrap_cache[cache_key] = body
+        print(f"已生成首屏数据 (版本 {snapshot.version}, 日期 {day.isoformat()})，耗时 {time.time() - started:.3f} 秒。")
+    return Response(body, mimetype='application/json')
+
+def build_bootstrap_payload(snapshot, day, per_page):
+    """基于同一个快照组装首屏数据，各部分与对应的独立接口返回一致"""
+    monday = day - timedelta(days=day.weekday())
+    sunday = monday + timedelta(days=6)
+    day_str = day.isoformat()
+
+    facets = {}
+    for facet, field in [('statuses', 'status'), ('sources', 'source'), ('publishers', 'publisher')]:
+        values = {str(v).strip() for v in snapshot.column_values(field) if v and str(v).strip()}
+        facets[facet] = sorted(values)
+
+    # 与前端按日期请求 /api/games 时一致：有日期过滤时默认每页 100 条
+    date_per_page = 100
+    return {
+        'version': snapshot.version,
+        'date': day_str,
+        'week': {'start': monday.isoformat(), 'end': sunday.isoformat()},
+        'facets': facets,
+        'featured': build_featured_groups(snapshot) if len(snapshot) else [],
+        'today': paginate_games(snapshot, {'start_date': day_str, 'end_date': day_str}, 1, date_per_page),
+        'this_week': paginate_games(snapshot, {'start_date': monday.isoformat(), 'end_date': sunday.isoformat()}, 1, date_per_page),
+        'games': paginate_games(snapshot, {}, 1, per_page),
+    }
 
-# --- 图片代理路由 (修改后，处理嵌套 URL) --- #
+# 数据重载 API 路由 (需令牌)
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_data():
+    """在后台重建数据快照；传入 wait=1 时同步等待重建完成"""
+    if not RELOAD_TOKEN:
+        return jsonify({'error': 'Reload endpoint disabled (GAME_MONITOR_RELOAD_TOKEN not set)'}), 403
+    token = request.headers.get('X-Reload-Token', '')
+    if not hmac.compare_digest(token.encode('utf-8'), RELOAD_TOKEN.encode('utf-8')):
+        return jsonify({'error': 'Invalid reload token'}), 401
+
+    if request.args.get('wait', '').lower() in ['true', '1', 'yes']:
+        reloaded = reload_snapshot(reason='重载接口')
+        return jsonify({'reloaded': reloaded, 'version': get_snapshot().version})
+
+    threading.Thread(target=reload_snapshot, kwargs={'reason': '重载接口'}, daemon=True).start()
+    return jsonify({'reloaded': None, 'version': get_snapshot().version}), 202
+
+# 历史版本列表 API 路由
+@app.route('/api/history')
+def get_history_versions():
+    """返回可用作 as_of 参数的历史版本 (新版本在前)"""
+    manifests = _history.manifests()
+    return jsonify([
+        {'version': manifest['version'], 'created_at': manifest['created_at'], 'record_count': manifest['record_count']}
+        for manifest in reversed(manifests)
+    ])
+
+# 单个游戏时间线 API 路由
+@app.route('/api/games/timeline')
+def get_game_timeline():
+    """返回指定游戏 (按清理后名称) 的全部里程碑、版号信息及来源，名称未精确命中时模糊匹配"""
+    name = request.args.get('name', '').strip()
+    if not name:
+        return jsonify({'error': 'Missing name parameter'}), 400
+
+    snapshot = request_snapshot()
+    matched_key, match_type, other_candidates = find_name_in_index(snapshot, name)
+    if matched_key is None:
+        return jsonify({'error': f"未找到游戏 '{name}'", 'query': name, 'candidates': []}), 404
+
+    records = snapshot.get_records(snapshot.lookup_name(matched_key))
+    records.sort(key=lambda g: str(g.get('date') or '0000-00-00'), reverse=True)
+
+    milestones = []
+    for record in records:
+        milestones.append({
+            'id': record.get('id'),
+            'date': record.get('date'),
+            'status': record.get('status'),
+            'source': record.get('source'),
+            'platform': record.get('platform'),
+            'link': record.get('link'),
+            'is_featured': record.get('is_featured', False),
+        })
+
+    # 版号信息：按批准文号去重，保留最新记录中的版本
+    licenses = []
+    seen_approval_numbers = set()
+    for record in records:
+        approval_number = record.get('approval_number')
+        if not approval_number or approval_number in seen_approval_numbers:
+            continue
+        seen_approval_numbers.add(approval_number)
+        licenses.append({
+            'license_name': record.get('license_name'),
+            'approval_number': approval_number,
+            'publication_number': record.get('publication_number'),
+            'approval_date': record.get('approval_date'),
+            'publishing_unit': record.get('publishing_unit'),
+            'operating_unit': record.get('operating_unit'),
+            'license_game_type': record.get('license_game_type'),
+            'application_category': record.get('application_category'),
+            'license_multiple_results': record.get('license_multiple_results'),
+        })
+
+    primary_record = records[0]
+    response = {
+        'query': name,
+        'name': primary_record.get('name'),
+        'match_type': match_type,
+        'candidates': [snapshot.get_records(snapshot.lookup_name(k)[:1])[0].get('name') for k in other_candidates],
+        'icon_url': primary_record.get('icon_url'),
+        'publisher': primary_record.get('publisher'),
+        'category': primary_record.get('category'),
+        'sources': sorted({str(r.get('source')) for r in records if r.get('source')}),
+        'license_checked': any(r.get('license_checked', False) for r in records),
+        'licenses': licenses,
+        'milestones': milestones,
+    }
+    return jsonify(response)
+
+# --- 图片代理路由 (同步回退版本) --- #
+# 前端默认使用 image_proxy.py 提供的异步代理；本路由在未安装 aiohttp 时仍可使用，
+# 嵌套 URL 解析和 Referer 规则与异步代理共用同一套函数。
 @app.route('/api/image')
 def proxy_image():
     """代理获取外部图片 URL，尝试处理嵌套的代理 URL"""
@@ -358,82 +769,24 @@ def proxy_image():
 
     print(f"收到代理请求 URL: {image_url_initial}") # Log initial URL
 
-    image_url = image_url_initial # Start with the initial URL
-
-    # --- 尝试解析嵌套 URL ---
-    try:
-        # 检查是否是已知的嵌套代理格式 (例如 img.16p.com)
-        parsed_initial = urlparse(image_url_initial)
-        if parsed_initial.netloc == 'img.16p.com' and parsed_initial.path.startswith('/img_proxy'):
-            print("检测到 img.16p.com 嵌套代理 URL...")
-            query_params = parse_qs(parsed_initial.query)
-            nested_url_list = query_params.get('url') # parse_qs returns a list
-            if nested_url_list and nested_url_list[0]:
-                # 提取并解码嵌套的 URL
-                extracted_url = unquote(nested_url_list[0])
-                print(f"  提取到的嵌套 URL: {extracted_url}")
-                # 验证提取的 URL 是否看起来像一个有效的 HTTP/HTTPS URL
-                if extracted_url.lower().startswith(('http://', 'https://')):
-                    image_url = extracted_url # 使用提取到的 URL 进行后续操作
-                else:
-                    print(f"  警告: 提取到的嵌套 URL '{extracted_url}' 格式无效，将继续使用原始 URL。")
-            else:
-                print("  警告: 未能在 img.16p.com 代理 URL 中找到有效的嵌套 'url' 参数。")
-
-        # 在这里可以添加对其他已知代理格式的检查 (elif ...)
-
-    except Exception as e:
-        print(f"解析嵌套 URL 时出错: {e}，将继续使用原始 URL: {image_url_initial}")
-        # 出错时，回退到使用原始 URL
-
-    # --- 后续处理使用最终确定的 image_url ---
+    image_url = image_proxy.resolve_image_url(image_url_initial)
     print(f"最终处理的图片 URL: {image_url}")
 
-    # 如果最终 URL 仍然是嵌套代理格式（例如解析失败或非已知格式），后续请求可能会失败
-    # 但我们还是尝试请求
+    if image_url.startswith('//'):
+        image_url = 'https:' + image_url
     if not image_url or not image_url.lower().startswith(('http://', 'https://')):
          print(f"错误: 最终图片 URL 无效: {image_url}")
          return "Invalid final image URL", 400
 
-
     try:
-        # 根据图片URL的域名选择适当的Referer
-        referer = 'https://www.google.com/' # 通用 Referer
-        # 对最终确定的 image_url 判断来源
-        if 'taptap.cn' in image_url or 'tapimg.com' in image_url:
-            referer = 'https://www.taptap.cn/'
-        elif 'biligame.com' in image_url or 'hdslb.com' in image_url:
-             referer = 'https://www.biligame.com/'
-        elif '71acg.net' in image_url: # 为新发现的域名添加 Referer (可选，可能不需要)
-             referer = 'https://www.71acg.net/' # 或者一个更通用的 Referer
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.159 Safari/537.36',
-            'Referer': referer,
-            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-            'Cache-Control': 'no-cache',
-            'Connection': 'keep-alive'
-        }
-
-        if image_url.startswith('//'):
-            image_url = 'https:' + image_url
-
-        response = requests.get(image_url, headers=headers, stream=True, timeout=15)
+        response = requests.get(image_url, headers=image_proxy.build_upstream_headers(image_url), stream=True, timeout=image_proxy.UPSTREAM_TIMEOUT_SECONDS)
         response.raise_for_status()
 
-        content_type = response.headers.get('Content-Type', 'image/jpeg')
+        content_type = image_proxy.guess_content_type(image_url, response.headers.get('Content-Type'))
 
-        if not content_type.startswith('image/'):
-             if image_url.lower().endswith('.png'): content_type = 'image/png'
-             elif image_url.lower().endswith(('.jpg', '.jpeg')): content_type = 'image/jpeg'
-             elif image_url.lower().endswith('.gif'): content_type = 'image/gif'
-             elif image_url.lower().endswith('.webp'): content_type = 'image/webp'
-             else: content_type = 'image/jpeg'
-
-        image_data = BytesIO(response.content)
-
-        resp = send_file(image_data, mimetype=content_type)
+        # 逐块转发上游响应，不在内存中缓存整张图片
+        resp = Response(response.iter_content(chunk_size=image_proxy.STREAM_CHUNK_SIZE), mimetype=content_type)
+        resp.call_on_close(response.close)
         resp.headers['Cache-Control'] = 'public, max-age=86400'
         resp.headers['Access-Control-Allow-Origin'] = '*'
         return resp
@@ -443,8 +796,7 @@ def proxy_image():
         return "Image request timed out", 408
     except requests.exceptions.RequestException as e:
         print(f"代理请求失败 ({type(e).__name__}): {e} for URL: {image_url}")
-        transparent_pixel = b'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7'
-        resp = Response(transparent_pixel, mimetype='image/gif')
+        resp = Response(image_proxy.TRANSPARENT_PIXEL, mimetype='image/gif')
         resp.headers['Access-Control-Allow-Origin'] = '*'
         return resp, 404
 
@@ -460,6 +812,12 @@ if __name__ == '__main__':
         print(f"警告：未找到数据文件 {EXCEL_FILE_PATH}。API 将返回空数据。请确保文件存在于 data 目录中。")
         print("如果需要安装 openpyxl 库，请运行: pip install openpyxl")
 
+    # debug 模式下 werkzeug 的重载器会再启动一个子进程，只在实际服务请求的子进程中预热和监听
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_data_watcher()
+        # 图片请求由独立事件循环处理，不占用 Flask 的请求线程
+        image_proxy.start_in_background()
+
     print("启动 Flask 开发服务器...")
     # host='0.0.0.0' 允许从网络中的其他设备访问
     app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
@@ -0,0 +1,214 @@
+# backend/image_proxy.py
+# 异步图片代理服务 (aiohttp)
+#
+# 图片代理请求上游 CDN 最长需要 15 秒，放在 Flask 线程里会占住 worker，
+# 慢 CDN 会拖垮 JSON API。这里用单独的 asyncio 事件循环处理图片请求：
+#   - 上游请求全部是非阻塞的，可同时挂起数千个请求
+#   - 按上游域名限制并发，避免单个 CDN 被打满或封禁
+#   - 边读边写，直接把上游响应流式转发给浏览器，不在内存中缓存整张图片
+#
+# 嵌套 URL 解析、Referer 规则和 Content-Type 推断在本模块中实现，
+# app.py 中保留的同步 /api/image 路由也复用这些函数，两者行为一致。
+#
+# 用法:
+#   python image_proxy.py --port 5001
+# 开发服务器 (app.py) 和生产入口 (serve.py) 启动时会自动带起本服务。
+
+import os
+import base64
+import asyncio
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs, unquote
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:
+    aiohttp = None # 未安装时 app.py 仍可使用同步的 /api/image 路由
+
+IMAGE_PROXY_HOST = os.environ.get('GAME_MONITOR_IMAGE_PROXY_HOST', '0.0.0.0')
+IMAGE_PROXY_PORT = int(os.environ.get('GAME_MONITOR_IMAGE_PROXY_PORT', '5001'))
+UPSTREAM_TIMEOUT_SECONDS = 15
+MAX_CONNECTIONS = int(os.environ.get('GAME_MONITOR_IMAGE_MAX_CONNECTIONS', '2048')) # 全局上游连接上限
+PER_HOST_CONCURRENCY = int(os.environ.get('GAME_MONITOR_IMAGE_PER_HOST', '16')) # 每个上游域名的并发上限
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# 1x1 透明 GIF，上游请求失败时返回，避免前端显示破图
+TRANSPARENT_PIXEL = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+UPSTREAM_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.159 Safari/537.36',
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive'
+}
+
+def resolve_image_url(image_url_initial):
+    """处理已知的嵌套代理 URL (例如 img.16p.com/img_proxy?url=...)，返回实际要请求的图片 URL"""
+    image_url = image_url_initial
+    try:
+        # 检查是否是已知的嵌套代理格式 (例如 img.16p.com)
+        parsed_initial = urlparse(image_url_initial)
+        if parsed_initial.netloc == 'img.16p.com' and parsed_initial.path.startswith('/img_proxy'):
+            print("检测到 img.16p.com 嵌套代理 URL...")
+            query_params = parse_qs(parsed_initial.query)
+            nested_url_list = query_params.get('url') # parse_qs returns a list
+            if nested_url_list and nested_url_list[0]:
+                # 提取并解码嵌套的 URL
+                extracted_url = unquote(nested_url_list[0])
+                print(f"  提取到的嵌套 URL: {extracted_url}")
+                # 验证提取的 URL 是否看起来像一个有效的 HTTP/HTTPS URL
+                if extracted_url.lower().startswith(('http://', 'https://')):
+                    image_url = extracted_url # 使用提取到的 URL 进行后续操作
+                else:
+                    print(f"  警告: 提取到的嵌套 URL '{extracted_url}' 格式无效，将继续使用原始 URL。")
+            else:
+                print("  警告: 未能在 img.16p.com 代理 URL 中找到有效的嵌套 'url' 参数。")
+
+        # 在这里可以添加对其他已知代理格式的检查 (elif ...)
+
+    except Exception as e:
+        print(f"解析嵌套 URL 时出错: {e}，将继续使用原始 URL: {image_url_initial}")
+        # 出错时，回退到使用原始 URL
+    return image_url
+
+def choose_referer(image_url):
+    """根据图片URL的域名选择适当的Referer"""
+    if 'taptap.cn' in image_url or 'tapimg.com' in image_url:
+        return 'https://www.taptap.cn/'
+    if 'biligame.com' in image_url or 'hdslb.com' in image_url:
+        return 'https://www.biligame.com/'
+    if '71acg.net' in image_url: # 为新发现的域名添加 Referer (可选，可能不需要)
+        return 'https://www.71acg.net/'
+    return 'https://www.google.com/' # 通用 Referer
+
+def build_upstream_headers(image_url):
+    headers = dict(UPSTREAM_HEADERS)
+    headers['Referer'] = choose_referer(image_url)
+    return headers
+
+def guess_content_type(image_url, content_type):
+    """上游未返回图片类型时，按扩展名推断"""
+    content_type = content_type or 'image/jpeg'
+    if content_type.startswith('image/'):
+        return content_type
+    lower_url = image_url.lower()
+    if lower_url.endswith('.png'): return 'image/png'
+    if lower_url.endswith(('.jpg', '.jpeg')): return 'image/jpeg'
+    if lower_url.endswith('.gif'): return 'image/gif'
+    if lower_url.endswith('.webp'): return 'image/webp'
+    return 'image/jpeg'
+
+# --- aiohttp 服务 --- #
+
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*'}
+
+def _host_semaphore(app, image_url):
+    """每个上游域名一个信号量 (事件循环单线程，无需加锁)"""
+    host = urlparse(image_url).netloc.lower()
+    semaphore = app['host_semaphores'].get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(PER_HOST_CONCURRENCY)
+        app['host_semaphores'][host] = semaphore
+    return semaphore
+
+async def handle_image(request):
+    """代理获取外部图片 URL，逐块转发上游响应"""
+    image_url_initial = request.query.get('url')
+    if not image_url_initial:
+        return web.Response(text="Missing image URL", status=400, headers=CORS_HEADERS)
+
+    image_url = resolve_image_url(image_url_initial)
+    if image_url.startswith('//'):
+        image_url = 'https:' + image_url
+    if not image_url or not image_url.lower().startswith(('http://', 'https://')):
+        print(f"错误: 最终图片 URL 无效: {image_url}")
+        return web.Response(text="Invalid final image URL", status=400, headers=CORS_HEADERS)
+
+    session = request.app['client_session']
+    response = None
+    try:
+        async with _host_semaphore(request.app, image_url):
+            async with session.get(image_url, headers=build_upstream_headers(image_url)) as upstream:
+                upstream.raise_for_status()
+                response = web.StreamResponse(status=200, headers={
+                    'Content-Type': guess_content_type(image_url, upstream.headers.get('Content-Type')),
+                    'Cache-Control': 'public, max-age=86400',
+                    **CORS_HEADERS,
+                })
+                if upstream.content_length is not None:
+                    response.content_length = upstream.content_length
+                await response.prepare(request)
+                async for chunk in upstream.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    await response.write(chunk)
+                await response.write_eof()
+                return response
+    except asyncio.TimeoutError:
+        print(f"代理请求超时: {image_url}")
+        if response is not None and response.prepared:
+            return response # 已开始转发，只能中断连接
+        return web.Response(text="Image request timed out", status=408, headers=CORS_HEADERS)
+    except aiohttp.ClientError as e:
+        print(f"代理请求失败 ({type(e).__name__}): {e} for URL: {image_url}")
+        if response is not None and response.prepared:
+            return response
+        return web.Response(body=TRANSPARENT_PIXEL, status=404, content_type='image/gif', headers=CORS_HEADERS)
+    except (ConnectionResetError, asyncio.CancelledError):
+        # 浏览器提前断开 (例如快速滚动时取消了图片加载)，上游连接随上下文一起释放
+        raise
+    except Exception as e:
+        print(f"处理代理请求时发生未知错误: {e}")
+        if response is not None and response.prepared:
+            return response
+        return web.Response(text="Internal server error: " + str(e), status=500, headers=CORS_HEADERS)
+
+async def _open_client_session(app):
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=PER_HOST_CONCURRENCY, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT_SECONDS)
+    app['client_session'] = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    app['host_semaphores'] = {}
+    yield
+    await app['client_session'].close()
+
+def create_app():
+    if aiohttp is None:
+        raise ImportError("异步图片代理需要安装 'aiohttp' 库。请运行 pip install aiohttp")
+    app = web.Application()
+    app.cleanup_ctx.append(_open_client_session)
+    # 与 Flask 后端的路径保持一致，前端只需切换端口
+    app.router.add_get('/api/image', handle_image)
+    return app
+
+def run_server(host=IMAGE_PROXY_HOST, port=IMAGE_PROXY_PORT):
+    """在当前线程中运行图片代理 (阻塞)"""
+    print(f"异步图片代理已启动: http://{host}:{port}/api/image (每域名并发 {PER_HOST_CONCURRENCY})")
+    web.run_app(create_app(), host=host, port=port, print=None, handle_signals=threading.current_thread() is threading.main_thread())
+
+def start_in_background(host=IMAGE_PROXY_HOST, port=IMAGE_PROXY_PORT):
+    """在后台守护线程中运行图片代理 (自带独立事件循环)，供开发服务器使用"""
+    if aiohttp is None:
+        print("警告：未安装 'aiohttp'，异步图片代理未启动，图片将无法显示。请运行 pip install aiohttp")
+        return None
+
+    def _run():
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        try:
+            run_server(host, port)
+        except OSError as e:
+            print(f"异步图片代理启动失败 (端口 {port}): {e}")
+
+    thread = threading.Thread(target=_run, name='image-proxy', daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='异步图片代理服务')
+    parser.add_argument('--host', default=IMAGE_PROXY_HOST, help='监听地址')
+    parser.add_argument('--port', type=int, default=IMAGE_PROXY_PORT, help='监听端口')
+    args = parser.parse_args()
+    if aiohttp is None:
+        print("错误：异步图片代理需要安装 'aiohttp' 库。请运行 pip install aiohttp")
+        raise SystemExit(1)
+    run_server(args.host, args.port)
@@ -0,0 +1,75 @@
+# backend/serve.py
+# 生产环境入口：gunicorn 多 worker 进程 + 共享的只读内存映射快照
+#
+# 主进程在启动 worker 之前把 Excel 数据发布为 Arrow IPC 快照文件，
+# 并在主进程中运行数据文件监听线程；数据变化时发布新版本并切换 CURRENT 指针。
+# worker 进程只映射快照文件，不解析 Excel，也不各自保存一份数据副本。
+#
+# 用法 (Linux/macOS):
+#   python serve.py --workers 4 --port 5000
+
+import os
+import sys
+import atexit
+import argparse
+import subprocess
+import multiprocessing
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SNAPSHOT_DIR = os.path.join(BASE_DIR, '..', 'data', 'snapshots')
+
+def main():
+    parser = argparse.ArgumentParser(description='游戏监控后端生产服务 (多进程 + 共享快照)')
+    parser.add_argument('--host', default='0.0.0.0', help='监听地址')
+    parser.add_argument('--port', type=int, default=5000, help='监听端口')
+    parser.add_argument('--workers', type=int, default=max(2, multiprocessing.cpu_count()), help='worker 进程数')
+    parser.add_argument('--threads', type=int, default=4, help='每个 worker 的线程数')
+    parser.add_argument('--snapshot-dir', default=os.environ.get('GAME_MONITOR_SNAPSHOT_DIR', DEFAULT_SNAPSHOT_DIR),
+                        help='共享快照文件目录')
+    parser.add_argument('--image-port', type=int, default=int(os.environ.get('GAME_MONITOR_IMAGE_PROXY_PORT', '5001')),
+                        help='异步图片代理端口 (0 表示不启动)')
+    args = parser.parse_args()
+
+    # 必须在导入 app 之前设置，app 据此切换到共享快照模式
+    os.environ['GAME_MONITOR_SNAPSHOT_DIR'] = os.path.abspath(args.snapshot_dir)
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("错误：生产模式需要安装 'gunicorn' (仅支持 Linux/macOS)。请运行 pip install gunicorn")
+        print("Windows 下请使用开发服务器: python app.py")
+        sys.exit(1)
+
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    import app as backend_app
+
+    # 在 fork worker 之前发布并激活初始快照，worker 启动后即可直接映射
+    print("正在发布初始共享快照...")
+    backend_app.get_snapshot()
+
+    # 图片代理在独立进程中运行自己的事件循环，慢 CDN 不会占用 API worker
+    if args.image_port:
+        image_proxy_process = subprocess.Popen(
+            [sys.executable, os.path.join(BASE_DIR, 'image_proxy.py'), '--host', args.host, '--port', str(args.image_port)]
+        )
+        atexit.register(image_proxy_process.terminate)
+
+    class GameMonitorApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f'{args.host}:{args.port}')
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('timeout', 60)
+            # worker 启动完成后才在主进程中启动数据文件监听
+            self.cfg.set('when_ready', lambda server: backend_app.start_data_watcher())
+
+        def load(self):
+            return backend_app.app
+
+    print(f"启动生产服务: {args.host}:{args.port}, {args.workers} 个 worker, 快照目录 {args.snapshot_dir}")
+    GameMonitorApplication().run()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+# backend/snapshot_store.py
+# 生产多进程模式使用的共享只读快照：列式 Arrow IPC 文件 + 内存映射
+#
+# 目录结构:
+#   <snapshot_dir>/snapshot-<版本>.arrow   每个数据版本一个不可变文件 (未压缩，可零拷贝映射)
+#   <snapshot_dir>/CURRENT                 当前生效的快照文件名 (原子替换)
+#   <snapshot_dir>/history/snapshot-history-<版本号>.arrow
+#                                          as_of 参数请求的历史版本，首次请求时由某个 worker 写出，之后各 worker 直接映射
+#
+# 所有 worker 进程映射同一个文件，数据页由操作系统页缓存共享，
+# 每增加一个 worker 几乎不增加内存。每个请求开始时检查 CURRENT，
+# 因此所有 worker 会一致地切换到新版本。
+#
+# 开发服务器的进程内快照所用的紧凑记录类型 GameRecord 也定义在这里，与快照列共用同一份字段表；
+# 槽位、驻留和 to_dict 的实现与流水线的记录共用 (scripts/game_record.py)。
+
+import os
+import sys
+import math
+import threading
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None # 仅生产多进程模式需要 pyarrow，开发服务器不依赖它
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+if SCRIPTS_DIR not in sys.path:
+    sys.path.append(SCRIPTS_DIR)
+from game_record import record_type
+
+CURRENT_POINTER = 'CURRENT'
+SNAPSHOT_PREFIX = 'snapshot-'
+SNAPSHOT_SUFFIX = '.arrow'
+KEEP_VERSIONS = 3 # 保留的历史快照文件数量 (仍被旧请求映射的文件不会立即失效)
+HISTORY_SUBDIR = 'history'
+KEEP_HISTORY_VERSIONS = 8 # 保留的 as_of 历史版本快照文件数量
+BATCH_ROWS = 65536
+
+NAME_KEY_COLUMN = 'name_key' # 名称索引列，仅内部查询使用，不返回给前端
+
+# 与 app.load_game_data 返回的记录字段一一对应
+SNAPSHOT_FIELDS = [
+    ('id', 'int64'), ('name', 'string'), ('date', 'string'), ('status', 'string'),
+    ('platform', 'string'), ('category', 'string'), ('score', 'float64'),
+    ('publisher', 'string'), ('source', 'string'), ('is_featured', 'bool'),
+    ('link', 'string'), ('icon_url', 'string'), ('description', 'string'),
+    ('license_checked', 'bool'), ('license_name', 'string'), ('approval_number', 'string'),
+    ('publication_number', 'string'), ('approval_date', 'string'), ('publishing_unit', 'string'),
+    ('operating_unit', 'string'), ('license_game_type', 'string'),
+    ('application_category', 'string'), ('license_multiple_results', 'string'),
+    ('manual_checked', 'bool'), ('manual_check_status', 'string'),
+]
+
+RECORD_FIELDS = tuple(field for field, _ in SNAPSHOT_FIELDS)
+# 取值在记录间大量重复的字段，字符串驻留 (sys.intern) 后共享同一对象
+INTERNED_FIELDS = frozenset([
+    'date', 'status', 'platform', 'category', 'publisher', 'source', 'approval_date',
+    'publishing_unit', 'operating_unit', 'license_game_type', 'application_category',
+    'manual_check_status',
+])
+
+class GameRecord(record_type('SnapshotRecordSlots', RECORD_FIELDS, INTERNED_FIELDS)):
+    """进程内快照 (app.GameSnapshot) 中的一条只读记录，字段固定为 RECORD_FIELDS
+
+    用 __slots__ 对象代替 25 个键的字典，省去每条记录各自的哈希表。
+    路由通过 get() 读取字段，返回给前端前用 to_dict() 转换为字典。
+    """
+
+    __slots__ = ()
+
+    def __init__(self, fields):
+        for field in RECORD_FIELDS: # 缺失的字段记为 None
+            self._set_field(field, fields.get(field))
+
+# 每个进程当前打开的快照 (按 CURRENT 指针内容缓存)
+_opened = {'pointer': None, 'snapshot': None}
+_open_lock = threading.Lock()
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("生产多进程模式需要安装 'pyarrow' 库。请运行 pip install pyarrow")
+
+def _coerce(value, arrow_type):
+    """把记录中的值转换为列类型，None/NaN 统一为空值"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if arrow_type == 'string':
+        return str(value)
+    if arrow_type == 'float64':
+        return float(value)
+    if arrow_type == 'int64':
+        return int(value)
+    if arrow_type == 'bool':
+        return bool(value)
+    return value
+
+def _snapshot_filename(version):
+    safe_version = ''.join(c if c.isalnum() or c in '-_' else '_' for c in str(version or 'empty'))
+    return f"{SNAPSHOT_PREFIX}{safe_version}{SNAPSHOT_SUFFIX}"
+
+def _build_table(game_snapshot):
+    """把内存快照 (app.GameSnapshot) 转为 Arrow 表，附加名称索引列"""
+    games = game_snapshot.valid_games
+    name_keys = [''] * len(games)
+    for key, positions in game_snapshot.name_index.items():
+        for position in positions:
+            name_keys[position] = key
+
+    fields = []
+    arrays = []
+    for field, type_name in SNAPSHOT_FIELDS:
+        arrow_type = pa.bool_() if type_name == 'bool' else getattr(pa, type_name)()
+        fields.append(pa.field(field, arrow_type))
+        arrays.append(pa.array([_coerce(game.get(field), type_name) for game in games], type=arrow_type))
+    fields.append(pa.field(NAME_KEY_COLUMN, pa.string()))
+    arrays.append(pa.array(name_keys, type=pa.string()))
+
+    metadata = {
+        'version': str(game_snapshot.version or ''),
+        'total_count': str(game_snapshot.total_count),
+    }
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields, metadata=metadata))
+
+def publish_snapshot(snapshot_dir, game_snapshot):
+    """把内存快照写为不可变的 Arrow IPC 文件 (临时文件 + 原子重命名)，返回其内存映射版本
+
+    只写文件，不切换 CURRENT 指针；切换由 activate_snapshot 完成。
+    """
+    _require_pyarrow()
+    os.makedirs(snapshot_dir, exist_ok=True)
+    table = _build_table(game_snapshot)
+    path = os.path.join(snapshot_dir, _snapshot_filename(game_snapshot.version))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=BATCH_ROWS)
+    os.replace(tmp_path, path)
+    print(f"[快照] 已写出共享快照文件: {path} ({table.num_rows} 行)")
+    return ArrowGameSnapshot(path)
+
+def activate_snapshot(snapshot_dir, arrow_snapshot):
+    """原子更新 CURRENT 指针到指定快照文件，并清理多余的旧版本文件"""
+    pointer_path = os.path.join(snapshot_dir, CURRENT_POINTER)
+    filename = os.path.basename(arrow_snapshot.path)
+    tmp_path = f"{pointer_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(filename)
+    os.replace(tmp_path, pointer_path)
+    print(f"[快照] CURRENT 已指向 {filename}")
+    _prune_old_snapshots(snapshot_dir, keep_filename=filename)
+
+def open_history_snapshot(snapshot_dir, version, build):
+    """返回历史版本 (snapshot_history 的版本号) 的内存映射快照
+
+    快照文件已存在时直接映射；否则调用 build(version) 构建内存快照 (版本名须为 history-<版本号>)，
+    写出到 history 子目录后映射。历史版本不可变，文件写出一次后所有 worker 共用，
+    并发写出同一版本时以最后一次原子重命名为准，内容相同。
+    """
+    history_dir = os.path.join(snapshot_dir, HISTORY_SUBDIR)
+    path = os.path.join(history_dir, _snapshot_filename(f"history-{version}"))
+    if os.path.exists(path):
+        return ArrowGameSnapshot(path)
+    arrow_snapshot = publish_snapshot(history_dir, build(version))
+    _prune_old_snapshots(history_dir, keep_filename=os.path.basename(arrow_snapshot.path), keep=KEEP_HISTORY_VERSIONS)
+    return arrow_snapshot
+
+def _prune_old_snapshots(snapshot_dir, keep_filename, keep=KEEP_VERSIONS):
+    snapshot_files = [
+        f for f in os.listdir(snapshot_dir)
+        if f.startswith(SNAPSHOT_PREFIX) and f.endswith(SNAPSHOT_SUFFIX) and f != keep_filename
+    ]
+    snapshot_files.sort(key=lambda f: os.path.getmtime(os.path.join(snapshot_dir, f)), reverse=True)
+    for stale in snapshot_files[keep - 1:]:
+        try:
+            # POSIX 下已映射该文件的进程仍可继续读取；Windows 下删除失败时留待下次清理
+            os.remove(os.path.join(snapshot_dir, stale))
+        except OSError as e:
+            print(f"[快照] 删除旧快照文件 {stale} 失败: {e}")
+
+def get_shared_snapshot(snapshot_dir):
+    """返回 CURRENT 指向的快照 (按指针内容缓存于本进程)，尚未发布任何快照时返回 None"""
+    pointer_path = os.path.join(snapshot_dir, CURRENT_POINTER)
+    try:
+        with open(pointer_path, 'r', encoding='utf-8') as f:
+            filename = f.read().strip()
+    except FileNotFoundError:
+        return None
+    if not filename:
+        return None
+    if filename == _opened['pointer']:
+        return _opened['snapshot']
+    with _open_lock:
+        if filename != _opened['pointer']:
+            snapshot = ArrowGameSnapshot(os.path.join(snapshot_dir, filename))
+            _opened['snapshot'] = snapshot
+            _opened['pointer'] = filename
+            print(f"[快照] 进程 {os.getpid()} 已切换到共享快照 {filename} (版本 {snapshot.version})")
+        return _opened['snapshot']
+
+class ArrowGameSnapshot:
+    """内存映射的只读列式快照，接口与 app.GameSnapshot 一致
+
+    过滤在列上向量化执行，只有最终需要返回的记录才会转换为字典。
+    """
+
+    def __init__(self, path):
+        _require_pyarrow()
+        self.path = path
+        source = pa.memory_map(path, 'r')
+        # read_all 对未压缩的 IPC 文件是零拷贝的，列缓冲区直接指向映射页
+        self.table = ipc.open_file(source).read_all()
+        metadata = self.table.schema.metadata or {}
+        self.version = metadata.get(b'version', b'').decode('utf-8') or None
+        self.total_count = int(metadata.get(b'total_count', b'0'))
+        self._record_columns = [name for name in self.table.column_names if name != NAME_KEY_COLUMN]
+        self._name_index = None # 名称索引键 -> 记录位置列表，首次按名称查询时从名称索引列构建一次
+        self._name_keys = None
+        self._name_index_lock = threading.Lock()
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def _contains(self, column, value):
+        """忽略大小写的包含匹配，空值视为不匹配"""
+        return pc.fill_null(pc.match_substring(self.table[column], value, ignore_case=True), False)
+
+    def filter_positions(self, filters):
+        """按 /api/games 的过滤参数返回符合条件的记录位置 (语义同 GameSnapshot.filter_positions)"""
+        conditions = []
+
+        if filters.get('featured'):
+            conditions.append(pc.fill_null(self.table['is_featured'], False))
+
+        for field in ['status', 'source', 'platform']:
+            value = filters.get(field)
+            if value:
+                conditions.append(self._contains(field, value))
+
+        target_publishers = filters.get('publishers')
+        if target_publishers:
+            publisher_mask = self._contains('publisher', target_publishers[0])
+            for publisher in target_publishers[1:]:
+                publisher_mask = pc.or_(publisher_mask, self._contains('publisher', publisher))
+            conditions.append(publisher_mask)
+
+        search = filters.get('search')
+        if search:
+            search_mask = self._contains('name', search)
+            for column in ['category', 'publisher', 'platform']:
+                search_mask = pc.or_(search_mask, self._contains(column, search))
+            conditions.append(search_mask)
+
+        start_date = filters.get('start_date')
+        if start_date:
+            conditions.append(pc.fill_null(pc.greater_equal(self.table['date'], start_date), False))
+        end_date = filters.get('end_date')
+        if end_date:
+            conditions.append(pc.fill_null(pc.less_equal(self.table['date'], end_date), False))
+
+        if not conditions:
+            return list(range(self.table.num_rows))
+        mask = conditions[0]
+        for condition in conditions[1:]:
+            mask = pc.and_(mask, condition)
+        return pc.indices_nonzero(mask).to_pylist()
+
+    def get_records(self, positions):
+        """按位置取出记录并转换为字典"""
+        if not positions:
+            return []
+        rows = self.table.take(pa.array(positions, type=pa.int64()))
+        return rows.select(self._record_columns).to_pylist()
+
+    def _get_name_index(self):
+        """名称索引键 -> 记录位置列表 (每个打开的快照只构建一次，之后的查询为字典查找)"""
+        if self._name_index is None:
+            with self._name_index_lock:
+                if self._name_index is None:
+                    name_index = {}
+                    for position, key in enumerate(self.table[NAME_KEY_COLUMN].to_pylist()):
+                        if key:
+                            name_index.setdefault(key, []).append(position)
+                    self._name_keys = list(name_index)
+                    self._name_index = name_index
+        return self._name_index
+
+    def name_keys(self):
+        """所有名称索引键 (去重后缓存，调用方不应修改)"""
+        self._get_name_index()
+        return self._name_keys
+
+    def column_values(self, field):
+        """返回所有记录中某个字段的值 (按记录顺序)"""
+        return self.table[field].to_pylist()
+
+    def lookup_name(self, key):
+        """返回名称索引键对应的记录位置列表，不存在时返回 None"""
+        return self._get_name_index().get(key)
+
+    def featured_group_records(self):
+        """返回所有 "至少有一条重点记录" 的游戏的全部有效记录"""
+        featured_mask = pc.fill_null(self.table['is_featured'], False)
+        featured_names = pc.unique(pc.filter(self.table['name'], featured_mask)).drop_null()
+        mask = pc.and_(
+            pc.fill_null(pc.is_in(self.table['name'], value_set=featured_names), False),
+            pc.fill_null(pc.not_equal(self.table['name'], ''), False),
+        )
+        return self.table.filter(mask).select(self._record_columns).to_pylist()
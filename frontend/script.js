@@ -23,6 +23,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const weekRangeDisplay = document.getElementById('week-range-display');
 
     const API_BASE_URL = 'http://localhost:5000/api'; // 后端 API 地址
+    const IMAGE_PROXY_BASE_URL = 'http://localhost:5001/api'; // 异步图片代理地址 (backend/image_proxy.py)
 
     let currentPage = 1;
     let totalPages = 1;
@@ -85,7 +86,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             let iconHtml = '';
             if (game.icon_url && String(game.icon_url).trim() !== '') {
-                const proxyImageUrl = `${API_BASE_URL}/image?url=${encodeURIComponent(game.icon_url)}`;
+                const proxyImageUrl = `${IMAGE_PROXY_BASE_URL}/image?url=${encodeURIComponent(game.icon_url)}`;
                 iconHtml = `<img src="${proxyImageUrl}" alt="${game.name || '图标'}" class="featured-icon" loading="lazy">`;
             } else {
                 iconHtml = '<div class="featured-icon placeholder-icon">无</div>';
@@ -137,7 +138,7 @@ document.addEventListener('DOMContentLoaded', () => {
             // 生成图标 HTML
             let iconHtml = '<span class="icon-placeholder">无</span>';
             if (game.icon_url && String(game.icon_url).trim() !== '') {
-                const proxyImageUrl = `${API_BASE_URL}/image?url=${encodeURIComponent(game.icon_url)}`;
+                const proxyImageUrl = `${IMAGE_PROXY_BASE_URL}/image?url=${encodeURIComponent(game.icon_url)}`;
                 iconHtml = `<span class="icon-wrapper"><img src="${proxyImageUrl}" alt="${game.name || '图标'}" class="table-icon" loading="lazy"></span>`;
             }
 
@@ -229,12 +230,13 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- 填充过滤器 (修改，分为状态、来源、厂商) ---
-    function populateStatusFilter(games) {
+    // values: 各条记录的status字段值列表，或 /api/bootstrap 返回的去重选项列表
+    function populateStatusFilter(values) {
         const currentSelectedValue = statusFilter.value;
         const statuses = new Set();
-        games.forEach(game => {
-            if (game.status && String(game.status).trim() !== '') {
-                statuses.add(String(game.status).trim());
+        values.forEach(value => {
+            if (value && String(value).trim() !== '') {
+                statuses.add(String(value).trim());
             }
         });
 
@@ -255,12 +257,13 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // 新增：填充来源过滤器
-    function populateSourceFilter(games) {
+    // values: 各条记录的source字段值列表，或 /api/bootstrap 返回的去重选项列表
+    function populateSourceFilter(values) {
         const currentSelectedValue = sourceFilter.value;
         const sources = new Set();
-        games.forEach(game => {
-            if (game.source && String(game.source).trim() !== '') {
-                sources.add(String(game.source).trim());
+        values.forEach(value => {
+            if (value && String(value).trim() !== '') {
+                sources.add(String(value).trim());
             }
         });
 
@@ -281,12 +284,13 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // 新增：填充厂商过滤器
-    function populatePublisherFilter(games) {
+    // values: 各条记录的publisher字段值列表，或 /api/bootstrap 返回的去重选项列表
+    function populatePublisherFilter(values) {
         const currentSelectedValue = publisherFilter.value;
         const publishers = new Set();
-        games.forEach(game => {
-            if (game.publisher && String(game.publisher).trim() !== '') {
-                publishers.add(String(game.publisher).trim());
+        values.forEach(value => {
+            if (value && String(value).trim() !== '') {
+                publishers.add(String(value).trim());
             }
         });
 
@@ -402,9 +406,9 @@ document.addEventListener('DOMContentLoaded', () => {
         const allData = await fetchData('/games', { per_page: 10000 });
         if (allData && allData.games) {
             allGamesData = allData.games; // 存储完整数据
-            populateStatusFilter(allGamesData); // 填充状态
-            populateSourceFilter(allGamesData); // 填充来源
-            populatePublisherFilter(allGamesData); // 填充厂商
+            populateStatusFilter(allGamesData.map(game => game.status)); // 填充状态
+            populateSourceFilter(allGamesData.map(game => game.source)); // 填充来源
+            populatePublisherFilter(allGamesData.map(game => game.publisher)); // 填充厂商
         } else {
             console.warn("Could not fetch all games data for filters.");
             populateStatusFilter([]);
@@ -413,6 +417,33 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // --- 首屏数据：一次请求获取过滤器选项、重点游戏、今日、本周和第一页列表 ---
+    async function loadBootstrap() {
+        const todayDate = formatDate(new Date());
+        const data = await fetchData('/bootstrap', { date: todayDate, per_page: perPage });
+        if (!data) {
+            return false; // 由调用方回退到逐个接口加载
+        }
+
+        populateStatusFilter(data.facets.statuses);
+        populateSourceFilter(data.facets.sources);
+        populatePublisherFilter(data.facets.publishers);
+
+        renderFeaturedGames(data.featured);
+
+        const todayDateDisplay = document.getElementById('today-date-display');
+        if(todayDateDisplay) {
+            todayDateDisplay.textContent = `(${data.date})`;
+        }
+        renderWeeklyGames(data.today.games, todayGameList, false);
+
+        weekRangeDisplay.textContent = `${data.week.start} ~ ${data.week.end}`;
+        renderWeeklyGames(data.this_week.games, weeklyGameList);
+
+        renderAllGames(data.games);
+        return true;
+    }
+
     // --- 加载重点游戏数据 (现在直接从后端获取) ---
     async function loadFeaturedGames() {
         featuredGameList.innerHTML = '<p class="loading-message">正在加载重点游戏...</p>'; // 显示加载提示
@@ -577,7 +608,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
                     let iconHtml = '';
                     if (game.icon_url && String(game.icon_url).trim() !== '') {
-                        const proxyImageUrl = `${API_BASE_URL}/image?url=${encodeURIComponent(game.icon_url)}`;
+                        const proxyImageUrl = `${IMAGE_PROXY_BASE_URL}/image?url=${encodeURIComponent(game.icon_url)}`;
                         iconHtml = `<img src="${proxyImageUrl}" alt="${game.name || '图标'}" class="compact-icon" loading="lazy">`;
                     } else {
                         iconHtml = '<div class="compact-icon placeholder-icon">无</div>';
@@ -617,7 +648,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
                  let iconHtml = '';
                  if (game.icon_url && String(game.icon_url).trim() !== '') {
-                     const proxyImageUrl = `${API_BASE_URL}/image?url=${encodeURIComponent(game.icon_url)}`;
+                     const proxyImageUrl = `${IMAGE_PROXY_BASE_URL}/image?url=${encodeURIComponent(game.icon_url)}`;
                      iconHtml = `<img src="${proxyImageUrl}" alt="${game.name || '图标'}" class="compact-icon" loading="lazy">`;
                  } else {
                      iconHtml = '<div class="compact-icon placeholder-icon">无</div>';
@@ -784,10 +815,11 @@ document.addEventListener('DOMContentLoaded', () => {
         gamesTableTitle.textContent = '全部游戏列表';
 
 
-        // 4. 使用 Promise.all 等待关键的初始内容加载完成
+        // 4. 首屏内容优先通过 /api/bootstrap 一次获取；失败时回退到逐个接口加载
         // 这些是影响页面初始布局高度的主要部分
         try {
-            await Promise.all([
+            const bootstrapped = await loadBootstrap();
+            if (!bootstrapped) await Promise.all([
                 loadFeaturedGames(),          // 加载首页的重点游戏卡片
                 loadTodayGames(),             // 加载今日游戏
                 loadWeeklyGames(),            // 加载本周游戏
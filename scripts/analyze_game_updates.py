@@ -1,13 +1,14 @@
 # analyze_game_updates.py (Enhanced)
 
 import pandas as pd
+import numpy as np
 import os
 import logging
 import json
 from datetime import datetime, timedelta
 import shutil # Import shutil for backup
-import re # Added import
-import unicodedata # Added import
+
+from name_cleaning import get_name_cleaner
 
 # --- 配置 ---
 # NOTE_SHORT_INTERVAL = "注意：测试日期间隔过近(<=7天)"
@@ -36,41 +37,8 @@ def get_excel_columns():
     }
 
 def clean_game_name(name):
-    """根据配置清理游戏名称 (Adapted from collect_games.py)"""
-    global CONFIG # Use the global CONFIG dictionary
-    if not name: return "未知名称"
-    
-    cfg = CONFIG.get('game_name_cleaning', {})
-    norm_form = cfg.get('normalize_unicode_form', 'NFKC')
-    remove_patterns = cfg.get('remove_patterns_regex', [])
-    
-    # 1. Unicode 规范化
-    try:
-        normalized_name = unicodedata.normalize(norm_form, str(name))
-    except (TypeError, ValueError) as e:
-        logging.warning(f"Unicode规范化失败 ('{name}', form='{norm_form}'): {e}")
-        normalized_name = str(name) # Fallback
-        
-    cleaned = normalized_name
-    # 2. 应用正则表达式移除模式
-    for pattern in remove_patterns:
-        try:
-            flags = 0
-            if pattern.endswith('$'): # Basic check for case-insensitive flag marker
-                 flags = re.IGNORECASE
-                 pattern = pattern.rstrip('$i') # Remove potential flag markers
-            
-            cleaned = re.sub(pattern, '', cleaned, flags=flags)
-        except re.error as e:
-             logging.warning(f"应用名称清理正则失败 ('{pattern}'): {e}")
-             
-    # 3. 替换多个空格为单个空格
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    # 4. 去除首尾空格
-    cleaned = cleaned.strip()
-    
-    # 如果清理后为空，返回原始名称（规范化后）
-    return cleaned if cleaned else normalized_name.strip()
+    """根据配置清理游戏名称 (与 collect_games.py 共用 name_cleaning.py 中的清理器)"""
+    return get_name_cleaner(CONFIG.get('game_name_cleaning', {})).clean(name)
 
 # --- Core Script Functions ---
 def load_config(config_path):
@@ -123,17 +91,133 @@ def load_config(config_path):
 # def find_date_changes(excel_path, status_online_name): ...
 # def report_anomalies(anomalies, output_file=None): ...
 
+LOCKED_VALUES = ['true', '是', 'yes', '1'] # 是否人工校对列中表示已锁定的取值 (小写比较)
+UNKNOWN_NAME = '未知名称'
+
+def find_old_test_records(frame, status_test_name, min_days):
+    """找出需要删除的短间隔测试记录，返回行索引 (frame.index 中的标签) 集合
+
+    frame 需包含列: cleaned_name (清理后的名称)、status、parsed_date (datetime)、manual_checked (字符串)。
+    同一游戏的测试记录按日期排序，相邻日期间隔 <= min_days 的连成一个冲突块，
+    块内只保留日期最新的一条，其余未锁定的记录删除。
+
+    整体按 (名称, 日期) 排序一次，用相邻日期差得到块边界，累加得到块编号，
+    全程按列计算，不逐行访问。
+    """
+    test_records = frame[
+        (frame['status'] == status_test_name) &
+        (frame['cleaned_name'].notna()) & (frame['cleaned_name'] != '') &
+        (frame['parsed_date'].notna())
+    ]
+    logging.info(f"筛选出 {len(test_records)} 条有效的 '{status_test_name}' 记录进行间隔分析。")
+
+    if test_records.empty:
+        logging.info("没有有效的测试记录可供分析间隔。")
+        return set()
+
+    # 按名称分组编号，组内按日期稳定排序 (同日期保持原有顺序)
+    group_codes, _ = pd.factorize(test_records['cleaned_name'])
+    dates = test_records['parsed_date'].to_numpy(dtype='datetime64[ns]')
+    order = np.lexsort((dates, group_codes))
+    sorted_codes = group_codes[order]
+    sorted_dates = dates[order]
+
+    # 与前一条同组且间隔 <= min_days 时并入同一冲突块
+    linked = np.zeros(len(order), dtype=bool)
+    linked[1:] = (sorted_codes[1:] == sorted_codes[:-1]) & (np.diff(sorted_dates) <= np.timedelta64(timedelta(days=min_days)))
+    block_ids = np.cumsum(~linked) - 1
+    block_sizes = np.bincount(block_ids)
+    in_conflict_block = block_sizes[block_ids] > 1
+
+    # 块内日期升序，块的最后一条即最新日期；同为最新日期时保留排在最前的一条
+    block_last = np.cumsum(block_sizes) - 1
+    is_latest = sorted_dates == sorted_dates[block_last][block_ids]
+    latest_counts = np.bincount(block_ids, weights=is_latest)
+    first_latest = np.full(len(block_sizes), len(order))
+    np.minimum.at(first_latest, block_ids[is_latest], np.flatnonzero(is_latest))
+    keep = np.arange(len(order)) == first_latest[block_ids]
+
+    # 多条记录同为最新日期时，保留哪一条取决于逐组按日期排序 (sort_values 默认排序) 后的顺序，
+    # 这类块很少，逐个按原规则确定保留的记录
+    tied_blocks = np.flatnonzero((block_sizes > 1) & (latest_counts > 1))
+    if len(tied_blocks):
+        sorted_labels = test_records.index.to_numpy()[order]
+        group_orders = {} # 组编号 -> 该组按原规则排序后的行标签顺序
+        for block_id in tied_blocks:
+            block_positions = np.arange(block_last[block_id] - block_sizes[block_id] + 1, block_last[block_id] + 1)
+            tied_positions = block_positions[is_latest[block_positions]]
+            code = sorted_codes[tied_positions[0]]
+            group_order = group_orders.get(code)
+            if group_order is None:
+                group_start, group_end = np.searchsorted(sorted_codes, [code, code + 1])
+                group = test_records.iloc[np.sort(order[group_start:group_end])] # 保持原有行顺序
+                group_order = group_orders[code] = {label: rank for rank, label in enumerate(group.sort_values(by='parsed_date').index)}
+            kept_label = min(sorted_labels[tied_positions].tolist(), key=group_order.__getitem__)
+            keep[tied_positions] = sorted_labels[tied_positions] == kept_label
+
+    # 非最新且未锁定的记录删除
+    manual_values = test_records['manual_checked'].astype(str).str.strip().str.lower().to_numpy()[order]
+    is_locked = np.isin(manual_values, LOCKED_VALUES)
+    candidates = in_conflict_block & ~keep
+    delete_mask = candidates & ~is_locked
+    rows_to_delete_indices = set(test_records.index.to_numpy()[order][delete_mask].tolist())
+
+    logging.info(f"发现 {int(np.count_nonzero(block_sizes > 1))} 个短间隔冲突块，标记删除 {len(rows_to_delete_indices)} 条 (非最新且未锁定)，"
+                 f"跳过 {int(np.count_nonzero(candidates & is_locked))} 条已锁定记录。")
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        names = test_records['cleaned_name'].to_numpy()[order]
+        labels = test_records.index.to_numpy()[order]
+        for position in np.flatnonzero(candidates):
+            action = "跳过删除 (非最新但已锁定)" if is_locked[position] else "标记删除 (非最新且未锁定)"
+            logging.debug(f"  {action}: 游戏='{names[position]}', Index={labels[position]}, 日期={pd.Timestamp(sorted_dates[position]):%Y-%m-%d}")
+
+    return rows_to_delete_indices
+
+def _excel_cell_text(value):
+    """记录字段写入 Excel 再读回后的文本: None/空串/NaN 读回为空单元格"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, str):
+        return value if value != '' else None
+    return str(value)
+
+def remove_old_test_records(games_list, status_test_name, min_days):
+    """流水线阶段：在内存中的记录列表上删除短间隔测试记录，返回 (保留的记录列表, 删除条数)
+
+    判定规则与 analyze_and_remove_old_tests 处理保存后的主 Excel 完全一致，
+    各字段按写入 Excel 再读回后的取值参与判断，因此无需先落盘再读回。
+    """
+    if not games_list:
+        return games_list, 0
+
+    name_cleaner = get_name_cleaner(CONFIG.get('game_name_cleaning', {}))
+    names = [_excel_cell_text(game.get('name')) or UNKNOWN_NAME for game in games_list]
+    frame = pd.DataFrame({
+        'cleaned_name': name_cleaner.clean_many(names),
+        'status': [_excel_cell_text(game.get('status')) for game in games_list],
+        'parsed_date': pd.to_datetime(pd.Series([_excel_cell_text(game.get('date')) for game in games_list], dtype=object), errors='coerce'),
+        'manual_checked': [_excel_cell_text(game.get('manual_checked')) or '' for game in games_list],
+    })
+
+    rows_to_delete_indices = find_old_test_records(frame, status_test_name, min_days)
+    if not rows_to_delete_indices:
+        logging.info("未发现需要删除的短间隔测试记录（或所有待删记录均已锁定）。")
+        return games_list, 0
+
+    kept_games = [game for index, game in enumerate(games_list) if index not in rows_to_delete_indices]
+    logging.info(f"成功删除 {len(rows_to_delete_indices)} 条短间隔测试记录。")
+    return kept_games, len(rows_to_delete_indices)
+
 def analyze_and_remove_old_tests(excel_path, status_test_name, min_days):
-    """分析测试日期间隔，如果过短则删除日期较早的未锁定记录，保留最新的。"""
-    excel_modified = False
-    rows_to_delete_indices = set()
-    df = None
-    excel_columns_map = get_excel_columns()
+    """分析测试日期间隔，如果过短则删除日期较早的未锁定记录，保留最新的。
+
+    独立运行时使用：读取已保存的 Excel，删除后写回。collect_games.py 在保存前
+    直接对内存中的记录调用 remove_old_test_records。
+    """
     excel_name_col = "名称"
     excel_status_col = "状态"
     excel_date_col = "日期"
     excel_manual_check_col = "是否人工校对"
-    internal_cleaned_name_col = "cleaned_name_generated"
 
     try:
         try:
@@ -142,29 +226,21 @@ def analyze_and_remove_old_tests(excel_path, status_test_name, min_days):
              logging.warning(f"使用 openpyxl 读取Excel时出错: {read_err}. 尝试不指定引擎...")
              df = pd.read_excel(excel_path, dtype={excel_manual_check_col: str})
 
-        df['original_index'] = df.index
-
         required_excel_cols = [excel_name_col, excel_status_col, excel_date_col, excel_manual_check_col]
         if not all(col in df.columns for col in required_excel_cols):
             missing_cols = [col for col in required_excel_cols if col not in df.columns]
             logging.error(f"Excel 文件 {excel_path} 缺少必要的列: {missing_cols}")
             return False
 
-        df[excel_name_col] = df[excel_name_col].fillna('未知名称').astype(str)
-        df[internal_cleaned_name_col] = df[excel_name_col].apply(clean_game_name)
-        logging.info(f"已从 '{excel_name_col}' 列生成内部使用的 '{internal_cleaned_name_col}' 列。")
-
-        df['parsed_date'] = pd.to_datetime(df[excel_date_col], errors='coerce')
+        df[excel_name_col] = df[excel_name_col].fillna(UNKNOWN_NAME).astype(str)
         df[excel_manual_check_col] = df[excel_manual_check_col].fillna('').astype(str)
-
-        test_records = df[
-            (df[excel_status_col] == status_test_name) &
-            (df[internal_cleaned_name_col].notna()) & (df[internal_cleaned_name_col] != '') &
-            (df['parsed_date'].notna())
-        ].copy()
-
-        logging.info(f"筛选出 {len(test_records)} 条有效的 '{status_test_name}' 记录进行间隔分析。")
-
+        name_cleaner = get_name_cleaner(CONFIG.get('game_name_cleaning', {}))
+        frame = pd.DataFrame({
+            'cleaned_name': name_cleaner.clean_many(df[excel_name_col]),
+            'status': df[excel_status_col],
+            'parsed_date': pd.to_datetime(df[excel_date_col], errors='coerce'),
+            'manual_checked': df[excel_manual_check_col],
+        }, index=df.index)
     except FileNotFoundError:
         logging.error(f"Excel 文件未找到: {excel_path}")
         return False
@@ -172,104 +248,28 @@ def analyze_and_remove_old_tests(excel_path, status_test_name, min_days):
         logging.error(f"读取或预处理 Excel 文件 {excel_path} 时出错: {e}", exc_info=True)
         return False
 
-    # --- 分析间隔并确定删除项 --- 
-    if test_records.empty:
-        logging.info("没有有效的测试记录可供分析间隔。")
-    else:
-        grouped_by_game_test = test_records.groupby(internal_cleaned_name_col)
-        for name, group in grouped_by_game_test:
-            if len(group) < 2: continue
-
-            # Sort by date, keep original index
-            sorted_group = group.sort_values(by='parsed_date').reset_index(drop=True)
-            
-            i = 0
-            while i < len(sorted_group):
-                # Find the end of the current conflict block
-                block_end_index = i
-                while block_end_index < len(sorted_group) - 1:
-                    date1 = sorted_group.iloc[block_end_index]['parsed_date']
-                    date2 = sorted_group.iloc[block_end_index + 1]['parsed_date']
-                    if pd.notna(date1) and pd.notna(date2) and (date2 - date1) <= timedelta(days=min_days):
-                        block_end_index += 1
-                    else:
-                        break # End of block
-                
-                # If a block of conflicts (more than 1 record) is found
-                if block_end_index > i:
-                    conflict_block_indices = list(range(i, block_end_index + 1))
-                    conflict_block_df = sorted_group.iloc[conflict_block_indices]
-                    
-                    # Find the latest date within this block
-                    latest_date_in_block = conflict_block_df['parsed_date'].max()
-                    
-                    block_dates = [d.strftime('%Y-%m-%d') if pd.notna(d) else 'NaT' for d in conflict_block_df['parsed_date']]
-                    logging.info(f"处理冲突块: 游戏='{name}', 状态='{status_test_name}', 块内日期={block_dates}, 最新日期={latest_date_in_block:%Y-%m-%d if pd.notna(latest_date_in_block) else 'NaT'}")
-
-                    # Identify records to potentially delete within this block
-                    records_to_keep_indices_in_block = set(conflict_block_df[conflict_block_df['parsed_date'] == latest_date_in_block].index)
-                    
-                    # Ensure we keep at least one if multiple share the latest date (arbitrarily the first one)
-                    if len(records_to_keep_indices_in_block) > 1:
-                         first_latest_index = min(records_to_keep_indices_in_block)
-                         records_to_keep_indices_in_block = {first_latest_index}
-                    
-                    for block_idx in conflict_block_indices:
-                        row = sorted_group.iloc[block_idx]
-                        original_df_index = row['original_index']
-                        
-                        # Check if this record is NOT the one chosen to be kept
-                        if block_idx not in records_to_keep_indices_in_block:
-                            # Check if it's manually checked (locked)
-                            manual_check_val = str(row[excel_manual_check_col]).strip().lower()
-                            is_locked = manual_check_val in ['true', '是', 'yes', '1']
-                            
-                            if not is_locked:
-                                logging.info(f"  标记删除 (非最新且未锁定): Index={original_df_index}, 日期={row['parsed_date']:%Y-%m-%d if pd.notna(row['parsed_date']) else 'NaT'}")
-                                rows_to_delete_indices.add(original_df_index)
-                            else:
-                                logging.info(f"  跳过删除 (非最新但已锁定): Index={original_df_index}, 日期={row['parsed_date']:%Y-%m-%d if pd.notna(row['parsed_date']) else 'NaT'}")
-                        # else:
-                             # logging.info(f"  保留 (最新或锁定): Index={original_df_index}, 日期={row['parsed_date']:%Y-%m-%d if pd.notna(row['parsed_date']) else 'NaT'}")
-                             
-                    # Move the main loop index past this processed block
-                    i = block_end_index + 1
-                else: # No conflict starting at index i, move to next record
-                    i += 1
-
-    # --- 删除记录 --- 
-    if rows_to_delete_indices:
-        logging.info(f"准备从 DataFrame 删除 {len(rows_to_delete_indices)} 条记录...")
-        try:
-            df.drop(index=list(rows_to_delete_indices), inplace=True)
-            excel_modified = True
-            logging.info(f"成功删除 {len(rows_to_delete_indices)} 条记录。")
-        except KeyError as key_err:
-             logging.error(f"尝试删除记录时发生 KeyError: {key_err}。可能索引已失效。跳过删除。", exc_info=True)
-             # Continue without modification if drop fails partially
-        except Exception as drop_err:
-             logging.error(f"删除记录时发生未知错误: {drop_err}。跳过删除。", exc_info=True)
-             # Continue without modification
-    else:
+    # --- 分析间隔并确定删除项 ---
+    rows_to_delete_indices = find_old_test_records(frame, status_test_name, min_days)
+    if not rows_to_delete_indices:
         logging.info("未发现需要删除的短间隔测试记录（或所有待删记录均已锁定）。")
-
-    # --- 保存回 Excel --- 
-    if excel_modified:
-        try:
-            df_to_save = df.drop(columns=['original_index', 'parsed_date', internal_cleaned_name_col], errors='ignore')
-            df_to_save.to_excel(excel_path, index=False, engine='openpyxl')
-            logging.info(f"修改后的数据（已删除旧记录）已覆盖保存回: {excel_path}")
-            return True
-        except ImportError:
-             logging.error("保存失败：需要安装 'openpyxl' 库才能写入 .xlsx 文件。请运行 'pip install openpyxl'")
-             return False
-        except Exception as e:
-            logging.error(f"保存修改后的 Excel 文件时出错: {e}", exc_info=True)
-            return False
-    else:
         logging.info("未对 Excel 文件进行修改。")
         return False
 
+    # --- 删除记录并保存回 Excel ---
+    logging.info(f"准备从 DataFrame 删除 {len(rows_to_delete_indices)} 条记录...")
+    try:
+        df.drop(index=list(rows_to_delete_indices), inplace=True)
+        logging.info(f"成功删除 {len(rows_to_delete_indices)} 条记录。")
+        df.to_excel(excel_path, index=False, engine='openpyxl')
+        logging.info(f"修改后的数据（已删除旧记录）已覆盖保存回: {excel_path}")
+        return True
+    except ImportError:
+         logging.error("保存失败：需要安装 'openpyxl' 库才能写入 .xlsx 文件。请运行 'pip install openpyxl'")
+         return False
+    except Exception as e:
+        logging.error(f"删除记录或保存修改后的 Excel 文件时出错: {e}", exc_info=True)
+        return False
+
 # --- Main Execution Guard ---
 def main():
     # --- 设置 ---
@@ -0,0 +1,566 @@
+# scripts/benchmark_pipeline.py
+# 数据处理流程的微基准测试
+#
+# 每个基准用合成数据测量当前实现的耗时 (部分基准另报告内存)。
+# 结果的正确性由 tests/ 下的测试校验，优化前实现的基准数据记录在对应的提交说明中。
+#
+# 用法:
+#   python benchmark_pipeline.py                      # 运行全部基准
+#   python benchmark_pipeline.py clean_names -n 200000
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import pandas as pd
+from datetime import datetime
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(script_dir)
+data_dir = os.path.join(root_dir, 'data')
+config_path = os.path.join(root_dir, 'config', 'collect_games_config.json')
+if script_dir not in sys.path:
+    sys.path.append(script_dir)
+
+from name_cleaning import GameNameCleaner
+from status_standardization import StatusStandardizer
+import analyze_game_updates
+
+def load_config():
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_sample_games():
+    """读取仓库中的 JSONL 样本数据作为合成数据的种子"""
+    games = []
+    for file_name in ['taptap_games.jsonl', 'p16_games.jsonl']:
+        path = os.path.join(data_dir, file_name)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    games.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass
+    if not games:
+        games = [{'name': '示例游戏', 'status': '测试', 'source': 'TapTap', 'date': '2025-01-01'}]
+    return games
+
+def load_collect_games():
+    """导入 collect_games 并加载配置 (导入后关闭日志输出，避免刷屏)"""
+    import collect_games
+    logging.disable(logging.CRITICAL) # 只测计算本身，不把日志写入文件
+    collect_games.load_config(config_path)
+    return collect_games
+
+def timed(func, *args, repeat=3):
+    """返回 (最短耗时, 最后一次结果)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def report_timing(name, count, seconds):
+    rate = count / seconds if seconds else float('inf')
+    print(f"[{name}] {count} 条: {seconds:.3f}s ({rate:,.0f} 条/秒)")
+
+# --- clean_game_name (结果校验见 tests/test_name_cleaning.py) ---
+
+NAME_DECORATIONS = ['', '', '', '(测试服)', '（先锋服）', ' - 官方版', '手游', ' Mobile', '【首发】', '  ', '版', ' 体验服']
+
+def synthetic_names(count, seed=42):
+    rng = random.Random(seed)
+    base_names = [g.get('name') or '' for g in load_sample_games()]
+    # 约 10% 的不同名称，模拟真实数据中同一游戏反复出现
+    unique_names = [rng.choice(base_names) + rng.choice(NAME_DECORATIONS) for _ in range(max(1, count // 10))]
+    unique_names += ['', None, 'ＡＢＣ全角', '   ']
+    return [rng.choice(unique_names) for _ in range(count)]
+
+def bench_clean_names(count):
+    cfg = load_config().get('game_name_cleaning', {})
+    names = synthetic_names(count)
+
+    # 每轮使用新的清理器，计入冷缓存的开销
+    seconds, _ = timed(lambda: GameNameCleaner(cfg).clean_many(names))
+    report_timing('clean_names', count, seconds)
+
+    uncached = GameNameCleaner(cfg, memo_size=0)
+    uncached_seconds, _ = timed(lambda: [uncached.clean(n) for n in names])
+    report_timing('clean_names (无缓存，仅预编译)', count, uncached_seconds)
+
+# --- standardize_status (结果校验见 tests/test_status_standardization.py) ---
+
+STATUS_EXTRAS = ['', '   ', None, 123, '不删档招募', 'Beta 测试', 'PRE-ORDER', '上线 / 更新', '招 募', 'TEST', '即将上线公测', '未知']
+
+def synthetic_statuses(count, seed=42):
+    rng = random.Random(seed)
+    raw_statuses = sorted({str(g.get('status') or '') for g in load_sample_games()}) + STATUS_EXTRAS
+    return [rng.choice(raw_statuses) for _ in range(count)]
+
+def bench_status(count):
+    cfg = load_config().get('status_standardization', {})
+    statuses = synthetic_statuses(count)
+
+    seconds, _ = timed(lambda: StatusStandardizer(cfg).standardize_many(statuses))
+    report_timing('status', count, seconds)
+
+# --- standardize_game_data (与逐条处理的等价性见 tests/test_standardize.py) ---
+
+# 在样本记录上制造的变体：缺字段、None、已有 cleaned_name、各种评分写法、旧字段名 game_type
+RECORD_VARIANTS = [
+    {}, {'cleaned_name': '已清理名称'}, {'name': None}, {'rating': 8}, {'rating': '评分 9.2'}, {'rating': None},
+    {'status': None}, {'status': '  '}, {'date': None}, {'game_type': '角色扮演'}, {'game_type_version': '', 'game_type': '策略'},
+    {'is_featured': True, 'version_checked': True, 'manual_checked': '是'}, {'extra_field': 1},
+]
+DROPPABLE_FIELDS = ['name', 'date', 'status', 'rating', 'publisher', 'source', 'icon_url', 'is_featured']
+
+def synthetic_records(count, seed=42):
+    rng = random.Random(seed)
+    samples = load_sample_games()
+    records = []
+    for _ in range(count):
+        record = dict(rng.choice(samples))
+        record.update(rng.choice(RECORD_VARIANTS))
+        if rng.random() < 0.1:
+            record.pop(rng.choice(DROPPABLE_FIELDS), None)
+        records.append(record)
+    return records
+
+def bench_standardize(count):
+    cg = load_collect_games()
+    excel_columns_map = cg.get_excel_columns()
+    records = synthetic_records(count)
+    seconds, _ = timed(lambda: cg.standardize_game_data(records, excel_columns_map))
+    report_timing('standardize', count, seconds)
+
+# --- _deduplicate_games (结果校验见 tests/test_deduplicate.py) ---
+
+DEDUP_SOURCES = ['TapTap', '16p', 'AppStore', ' taptap ', 'Bilibili']
+
+def synthetic_dedup_input(count, seed=42):
+    """每个 (名称, 日期) 平均出现约 3 次；约 2% 的记录 cleaned_name 为空 (写入键相撞，触发冲突裁决)"""
+    rng = random.Random(seed)
+    samples = load_sample_games()
+    key_count = max(1, count // 3)
+    games = []
+    for _ in range(count):
+        key_index = rng.randrange(key_count)
+        record = dict(samples[key_index % len(samples)])
+        record['name'] = f"{record.get('name') or '游戏'}{key_index}"
+        record['cleaned_name'] = '' if rng.random() < 0.02 else record['name']
+        record['date'] = f"2025-{1 + key_index % 12:02d}-{1 + key_index % 28:02d}"
+        record['source'] = rng.choice(DEDUP_SOURCES)
+        if rng.random() < 0.3:
+            record['description'] = ''
+        games.append(record)
+    locked_records = {}
+    for record in rng.sample(games, max(1, count // 100)):
+        locked_record = dict(record, manual_checked='是')
+        locked_records[(locked_record['cleaned_name'], locked_record['date'])] = locked_record
+    return games, locked_records
+
+def bench_dedup(count):
+    cg = load_collect_games()
+    games, locked_records = synthetic_dedup_input(count)
+
+    # 合成记录都带有 cleaned_name 字段，去重不会修改输入，可重复使用同一份数据
+    seconds, (_, current_report) = timed(lambda: cg._deduplicate_games(games, locked_records))
+    report_timing('dedup', count, seconds)
+    print(f"  冲突报告: 候选 {current_report['candidates']}, 跳过锁定同键 {current_report['skipped_locked_key']}, "
+          f"跳过重复键 {current_report['skipped_duplicate_key']}, 裁决冲突 {len(current_report['conflicts'])}")
+
+# --- _resolve_online_conflicts (结果校验见 tests/test_online_conflicts.py) ---
+
+def synthetic_online_conflicts(count, seed=42):
+    """大部分游戏只有一两条记录；少数热门游戏有上千条历史记录 (多条上线、含 AppStore 来源和完全相同的重复记录)"""
+    rng = random.Random(seed)
+    statuses = ['上线', '上线', '测试', '可预约', '更新']
+    sources = ['TapTap', '16p', 'AppStore']
+    notes = ['', '', '是', '历史上线记录(冲突)']
+    games = []
+    hot_games = [f"热门游戏{i}" for i in range(2)]
+    while len(games) < count:
+        name = rng.choice(hot_games) if rng.random() < 0.1 else f"游戏{rng.randrange(count // 2 + 1)}"
+        record = {
+            'name': name, 'cleaned_name': name, 'date': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'status': rng.choice(statuses), 'source': rng.choice(sources), 'manual_checked': rng.choice(notes),
+        }
+        games.append(record)
+        if rng.random() < 0.01:
+            games.append(dict(record)) # 完全相同的重复记录
+    return games[:count]
+
+def bench_online_conflicts(count):
+    cg = load_collect_games()
+    games = synthetic_online_conflicts(count)
+    original_strategy = cg.CONFIG.get('online_conflict', {}).get('strategy')
+    for strategy in ['add_note_keep_latest', 'log_only']:
+        cg.CONFIG.setdefault('online_conflict', {})['strategy'] = strategy
+        # 处理时会修改记录，每轮使用新的副本 (计入复制开销)
+        seconds, _ = timed(lambda: cg._resolve_online_conflicts([dict(g) for g in games]))
+        report_timing(f'online_conflicts ({strategy})', count, seconds)
+    cg.CONFIG['online_conflict']['strategy'] = original_strategy
+
+# --- find_old_test_records (删除集合的 golden 测试见 tests/test_old_test_records.py) ---
+
+def synthetic_test_frame(count, seed=42):
+    """合成的测试记录表：多数游戏只有几条记录，少数游戏有上百条 (含同日期重复、锁定、无效日期和其他状态)"""
+    rng = random.Random(seed)
+    game_count = max(1, count // 8)
+    names, statuses, dates, manual_checks = [], [], [], []
+    for _ in range(count):
+        game_index = rng.randrange(game_count) if rng.random() < 0.9 else rng.randrange(20)
+        names.append('' if rng.random() < 0.001 else f"游戏{game_index}")
+        statuses.append('测试' if rng.random() < 0.9 else rng.choice(['上线', '可预约', None]))
+        day = rng.randrange(400) if game_index >= 20 else rng.randrange(60) # 热门游戏的日期更密集，同日期重复更多
+        dates.append(None if rng.random() < 0.01 else f"{2024 + day // 365}-{1 + day % 365 // 31:02d}-{1 + day % 31 % 28:02d}")
+        manual_checks.append(rng.choice(['', '', '', '', '是', 'True', ' yes ', '0', 'nan', '备注']))
+    return pd.DataFrame({
+        'cleaned_name': names,
+        'status': statuses,
+        'parsed_date': pd.to_datetime(pd.Series(dates, dtype=object), errors='coerce'),
+        'manual_checked': manual_checks,
+    }, index=pd.RangeIndex(count) * 3 + 7) # 非默认索引
+
+def bench_old_tests(count):
+    logging.disable(logging.CRITICAL)
+    frame = synthetic_test_frame(count)
+    for min_days in [7, 0]:
+        seconds, deleted = timed(lambda: analyze_game_updates.find_old_test_records(frame, '测试', min_days))
+        report_timing(f'old_tests (min_days={min_days}, 删除 {len(deleted)} 条)', count, seconds)
+
+# --- 主 Excel 写出 (结果校验见 tests/test_master_excel.py) ---
+
+def synthetic_excel_records(count, seed=42):
+    """以样本记录为底，混入缺失字段、None、NaN、布尔/数字形式的标记和备注"""
+    rng = random.Random(seed)
+    samples = load_sample_games()
+    flag_values = [True, False, '是', '', 'True', 1, 0, None]
+    manual_values = ['', '是', 'True', 'yes', '1', None, '历史上线记录(冲突)', True]
+    records = []
+    for index in range(count):
+        record = dict(rng.choice(samples))
+        record['name'] = f"{record.get('name') or '游戏'}{index}"
+        record['rating'] = rng.choice([0.0, 7.5, 9.1, float('nan')])
+        record['is_featured'] = rng.choice(flag_values)
+        record['version_checked'] = rng.choice(flag_values)
+        record['manual_checked'] = rng.choice(manual_values)
+        if rng.random() < 0.05:
+            record.pop(rng.choice(['publisher', 'description', 'manual_checked', 'is_featured', 'approval_num']), None)
+        records.append(record)
+    return records
+
+def bench_excel_write(count):
+    import tempfile
+    import tracemalloc
+    cg = load_collect_games()
+    excel_columns_map = cg.get_excel_columns()
+    records = synthetic_excel_records(count)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'all_games_data.xlsx')
+        seconds, _ = timed(lambda: cg._write_master_excel(records, path, excel_columns_map), repeat=1)
+        report_timing('excel_write', count, seconds)
+
+        # 峰值内存 (不含输入记录本身)：流式写出应与行数基本无关。tracemalloc 开销很大，只取部分行
+        peaks = []
+        row_counts = (max(1, count // 20), max(1, count // 10))
+        for rows in row_counts:
+            tracemalloc.start()
+            cg._write_master_excel(records[:rows], path, excel_columns_map)
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024 / 1024)
+            tracemalloc.stop()
+        print(f"  峰值内存: {row_counts[0]} 行 {peaks[0]:.1f} MB, {row_counts[1]} 行 {peaks[1]:.1f} MB")
+
+# --- 整体流程峰值内存 ---
+
+PIPELINE_MEMORY_RUNNER = """
+import sys, json, logging, resource
+sys.path.insert(0, sys.argv[1])
+import collect_games as cg
+logging.disable(logging.CRITICAL)
+cg.fetch_taptap_func = lambda date: 0 # history-only 模式下不会调用
+cg.fetch_16p_func = lambda: 0
+cg.match_versions_func = None
+cg._save_results = lambda *args: True # 只测内存中的处理流程 (Excel 为流式写出，与行数无关)
+result = cg.collect_all_game_data(process_history_only=True, full_rebuild=True)
+print(json.dumps({'records': len(result), 'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+def write_synthetic_history(target_data_dir, count, seed=42):
+    """生成合成的历史 JSONL：约 70% TapTap、30% 16p，同一游戏跨多个日期反复出现"""
+    rng = random.Random(seed)
+    statuses = ['测试', '上线', '预约', '不删档测试', '更新', '招募']
+    game_count = max(1, count // 5)
+    with open(os.path.join(target_data_dir, 'taptap_games.jsonl'), 'w', encoding='utf-8') as taptap_file, \
+         open(os.path.join(target_data_dir, 'p16_games.jsonl'), 'w', encoding='utf-8') as p16_file:
+        for index in range(count):
+            game_index = rng.randrange(game_count)
+            is_taptap = rng.random() < 0.7
+            record = {
+                'name': f"合成游戏{game_index}", 'date': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                'status': rng.choice(statuses), 'platform': rng.choice(['Android', 'iOS', 'PC']),
+                'category': rng.choice(['角色扮演', '策略', '休闲']), 'rating': f"{rng.uniform(5, 10):.1f}",
+                'publisher': f"厂商{game_index % 500}", 'source': 'TapTap' if is_taptap else rng.choice(['16p', 'AppStore']),
+                'link': f"https://example.com/app/{index}", 'icon_url': f"https://img.example.com/{game_index}.png",
+                'description': '合成的历史记录',
+            }
+            (taptap_file if is_taptap else p16_file).write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def bench_pipeline_memory(count):
+    """在临时目录中用合成历史跑一遍 collect_all_game_data (history-only, 全量重建)，报告子进程峰值 RSS"""
+    import shutil
+    import tempfile
+    import subprocess
+    with tempfile.TemporaryDirectory() as temp_root:
+        temp_scripts = os.path.join(temp_root, 'scripts')
+        os.makedirs(temp_scripts)
+        for file_name in os.listdir(script_dir):
+            if file_name.endswith('.py'):
+                shutil.copy2(os.path.join(script_dir, file_name), temp_scripts)
+        shutil.copytree(os.path.join(root_dir, 'config'), os.path.join(temp_root, 'config'))
+        os.makedirs(os.path.join(temp_root, 'data'))
+        write_synthetic_history(os.path.join(temp_root, 'data'), count)
+
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', PIPELINE_MEMORY_RUNNER, temp_scripts],
+                                check=True, capture_output=True, text=True).stdout
+        elapsed = time.perf_counter() - started
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"[pipeline_memory] {count} 条历史记录: 输出 {result['records']} 条, 耗时 {elapsed:.1f}s, 峰值 RSS {result['max_rss_mb']:.0f} MB")
+
+# --- 记录内存占用 (GameRecord 与字典的行为一致性见 tests/test_game_record.py) ---
+
+def records_size(records):
+    """记录列表的深度内存占用 (字节)：列表、每条记录及其引用的不同取值对象 (按对象身份只计一次)"""
+    seen = set()
+    total = sys.getsizeof(records)
+    for record in records:
+        total += sys.getsizeof(record)
+        values = record.to_dict().values() if hasattr(record, 'to_dict') else record.values()
+        for value in values:
+            if id(value) not in seen:
+                seen.add(id(value))
+                total += sys.getsizeof(value)
+    return total
+
+def iter_synthetic_jsonl_chunks(count, chunk_size=10000, seed=42):
+    """按块产出合成的 JSONL 原始记录 (与 write_synthetic_history 相同的分布)，每条记录的字符串都是独立解析出的副本"""
+    import tempfile
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_synthetic_history(temp_dir, count, seed)
+        for file_name in ['taptap_games.jsonl', 'p16_games.jsonl']:
+            with open(os.path.join(temp_dir, file_name), 'r', encoding='utf-8') as f:
+                chunk = []
+                for line in f:
+                    chunk.append(json.loads(line))
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    yield chunk
+
+def synthetic_backend_row(index, rng, pools):
+    """模拟 app.load_game_data 生成的一条记录：分类取值来自 Excel 共享字符串，日期按行新建"""
+    return {
+        'id': index, 'name': f"合成游戏{index // 5}", 'date': str(datetime(2025, rng.randint(1, 12), rng.randint(1, 28)))[:10],
+        'status': rng.choice(pools['status']), 'platform': rng.choice(pools['platform']), 'category': rng.choice(pools['category']),
+        'score': round(rng.uniform(5, 10), 1), 'publisher': rng.choice(pools['publisher']), 'source': rng.choice(pools['source']),
+        'is_featured': rng.random() < 0.05, 'link': f"https://example.com/app/{index}",
+        'icon_url': f"https://img.example.com/{index // 5}.png", 'description': '合成的历史记录',
+        'license_checked': False, 'license_name': None, 'approval_number': None, 'publication_number': None,
+        'approval_date': None, 'publishing_unit': None, 'operating_unit': None, 'license_game_type': None,
+        'application_category': None, 'license_multiple_results': None, 'manual_checked': False, 'manual_check_status': '',
+    }
+
+def load_backend_snapshot_store():
+    """按文件路径导入 backend/snapshot_store.py (后端目录不在脚本的导入路径中)"""
+    import importlib.util
+    spec = importlib.util.spec_from_file_location('snapshot_store', os.path.join(root_dir, 'backend', 'snapshot_store.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def bench_record_memory(count):
+    import gc
+    cg = load_collect_games()
+    excel_columns_map = cg.get_excel_columns()
+
+    def measure(label, build_chunk, chunks):
+        records = []
+        started = time.perf_counter()
+        for chunk in chunks:
+            records.extend(build_chunk(chunk))
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        size_mb = records_size(records) / 1024 / 1024
+        print(f"  {label}: {len(records)} 条记录 {size_mb:.0f} MB ({size_mb * 1024 * 1024 / max(1, len(records)):.0f} 字节/条), 耗时 (含生成合成数据) {elapsed:.1f}s")
+
+    # 流水线：标准化后的记录 (原始记录按块解析后即丢弃，只保留标准化输出)
+    print(f"[record_memory] 流水线标准化记录 ({count} 条合成 JSONL 记录)")
+    measure('GameRecord', lambda chunk: cg.standardize_game_data(chunk, excel_columns_map), iter_synthetic_jsonl_chunks(count))
+
+    # 后端：进程内快照中的记录
+    snapshot_store = load_backend_snapshot_store()
+    rng_seed = 42
+    pools = {
+        'status': ['测试', '上线', '预约', '不删档', '更新', '招募'], 'platform': ['Android', 'iOS', 'PC'],
+        'category': ['角色扮演', '策略', '休闲'], 'publisher': [f"厂商{i}" for i in range(500)],
+        'source': ['TapTap', '16p', 'AppStore'],
+    }
+    def backend_chunks():
+        rng = random.Random(rng_seed)
+        for start in range(0, count, 10000):
+            yield [synthetic_backend_row(index, rng, pools) for index in range(start, min(count, start + 10000))]
+    print(f"[record_memory] 后端快照记录 ({count} 条)")
+    measure('GameRecord', lambda chunk: [snapshot_store.GameRecord(row) for row in chunk], backend_chunks())
+
+# --- JSONL 读取 (与逐行解析的一致性见 tests/test_jsonl_reader.py) ---
+
+def bench_jsonl_read(count):
+    import tempfile
+    import jsonl_reader
+    parser_name = 'orjson' if jsonl_reader.orjson is not None else 'json (未安装 orjson)'
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_synthetic_history(temp_dir, count)
+        path = os.path.join(temp_dir, 'taptap_games.jsonl')
+        line_count = sum(1 for _ in open(path, 'rb'))
+        seconds, _ = timed(lambda p: list(jsonl_reader.iter_jsonl(p, workers=1)), path)
+        report_timing(f'jsonl_read 单进程 {parser_name}', line_count, seconds)
+        cpu_count = os.cpu_count() or 1
+        if cpu_count > 1:
+            # 强制切分为多个区段在进程池中解析 (实际运行时只有达到 PARALLEL_MIN_BYTES 的文件才会并行)
+            chunk_bytes = jsonl_reader.CHUNK_BYTES
+            jsonl_reader.CHUNK_BYTES = max(1, os.path.getsize(path) // (cpu_count * 4))
+            try:
+                parallel_seconds, _ = timed(lambda p: list(jsonl_reader.iter_jsonl(p, workers=cpu_count)), path)
+            finally:
+                jsonl_reader.CHUNK_BYTES = chunk_bytes
+            report_timing(f'jsonl_read {cpu_count} 进程 {parser_name}', line_count, parallel_seconds)
+
+# --- 爬虫已存在键加载 (与逐行解析的键集合的一致性见 tests/test_key_index.py) ---
+
+def _existing_game_key(data):
+    """与 taptap_selenium._existing_game_key 相同 (爬虫模块依赖 selenium，这里不导入)"""
+    name = data.get('name')
+    date = data.get('date')
+    if name and date and isinstance(name, str) and isinstance(date, str):
+        return (name.strip(), date.strip())
+    return None
+
+def bench_key_index(count):
+    import tempfile
+    import key_index
+    from jsonl_reader import iter_jsonl
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_synthetic_history(temp_dir, count)
+        path = os.path.join(temp_dir, 'taptap_games.jsonl')
+        started = time.perf_counter()
+        key_index.KeyIndex(path, _existing_game_key).close()
+        print(f"  [key_index] 首次构建索引 {time.perf_counter() - started:.3f}s")
+
+        def open_and_check():
+            index = key_index.KeyIndex(path, _existing_game_key)
+            hits = [key in index for key in probes]
+            index.close()
+            return hits
+        keys = set(iter_jsonl(path, project=_existing_game_key))
+        probes = sorted(keys)[:1000] + [('不存在的游戏', '2025-01-01')]
+        seconds, _ = timed(open_and_check)
+        report_timing(f'key_index 启动 + {len(probes)} 次查询', len(keys), seconds)
+
+# --- 原始记录压缩归档 (归档内容的校验见 tests/test_raw_partitions.py) ---
+
+def bench_raw_compaction(count):
+    import tempfile
+    import shutil
+    import raw_partitions
+    from jsonl_reader import iter_jsonl
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_synthetic_history(temp_dir, count)
+        path = os.path.join(temp_dir, 'taptap_games.jsonl')
+        # 模拟重复抓取：约一半记录被再次抓取并追加 (评分变化或字段缺失)，旧条目成为被取代的记录
+        rng = random.Random(7)
+        with open(path, 'r', encoding='utf-8') as f:
+            rescraped = [json.loads(line) for line in f if rng.random() < 0.5]
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in rescraped:
+                if rng.random() < 0.5:
+                    record['rating'] = f"{rng.uniform(5, 10):.1f}"
+                else:
+                    record['description'] = ''
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        appended_path = os.path.join(temp_dir, 'append_only.jsonl')
+        shutil.copy(path, appended_path)
+
+        append_only_seconds, append_only = timed(lambda: list(iter_jsonl(appended_path)))
+        report_timing('raw_compaction 未压缩的 JSONL 全量读取', len(append_only), append_only_seconds)
+        archive = raw_partitions.RawPartitions(path)
+        started = time.perf_counter()
+        result = archive.compact()
+        print(f"  [raw_compaction] 压缩 {result['records_read']} 条记录 -> {result['records_total']} 条 "
+              f"({result['partitions_total']} 个分区), 耗时 {time.perf_counter() - started:.3f}s")
+        seconds, _ = timed(lambda: [record for p in archive.paths() for record in iter_jsonl(p)])
+        report_timing('raw_compaction 压缩后全量读取', result['records_total'], seconds)
+
+        manifest_seconds, _ = timed(lambda: [entry['sha1'] for _, _, entry in archive.partitions()])
+        print(f"  [raw_compaction] 增量加载时读取清单、跳过全部未变化分区: {manifest_seconds * 1000:.2f}ms")
+
+# --- 爬虫输出写入 (写出内容的校验见 tests/test_jsonl_writer.py) ---
+
+def write_records(path, records, workers, durability='flush'):
+    from concurrent.futures import ThreadPoolExecutor
+    from jsonl_writer import JsonlWriter
+    with JsonlWriter(path, durability=durability) as writer, ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(writer.write, records))
+
+def bench_jsonl_write(count):
+    import tempfile
+    records = [record for chunk in iter_synthetic_jsonl_chunks(count) for record in chunk]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        def run(workers, durability):
+            path = os.path.join(temp_dir, 'out.jsonl')
+            if os.path.exists(path):
+                os.remove(path)
+            write_records(path, records, workers, durability)
+        for workers, durability in ((1, 'flush'), (3, 'flush'), (1, 'fsync')):
+            seconds, _ = timed(run, workers, durability)
+            report_timing(f'jsonl_write {workers} 线程 (durability={durability})', len(records), seconds)
+
+BENCHMARKS = {
+    'clean_names': bench_clean_names,
+    'status': bench_status,
+    'standardize': bench_standardize,
+    'dedup': bench_dedup,
+    'online_conflicts': bench_online_conflicts,
+    'old_tests': bench_old_tests,
+    'excel_write': bench_excel_write,
+    'pipeline_memory': bench_pipeline_memory,
+    'record_memory': bench_record_memory,
+    'jsonl_read': bench_jsonl_read,
+    'key_index': bench_key_index,
+    'raw_compaction': bench_raw_compaction,
+    'jsonl_write': bench_jsonl_write,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='数据处理流程微基准测试')
+    parser.add_argument('benchmarks', nargs='*', help=f"要运行的基准 (默认全部): {', '.join(BENCHMARKS)}")
+    parser.add_argument('-n', '--records', type=int, default=100000, help='合成记录数量')
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知的基准: {', '.join(unknown)}")
+
+    for name in args.benchmarks or list(BENCHMARKS):
+        BENCHMARKS[name](args.records)
+
+if __name__ == '__main__':
+    main()
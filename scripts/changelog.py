@@ -0,0 +1,175 @@
+# scripts/changelog.py
+# 运行间变更检测：按稳定 ID 计算每条记录的内容指纹，与上一次成功保存的结果比较，写出版本化的变更日志
+#
+# 目录结构 (data/changelog/):
+#   state.json                  上一次成功保存时各记录的指纹 {记录 ID: 指纹} 及当前版本号
+#   changelog_<版本号>.json      相对上一版本的增量：新增和内容变化的完整记录、被删除记录的 ID
+#
+# 记录 ID 为 (cleaned_name, date)，即去重键，在最终结果中唯一。
+# 指纹逐条计算，比较只做字典查找，整体耗时与记录数成线性关系。
+# 首次运行 (或状态文件丢失、损坏) 时没有可比较的上一版本，写出 baseline 版本：
+# 只记录条数，消费方应全量读取 all_games.json。没有任何变化时不生成新版本。
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+
+CHANGELOG_FORMAT = 1
+STATE_FILE = 'state.json'
+CHANGELOG_PREFIX = 'changelog_'
+KEEP_CHANGELOGS = 180 # 保留的变更日志版本数
+FINGERPRINT_LENGTH = 16 # 指纹取 SHA-1 前 16 个十六进制字符 (64 位)，足以区分同一 ID 的前后两个版本
+ID_SEPARATOR = '\x1f' # 状态文件中 ID 两部分之间的分隔符 (不会出现在清理后的名称中)
+
+def record_id(record):
+    """记录的稳定 ID: (cleaned_name, date)"""
+    return (record.get('cleaned_name', ''), record.get('date', ''))
+
+def record_fingerprint(record):
+    """记录内容指纹 (字段顺序无关)"""
+    payload = json.dumps(dict(record.items()), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:FINGERPRINT_LENGTH]
+
+def compute_fingerprints(records):
+    """返回 {记录 ID: 指纹} (按记录顺序) 及重复 ID 的数量 (重复时后出现的记录生效)"""
+    fingerprints = {}
+    duplicates = 0
+    for record in records:
+        key = record_id(record)
+        if key in fingerprints:
+            duplicates += 1
+        fingerprints[key] = record_fingerprint(record)
+    return fingerprints, duplicates
+
+def diff_fingerprints(previous, current):
+    """比较两次运行的指纹，返回 (新增 ID, 变化 ID, 删除 ID)，各自保持所在运行中的记录顺序"""
+    added = []
+    changed = []
+    for key, fingerprint in current.items():
+        previous_fingerprint = previous.get(key)
+        if previous_fingerprint is None:
+            added.append(key)
+        elif previous_fingerprint != fingerprint:
+            changed.append(key)
+    removed = [key for key in previous if key not in current]
+    return added, changed, removed
+
+class ChangelogStore:
+    """data/changelog/ 目录中的指纹状态和版本化变更日志"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.state_path = os.path.join(directory, STATE_FILE)
+
+    def changelog_path(self, version):
+        return os.path.join(self.directory, f"{CHANGELOG_PREFIX}{version:06d}.json")
+
+    def _changelog_versions(self):
+        if not os.path.isdir(self.directory):
+            return []
+        versions = []
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith(CHANGELOG_PREFIX) and file_name.endswith('.json'):
+                try:
+                    versions.append(int(file_name[len(CHANGELOG_PREFIX):-len('.json')]))
+                except ValueError:
+                    continue
+        return sorted(versions)
+
+    def load_state(self):
+        """返回 (版本号, {记录 ID: 指纹})；没有可用状态时指纹为 None"""
+        versions = self._changelog_versions()
+        latest_file_version = versions[-1] if versions else 0
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return latest_file_version, None
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"读取变更检测状态 {self.state_path} 失败: {e}，本次写出 baseline 版本。")
+            return latest_file_version, None
+        if state.get('format') != CHANGELOG_FORMAT:
+            logging.info("变更检测状态格式版本不同，本次写出 baseline 版本。")
+            return max(latest_file_version, state.get('version', 0)), None
+        fingerprints = {}
+        for joined_key, fingerprint in state.get('fingerprints', {}).items():
+            name, _, date = joined_key.partition(ID_SEPARATOR)
+            fingerprints[(name, date)] = fingerprint
+        return max(latest_file_version, state.get('version', 0)), fingerprints
+
+    def record_run(self, records):
+        """与上一版本比较并写出新的变更日志及状态，返回 (变更日志路径或 None, 统计)
+
+        没有变化时不生成新版本，路径为 None。
+        """
+        records = records if isinstance(records, list) else list(records)
+        fingerprints, duplicates = compute_fingerprints(records)
+        if duplicates:
+            logging.warning(f"变更检测: {duplicates} 条记录的 ID (cleaned_name, date) 重复，以后出现的记录为准。")
+        previous_version, previous = self.load_state()
+        baseline = previous is None
+        if baseline:
+            added, changed, removed = [], [], []
+        else:
+            added, changed, removed = diff_fingerprints(previous, fingerprints)
+
+        counts = {
+            'total': len(fingerprints),
+            'added': len(added),
+            'changed': len(changed),
+            'removed': len(removed),
+            'unchanged': len(fingerprints) - len(added) - len(changed),
+        }
+        if not baseline and not (added or changed or removed):
+            logging.info(f"变更检测: 与版本 {previous_version} 相比没有变化，不生成新的变更日志。")
+            return None, counts
+
+        version = previous_version + 1
+        changelog = {
+            'format': CHANGELOG_FORMAT,
+            'version': version,
+            'previous_version': previous_version or None,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'baseline': baseline,
+            'counts': counts,
+        }
+        if not baseline:
+            wanted = set(added)
+            wanted.update(changed)
+            records_by_id = {}
+            for record in records:
+                key = record_id(record)
+                if key in wanted:
+                    records_by_id[key] = dict(record.items())
+            changelog['added'] = [records_by_id[key] for key in added]
+            changelog['changed'] = [records_by_id[key] for key in changed]
+            changelog['removed'] = [{'cleaned_name': name, 'date': date} for name, date in removed]
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.changelog_path(version)
+        self._write_json(path, changelog, indent=2)
+        # 状态在变更日志之后写入：中途失败时下次运行仍与旧状态比较，变更不会丢失
+        self._write_json(self.state_path, {
+            'format': CHANGELOG_FORMAT,
+            'version': version,
+            'updated_at': changelog['created_at'],
+            'fingerprints': {f"{name}{ID_SEPARATOR}{date}": fingerprint for (name, date), fingerprint in fingerprints.items()},
+        })
+        self._prune()
+        return path, counts
+
+    def _write_json(self, path, payload, indent=None):
+        """原子写入 JSON (临时文件 + 重命名)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=indent, default=str)
+        os.replace(tmp_path, path)
+
+    def _prune(self):
+        for version in self._changelog_versions()[:-KEEP_CHANGELOGS]:
+            try:
+                os.remove(self.changelog_path(version))
+            except OSError as e:
+                logging.warning(f"删除旧变更日志版本 {version} 失败: {e}")
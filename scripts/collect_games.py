@@ -10,12 +10,16 @@ from datetime import datetime
 import pandas as pd
 import logging
 import glob # Needed for checking excel file
-import unicodedata # 添加 unicodedata 用于规范化
-import shutil # Added for backup before analysis
+import hashlib # 增量处理的记录哈希
+import itertools
+import gc # 内存中的记录处理阶段暂停循环垃圾回收
+import contextlib
+from concurrent.futures import ThreadPoolExecutor # 各来源并发抓取
 
 # --- 配置日志 ---
 log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
 os.makedirs(log_dir, exist_ok=True)
+RUN_REPORT_DIR = os.path.join(log_dir, 'run_reports') # 每次运行的阶段报告 (见 run_report.py)
 log_filename = os.path.join(log_dir, f'collect_games_{datetime.now().strftime("%Y%m%d")}.log')
 logging.basicConfig(
     level=logging.INFO, # Changed to INFO for clearer console output
@@ -36,10 +40,14 @@ os.makedirs(config_dir, exist_ok=True) # Ensure config dir exists
 
 # --- 全局配置变量 ---
 CONFIG = {}
+_name_cleaner = None # 按当前 CONFIG 编译的名称清理器，load_config 时重置
+_status_standardizer = None # 按当前 CONFIG 编译的状态标准化器，load_config 时重置
 
 def load_config(config_path=os.path.join(config_dir, 'collect_games_config.json')):
     """加载 JSON 配置文件"""
-    global CONFIG
+    global CONFIG, _name_cleaner, _status_standardizer
+    _name_cleaner = None
+    _status_standardizer = None
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
             CONFIG = json.load(f)
@@ -58,6 +66,16 @@ def load_config(config_path=os.path.join(config_dir, 'collect_games_config.json'
 if script_dir not in sys.path:
     sys.path.append(script_dir)
 
+from name_cleaning import get_name_cleaner
+from status_standardization import get_status_standardizer
+from game_record import GameRecord, to_json_value
+from run_report import RunReport
+from changelog import ChangelogStore
+from snapshot_history import SnapshotHistory
+from jsonl_reader import JsonlReadStats, iter_jsonl
+from raw_partitions import RawPartitions
+from file_lock import LockBusyError
+
 fetch_taptap_func = None
 fetch_16p_func = None
 match_versions_func = None
@@ -70,98 +88,52 @@ try:
     logging.info("成功导入 p16_selenium 模块。")
 except ImportError as e:
      logging.error(f"导入 p16_selenium 失败: {e} - 请确保文件已重命名为 p16_selenium.py")
-try: from version_matcher import match_version_numbers_for_games; match_versions_func = match_version_numbers_for_games; logging.info("成功导入 version_matcher 模块。")
+load_version_cache_func = None
+try:
+    from version_matcher import match_version_numbers_for_games, load_version_cache
+    match_versions_func = match_version_numbers_for_games
+    load_version_cache_func = load_version_cache
+    logging.info("成功导入 version_matcher 模块。")
 except ImportError as e: logging.error(f"导入 version_matcher 失败: {e}")
 # --- Add import for the analysis script --- 
 try:
-    from analyze_game_updates import analyze_and_remove_old_tests
+    from analyze_game_updates import remove_old_test_records
     logging.info("成功导入 analyze_game_updates 模块。")
 except ImportError as e:
-    analyze_and_remove_old_tests = None # Set to None if import fails
+    remove_old_test_records = None # Set to None if import fails
     logging.warning(f"导入 analyze_game_updates 失败，无法执行测试间隔清理: {e}")
 
 
 # --- 辅助函数 ---
 def clean_game_name(name):
-    """根据配置清理游戏名称"""
-    if not name: return "未知名称"
-    
-    cfg = CONFIG.get('game_name_cleaning', {})
-    norm_form = cfg.get('normalize_unicode_form', 'NFKC')
-    remove_patterns = cfg.get('remove_patterns_regex', [])
-    
-    # 1. Unicode 规范化
-    try:
-        normalized_name = unicodedata.normalize(norm_form, str(name))
-    except (TypeError, ValueError) as e:
-        logging.warning(f"Unicode规范化失败 ('{name}', form='{norm_form}'): {e}")
-        normalized_name = str(name) # Fallback
-        
-    cleaned = normalized_name
-    # 2. 应用正则表达式移除模式
-    for pattern in remove_patterns:
-        try:
-            # Check if pattern ends with flags like '$i' (case-insensitive)
-            flags = 0
-            if pattern.endswith('$'): # Assume case-insensitive if ends with $
-                 flags = re.IGNORECASE
-                 # Remove flag marker if present (simple check)
-                 if len(pattern) > 1 and pattern[-2] == 'i': pattern = pattern[:-2]
-                 else: pattern = pattern[:-1] # Just remove $
-            
-            cleaned = re.sub(pattern, '', cleaned, flags=flags)
-        except re.error as e:
-             logging.warning(f"应用名称清理正则失败 ('{pattern}'): {e}")
-             
-    # 3. 替换多个空格为单个空格
-    cleaned = re.sub(r'\s+', ' ', cleaned)
-    # 4. 去除首尾空格
-    cleaned = cleaned.strip()
-    
-    # 如果清理后为空，返回原始名称（规范化后）
-    return cleaned if cleaned else normalized_name.strip()
+    """根据配置清理游戏名称 (共享的预编译清理器，见 name_cleaning.py)"""
+    return _get_name_cleaner().clean(name)
+
+def clean_game_names(names):
+    """批量清理一列游戏名称，返回等长列表"""
+    return _get_name_cleaner().clean_many(names)
+
+def _get_name_cleaner():
+    global _name_cleaner
+    cleaner = _name_cleaner
+    if cleaner is None:
+        cleaner = _name_cleaner = get_name_cleaner(CONFIG.get('game_name_cleaning', {}))
+    return cleaner
 
 def standardize_status(status):
-    """根据配置标准化游戏状态"""
-    if not isinstance(status, str):
-        status = str(status)
-    
-    status_trimmed = status.strip()
-    if not status_trimmed: # Handle empty status
-        return "未知状态"
-        
-    status_lower = status_trimmed.lower()
-    
-    cfg = CONFIG.get('status_standardization', {})
+    """根据配置标准化游戏状态 (共享的预编译标准化器，见 status_standardization.py)"""
+    return _get_status_standardizer().standardize(status)
 
-    # 按优先级检查配置中的关键词
-    # 1. 招募
-    if any(keyword in status_trimmed for keyword in cfg.get('keywords_recruit', [])):
-        return cfg.get('status_recruit', status_trimmed) # Default to trimmed if status not in cfg
-        
-    # 2. 不删档
-    if any(keyword in status_lower for keyword in cfg.get('keywords_no_delete', [])):
-        return cfg.get('status_no_delete', status_trimmed)
-        
-    # 3. 其他测试
-    if any(keyword in status_lower for keyword in cfg.get('keywords_test', [])):
-        return cfg.get('status_test', status_trimmed)
-        
-    # 4. 预约
-    if any(keyword in status_lower for keyword in cfg.get('keywords_preorder', [])):
-        return cfg.get('status_preorder', status_trimmed)
-        
-    # 5. 上线
-    if any(keyword in status_lower for keyword in cfg.get('keywords_online', [])):
-        return cfg.get('status_online', status_trimmed)
-        
-    # 6. 更新
-    if any(keyword in status_lower for keyword in cfg.get('keywords_update', [])):
-        return cfg.get('status_update', status_trimmed)
+def standardize_statuses(statuses):
+    """批量标准化一列游戏状态，返回等长列表"""
+    return _get_status_standardizer().standardize_many(statuses)
 
-    # 7. 默认返回
-    logging.debug(f"状态 '{status_trimmed}' 未匹配任何标准化规则，返回原始值。")
-    return status_trimmed
+def _get_status_standardizer():
+    global _status_standardizer
+    standardizer = _status_standardizer
+    if standardizer is None:
+        standardizer = _status_standardizer = get_status_standardizer(CONFIG.get('status_standardization', {}))
+    return standardizer
 
 def extract_rating_value(rating_text):
     if isinstance(rating_text, (int, float)): return float(rating_text)
@@ -184,48 +156,81 @@ def get_excel_columns():
         "是否人工校对": "manual_checked"
     }
 
+def extract_rating_values(rating_texts):
+    """批量提取评分，同一批中重复的评分文本只解析一次"""
+    parsed = {}
+    ratings = []
+    for rating_text in rating_texts:
+        try:
+            value = parsed.get(rating_text)
+            if value is None:
+                value = parsed[rating_text] = extract_rating_value(rating_text)
+        except TypeError: # 不可哈希的值无法缓存
+            value = extract_rating_value(rating_text)
+        ratings.append(value)
+    return ratings
+
+# standardize_game_data 直接透传的字段: (字段名, 缺省值)，顺序即输出字典的键顺序
+_PASSTHROUGH_FIELDS_HEAD = [("platform", "未知平台"), ("category", "未知分类")]
+_PASSTHROUGH_FIELDS_TAIL = [
+    ("publisher", "未知厂商"), ("source", "未知来源"), ("link", ""), ("icon_url", ""), ("description", ""),
+    ("is_featured", False), ("version_checked", False),
+    ("nppa_name", ""), ("approval_num", ""), ("publication_num", ""), ("approval_date", ""), # From version matcher
+    ("publisher_unit", ""), ("operator_unit", ""),
+]
+_PASSTHROUGH_FIELDS_END = [("declaration_category", ""), ("multiple_results", ""), ("manual_checked", "")] # manual_checked: From Excel/default
+
 def standardize_game_data(games_list, excel_columns_map):
-    standardized_games = []
-    internal_field_names = list(excel_columns_map.values())
-    for game in games_list:
-        std_game = {}
-        # Use cleaned name for the main 'name' field
-        # Calculate cleaned name once
-        cleaned_name_val = game.get("cleaned_name") or clean_game_name(game.get("name", "未知名称"))
-        std_game["name"] = cleaned_name_val # Use the cleaned name for 'name'
-        std_game["cleaned_name"] = cleaned_name_val # Explicitly add the 'cleaned_name' field
-        std_game["date"] = game.get("date", datetime.now().strftime("%Y-%m-%d"))
-        std_game["status"] = standardize_status(game.get("status", "未知状态"))
-        std_game["platform"] = game.get("platform", "未知平台")
-        std_game["category"] = game.get("category", "未知分类")
-        std_game["rating"] = extract_rating_value(game.get("rating", "暂无评分"))
-        std_game["publisher"] = game.get("publisher", "未知厂商")
-        std_game["source"] = game.get("source", "未知来源")
-        std_game["link"] = game.get("link", "")
-        std_game["icon_url"] = game.get("icon_url", "")
-        std_game["description"] = game.get("description", "")
-        std_game["is_featured"] = game.get("is_featured", False)
-        std_game["version_checked"] = game.get("version_checked", False)
-        std_game["nppa_name"] = game.get("nppa_name", "") # From version matcher
-        std_game["approval_num"] = game.get("approval_num", "")
-        std_game["publication_num"] = game.get("publication_num", "")
-        std_game["approval_date"] = game.get("approval_date", "")
-        std_game["publisher_unit"] = game.get("publisher_unit", "")
-        std_game["operator_unit"] = game.get("operator_unit", "")
-        std_game["game_type_version"] = game.get("game_type_version") or game.get("game_type", "")
-        std_game["declaration_category"] = game.get("declaration_category", "")
-        std_game["multiple_results"] = game.get("multiple_results", "")
-        std_game["manual_checked"] = game.get("manual_checked", "") # From Excel/default
-        # Ensure all fields exist
-        for field in internal_field_names:
-            if field not in std_game:
-                if field == "rating": std_game[field] = 0.0
-                elif field in ["is_featured", "version_checked"]: std_game[field] = False
-                elif field == "manual_checked": std_game[field] = ""
-                elif field == "nppa_name": std_game[field] = ""
-                else: std_game[field] = ""
-        standardized_games.append(std_game)
-    return standardized_games
+    """把原始记录转换为统一字段的记录 (GameRecord)
+
+    按列批量处理：先逐字段取出整列，再对名称、状态、评分整列做批量转换
+    (重复值只计算一次)，最后按行组装记录。输出与逐条处理完全一致。
+    """
+    games_list = games_list if isinstance(games_list, list) else list(games_list)
+    if not games_list:
+        return []
+
+    def column(field, default):
+        return [game.get(field, default) for game in games_list]
+
+    # Use cleaned name for the main 'name' field; 已有 cleaned_name 的记录不再清理
+    cleaned_names = [game.get("cleaned_name") for game in games_list]
+    pending_indices = [index for index, value in enumerate(cleaned_names) if not value]
+    if pending_indices:
+        pending_names = clean_game_names([games_list[index].get("name", "未知名称") for index in pending_indices])
+        for index, cleaned in zip(pending_indices, pending_names):
+            cleaned_names[index] = cleaned
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    keys = ["name", "cleaned_name", "date", "status"]
+    columns = [
+        cleaned_names,
+        cleaned_names, # Explicitly add the 'cleaned_name' field
+        column("date", today),
+        standardize_statuses(column("status", "未知状态")),
+    ]
+    for field, default in _PASSTHROUGH_FIELDS_HEAD:
+        keys.append(field)
+        columns.append(column(field, default))
+    keys.append("rating")
+    columns.append(extract_rating_values(column("rating", "暂无评分")))
+    for field, default in _PASSTHROUGH_FIELDS_TAIL:
+        keys.append(field)
+        columns.append(column(field, default))
+    keys.append("game_type_version")
+    columns.append([game.get("game_type_version") or game.get("game_type", "") for game in games_list])
+    for field, default in _PASSTHROUGH_FIELDS_END:
+        keys.append(field)
+        columns.append(column(field, default))
+
+    # Ensure all fields exist (自定义列映射中多出的字段)
+    for field in excel_columns_map.values():
+        if field not in keys:
+            keys.append(field)
+            default = False if field in ["is_featured", "version_checked"] else ""
+            columns.append([default] * len(games_list))
+
+    return GameRecord.from_columns(keys, columns)
 
 def _filter_appstore_games(games_list, is_history_data=False):
     """根据配置过滤 AppStore 特定记录"""
@@ -286,130 +291,150 @@ def _calculate_richness(game_dict):
     return sum(1 for v in game_dict.values() if v not in [None, '', False, 0, 0.0])
 
 def _deduplicate_games(combined_games, locked_records):
-    """根据配置对合并后的游戏列表进行去重"""
+    """根据配置对合并后的游戏列表进行去重，返回 (去重后的列表, 冲突报告)
+
+    单次遍历完成：锁定记录优先；其余记录按 (cleaned_name, date) 取首次出现的一条，
+    键与锁定记录相同的直接跳过。若记录自带的 cleaned_name 为空，写入结果时的键
+    可能与已保留的记录相撞，此时按来源优先级、再按丰富度决定保留哪一条。
+    来源优先级和丰富度每条记录最多计算一次，冲突明细写入报告而不是逐条写日志。
+    """
     logging.info("--- 开始处理重复项 --- ")
     cfg = CONFIG.get('deduplication', {})
-    source_priority_list = [src.lower() for src in cfg.get('source_priority', [])]
+    source_ranks = {} # 小写来源 -> 优先级 (下标越小越优先)
+    for index, src in enumerate(cfg.get('source_priority', [])):
+        source_ranks.setdefault(src.lower(), index)
     compare_richness = cfg.get('compare_richness', True)
-    
-    unique_milestones = {}
-    duplicates_info = {'skipped_locked_conflict': 0, 'replaced_by_source': 0, 'replaced_by_richness': 0, 'kept_existing': 0}
-    
+
+    report = {
+        'locked_records': len(locked_records),
+        'candidates': 0,              # 非锁定且键唯一、参与合并的记录
+        'skipped_locked_key': 0,      # 键与锁定记录相同而跳过
+        'skipped_duplicate_key': 0,   # 键已出现过 (保留首次出现的记录) 而跳过
+        'replaced_by_source': 0,
+        'replaced_by_richness': 0,
+        'kept_existing': 0,
+        'conflicts': [],              # 按来源/丰富度裁决的冲突明细
+    }
+
     # 1. Locked records have highest priority
-    processed_keys = set(locked_records.keys()) # Keys from locked records
-    unique_milestones.update(locked_records)    # Add locked records first
+    unique_milestones = dict(locked_records)
     logging.info(f"保留 {len(locked_records)} 条锁定记录。")
-    
-    # 2. Process remaining games - Refined Filtering
-    # Filter out games whose keys ALREADY match a locked key more explicitly
-    games_to_process = []
-    keys_added_to_process = set() # Track keys of non-locked items we decide to process
+    seen_keys = set(locked_records.keys())
+    holder_scores = {} # 键 -> 当前保留记录的 [来源优先级, 丰富度]，按需计算
 
-    for g in combined_games:
-        # Ensure cleaned_name exists for key calculation, especially for new data
-        name_for_key = g.get('cleaned_name')
-        if not name_for_key:
-             name_for_key = clean_game_name(g.get('name'))
-             if 'cleaned_name' not in g: # Store back if newly calculated
-                 g['cleaned_name'] = name_for_key
-
-        date_for_key = g.get('date', '0000-00-00')
-        current_key = (name_for_key, date_for_key)
-
-        is_locked_key = current_key in processed_keys
-
-        # Only add if the key doesn't belong to a locked record
-        # AND we haven't already added another non-locked record with the same key
-        if not is_locked_key:
-            if current_key not in keys_added_to_process:
-                games_to_process.append(g)
-                keys_added_to_process.add(current_key)
-            # else: # Debugging log (optional): Found another non-locked item with the same key, skipping.
-            #    logging.debug(f"过滤步骤：跳过重复的非锁定键 {current_key} 来自记录: {g.get('name')}")
-
-    logging.info(f"筛选后准备处理 {len(games_to_process)} 条候选记录 (非锁定且键唯一)。") # Log count after filtering
-
-    # 3. Process the filtered list
-    for game in games_to_process:
-        # We no longer need to check if 'key in processed_keys' here,
-        # because the filtering step above should have removed all conflicts with locked keys.
-        # Ensure cleaned_name exists (might be redundant but safe)
-        if 'cleaned_name' not in game:
-            game['cleaned_name'] = clean_game_name(game.get('name'))
+    def source_rank(game):
+        return source_ranks.get(game.get('source', '').strip().lower(), -1)
 
-        name = game.get('cleaned_name')
+    # 2. 单次遍历其余记录
+    candidates = skipped_locked_key = skipped_duplicate_key = 0
+    for game in combined_games:
+        # Ensure cleaned_name exists for key calculation, especially for new data
+        cleaned_name = game.get('cleaned_name')
         date = game.get('date', '0000-00-00')
-        key = (name, date)
+        if cleaned_name:
+            key = candidate_key = (cleaned_name, date)
+        else:
+            name_for_key = clean_game_name(game.get('name'))
+            if 'cleaned_name' not in game: # Store back if newly calculated
+                game['cleaned_name'] = name_for_key
+            candidate_key = (name_for_key, date)
+            key = (game.get('cleaned_name'), date) # 自带的 cleaned_name 为空时，写入键与筛选键不同
+
+        if candidate_key in seen_keys:
+            if candidate_key in locked_records:
+                skipped_locked_key += 1
+            else:
+                skipped_duplicate_key += 1
+            continue
+        seen_keys.add(candidate_key)
+        candidates += 1
 
-        # The key should either be new or already exist from another non-locked record added in this loop
-        if key not in unique_milestones:
+        existing_game = unique_milestones.get(key)
+        if existing_game is None:
             unique_milestones[key] = game
+            continue
+
+        # 键相撞：按来源优先级，其次按丰富度决定
+        existing_scores = holder_scores.get(key)
+        if existing_scores is None:
+            existing_scores = holder_scores[key] = [source_rank(existing_game), None]
+        new_scores = [source_rank(game), None]
+        new_priority, existing_priority = new_scores[0], existing_scores[0]
+
+        if new_priority != -1 and (existing_priority == -1 or new_priority < existing_priority):
+            replaced, reason = True, 'source'
+        elif existing_priority != -1 and (new_priority == -1 or existing_priority < new_priority):
+            replaced, reason = False, 'source'
+        elif compare_richness:
+            if existing_scores[1] is None:
+                existing_scores[1] = _calculate_richness(existing_game)
+            new_scores[1] = _calculate_richness(game)
+            replaced, reason = new_scores[1] > existing_scores[1], 'richness'
         else:
-            # This is the intended deduplication for non-locked items with the same key
-            existing_game = unique_milestones[key]
-            new_source = game.get('source', '').strip().lower()
-            existing_source = existing_game.get('source', '').strip().lower()
-
-            logging.debug(f"去重检查 (非锁定间): Key={key}")
-            logging.debug(f"  新记录: source='{new_source}', status='{game.get('status')}'")
-            logging.debug(f"  旧记录 (已保留的非锁定): source='{existing_source}', status='{existing_game.get('status')}'")
-
-            replaced = False
-            reason = "Kept Existing Non-Locked"
-
-            # Apply Source Priority
-            new_priority = -1
-            existing_priority = -1
-            try: new_priority = source_priority_list.index(new_source)
-            except ValueError: pass
-            try: existing_priority = source_priority_list.index(existing_source)
-            except ValueError: pass
-
-            if new_priority != -1 and (existing_priority == -1 or new_priority < existing_priority):
-                logging.debug(f"  决策: 按来源优先级替换 (新: {new_source} @{new_priority}, 旧: {existing_source} @{existing_priority})")
-                unique_milestones[key] = game
-                replaced = True
-                reason = "Replaced by Source Priority"
-                duplicates_info['replaced_by_source'] += 1
-            elif existing_priority != -1 and (new_priority == -1 or existing_priority < new_priority):
-                 logging.debug(f"  决策: 按来源优先级保留旧记录 (新: {new_source} @{new_priority}, 旧: {existing_source} @{existing_priority})")
-                 replaced = False # Kept existing based on source priority
-                 reason = "Kept Existing (Source Priority)"
-                 duplicates_info['kept_existing'] += 1
-            # If sources don't decide or compare_richness is False, keep existing unless richness comparison applies
-            elif compare_richness:
-                new_richness = _calculate_richness(game)
-                existing_richness = _calculate_richness(existing_game)
-                logging.debug(f"  比较丰富度: 新={new_richness}, 旧={existing_richness}")
-                if new_richness > existing_richness:
-                    logging.debug("  决策: 按丰富度替换")
-                    unique_milestones[key] = game
-                    replaced = True
-                    reason = "Replaced by Richness"
-                    duplicates_info['replaced_by_richness'] += 1
-                else:
-                    logging.debug("  决策: 按丰富度保留旧记录")
-                    replaced = False # Keep existing due to richness
-                    reason = "Kept Existing (Richness or Equal)"
-                    duplicates_info['kept_existing'] += 1
-            else:
-                 # Keep existing if source didn't decide and richness comparison disabled
-                 logging.debug("  决策: 来源未定且丰富度比较已禁用，保留旧记录")
-                 replaced = False
-                 reason = "Kept Existing (No Deciding Rule)"
-                 duplicates_info['kept_existing'] += 1
+            replaced, reason = False, 'no_rule'
 
+        if replaced:
+            unique_milestones[key] = game
+            holder_scores[key] = new_scores
+            report['replaced_by_' + reason] += 1
+        else:
+            report['kept_existing'] += 1
+        kept, dropped = (game, existing_game) if replaced else (existing_game, game)
+        report['conflicts'].append({
+            'key': key,
+            'reason': reason,
+            'replaced': replaced,
+            'kept_source': kept.get('source', ''),
+            'dropped_source': dropped.get('source', ''),
+        })
+
+    report['candidates'] = candidates
+    report['skipped_locked_key'] = skipped_locked_key
+    report['skipped_duplicate_key'] = skipped_duplicate_key
     final_list = list(unique_milestones.values())
-    # Note: 'skipped_locked_conflict' count is no longer relevant with the new filtering logic
-    total_processed_duplicates = duplicates_info['replaced_by_source'] + duplicates_info['replaced_by_richness'] + duplicates_info['kept_existing']
+    total_processed_duplicates = report['replaced_by_source'] + report['replaced_by_richness'] + report['kept_existing']
+    logging.info(f"筛选后处理 {report['candidates']} 条候选记录 (非锁定且键唯一)，跳过与锁定记录同键 {report['skipped_locked_key']} 条、重复键 {report['skipped_duplicate_key']} 条。")
     logging.info(f"去重完成。最终保留 {len(final_list)} 条记录。")
-    # Removed skipped_locked_conflict from the final log message
-    logging.info(f"  去重统计 (非锁定记录间): 按来源替换={duplicates_info['replaced_by_source']}, 按丰富度替换={duplicates_info['replaced_by_richness']}, 保留旧记录={duplicates_info['kept_existing']} (总冲突处理={total_processed_duplicates})" )
-
-    return final_list
+    logging.info(f"  去重统计 (非锁定记录间): 按来源替换={report['replaced_by_source']}, 按丰富度替换={report['replaced_by_richness']}, 保留旧记录={report['kept_existing']} (总冲突处理={total_processed_duplicates})" )
+
+    return final_list, report
+
+def _add_conflict_note(record, note):
+    """在 manual_checked 中追加冲突备注 (已包含时不重复追加)"""
+    existing_note = record.get('manual_checked', '')
+    if existing_note and note not in existing_note:
+        record['manual_checked'] = f"{existing_note}; {note}"
+    elif not existing_note:
+        record['manual_checked'] = note
+
+def _first_occurrences(records):
+    """按相等性 (==) 去重，返回每组相等记录中第一条的下标
+
+    与原实现中 list.index() 的语义一致：相等的字典只会定位到第一条。
+    """
+    first_indices = []
+    seen_fingerprints = set()
+    unhashable = []
+    for index, record in enumerate(records):
+        try:
+            fingerprint = frozenset(record.items())
+        except TypeError: # 含有列表等不可哈希的值，退回逐个比较
+            if any(record == other for other in unhashable):
+                continue
+            unhashable.append(record)
+            first_indices.append(index)
+            continue
+        if fingerprint not in seen_fingerprints:
+            seen_fingerprints.add(fingerprint)
+            first_indices.append(index)
+    return first_indices
 
 def _resolve_online_conflicts(games_list):
-    """根据配置处理同一个游戏有多个'上线'状态记录的冲突"""
+    """根据配置处理同一个游戏有多个'上线'状态记录的冲突
+
+    按名称分组一次，组内只保存记录下标，每组的上线记录、AppStore 记录都只扫描一遍，
+    整体时间和内存与记录数成线性关系。
+    """
     logging.info("--- 开始处理上线日期冲突 --- ")
     cfg = CONFIG.get('online_conflict', {})
     strategy = cfg.get('strategy', 'log_only') # Default to just logging if not specified
@@ -421,108 +446,124 @@ def _resolve_online_conflicts(games_list):
         logging.info("上线冲突处理已禁用。")
         return games_list
 
-    games_grouped = {}
-    for game in games_list:
+    status_online = CONFIG.get('status_standardization', {}).get('status_online', '上线')
+
+    # 名称 -> 组内记录下标；同时记下每组中上线记录的下标
+    group_indices = {}
+    online_indices = {}
+    for index, game in enumerate(games_list):
         name = game.get('cleaned_name') or clean_game_name(game.get('name'))
         if 'cleaned_name' not in game: game['cleaned_name'] = name
-        if name not in games_grouped:
-            games_grouped[name] = []
-        games_grouped[name].append(game)
+        indices = group_indices.get(name)
+        if indices is None:
+            indices = group_indices[name] = []
+        indices.append(index)
+        if game.get('status') == status_online:
+            online_indices.setdefault(name, []).append(index)
 
     conflict_resolved_count = 0
     final_processed_list = [] # Use a new list for the final output
 
-    for name, original_group in games_grouped.items():
-        status_online = CONFIG.get('status_standardization', {}).get('status_online', '上线')
-        
-        # Make a copy of the group to potentially modify
-        current_group = list(original_group)
-        
-        # Initial check for online records in the current group state
-        online_records = [g for g in current_group if g.get('status') == status_online]
+    for name, indices in group_indices.items():
+        group_online = online_indices.get(name, ())
+        if len(group_online) <= 1:
+            # No initial conflict in this group, add all its records to the final list
+            final_processed_list.extend(games_list[index] for index in indices)
+            continue
+
+        online_records = [games_list[index] for index in group_online]
+        logging.warning(f"游戏 '{name}' 发现 {len(online_records)} 条上线记录冲突: {[g.get('date') for g in online_records]}")
+        conflict_resolved_count += 1
+
+        # --- 处理 AppStore 来源冲突 ---
+        removed_indices = set()
+        appstore_online = [index for index in group_online if games_list[index].get('source', '').lower() == appstore_source_name]
+        if appstore_online and len(appstore_online) < len(group_online):
+            logging.info(f"  检测到 AppStore 与其他来源的上线冲突。正在移除 {len(appstore_online)} 条 AppStore 上线记录。")
+            appstore_records = [games_list[index] for index in appstore_online]
+            removed_indices = {appstore_online[position] for position in _first_occurrences(appstore_records)}
+            # Re-evaluate online records after removal
+            online_records = [games_list[index] for index in group_online if index not in removed_indices]
+            logging.info(f"  移除 AppStore 记录后，剩余 {len(online_records)} 条上线记录待处理。")
+        # --- AppStore 逻辑结束 ---
 
         if len(online_records) > 1:
-            logging.warning(f"游戏 '{name}' 发现 {len(online_records)} 条上线记录冲突: {[g.get('date') for g in online_records]}")
-            conflict_resolved_count += 1
-
-            # --- 新增逻辑: 处理 AppStore 来源冲突 --- 
-            appstore_online_records = [g for g in online_records if g.get('source', '').lower() == appstore_source_name]
-            non_appstore_online_records = [g for g in online_records if g.get('source', '').lower() != appstore_source_name]
-            appstore_removed_count = 0
-
-            if appstore_online_records and non_appstore_online_records:
-                 logging.info(f"  检测到 AppStore 与其他来源的上线冲突。正在移除 {len(appstore_online_records)} 条 AppStore 上线记录。")
-                 # Create a new group excluding the conflicting AppStore records
-                 indices_to_remove = {current_group.index(g) for g in appstore_online_records if g in current_group}
-                 new_group = [g for i, g in enumerate(current_group) if i not in indices_to_remove]
-                 appstore_removed_count = len(current_group) - len(new_group)
-                 current_group = new_group # Update the group being processed
-                 # Re-evaluate online records after removal
-                 online_records = [g for g in current_group if g.get('status') == status_online]
-                 logging.info(f"  移除 AppStore 记录后，剩余 {len(online_records)} 条上线记录待处理。")
-            # --- AppStore 逻辑结束 ---
-
-            # --- 继续处理剩余的上线冲突 (如果还有 > 1条) --- 
-            if len(online_records) > 1: 
-                 # Check strategy only if there's still a conflict after potential AppStore removal
-                 if strategy == 'log_only':
-                     logging.info(f"  策略 '{strategy}': 仅记录剩余冲突，不修改记录。")
-                     # Add the potentially modified group (with AppStore removed) to the final list
-                     final_processed_list.extend(current_group)
-                     continue # Move to the next group
-                 
-                 elif strategy == 'add_note_keep_latest':
-                     logging.info(f"  策略 '{strategy}': 保留剩余冲突中最新日期记录，为其他冲突记录添加备注/改状态。")
-                     # Sort remaining online records by date, latest first
-                     online_records.sort(key=lambda g: g.get('date', '0000-00-00'), reverse=True)
-                     
-                     latest_online_record = online_records[0]
-                     logging.info(f"    保留剩余冲突中的最新上线记录: {latest_online_record.get('date')}")
-                     # Add note to the latest record
-                     existing_note_latest = latest_online_record.get('manual_checked', '')
-                     if existing_note_latest and note_latest not in existing_note_latest:
-                         latest_online_record['manual_checked'] = f"{existing_note_latest}; {note_latest}"
-                     elif not existing_note_latest:
-                         latest_online_record['manual_checked'] = note_latest
-                     
-                     # Process older online records among the remaining ones
-                     for old_record in online_records[1:]:
-                         logging.info(f"    处理剩余冲突中的旧上线记录: {old_record.get('date')}")
-                         # Add note
-                         existing_note_old = old_record.get('manual_checked', '')
-                         if existing_note_old and note_old not in existing_note_old:
-                             old_record['manual_checked'] = f"{existing_note_old}; {note_old}"
-                         elif not existing_note_old:
-                             old_record['manual_checked'] = note_old
-                         # Change status
-                         old_record['status'] = "未知状态"
-                         logging.info(f"      状态已修改为 '未知状态'")
-                     
-                     # Add the modified group (including non-online records and updated online ones) to the final list
-                     final_processed_list.extend(current_group)
-                 
-                 else:
-                     logging.warning(f"  未知的上线冲突处理策略: '{strategy}'。不修改剩余冲突记录。")
-                     final_processed_list.extend(current_group)
-            
-            else: # <= 1 online record after potential AppStore removal, conflict resolved
-                 if appstore_removed_count > 0:
-                      logging.info(f"  移除 AppStore 记录后，上线冲突已解决。")
-                 else: # This case shouldn't be reached if the initial check found > 1, but included for safety
-                      logging.info(f"  冲突检查后无需进一步操作。")
-                 final_processed_list.extend(current_group) # Add the potentially modified group
+            # Check strategy only if there's still a conflict after potential AppStore removal
+            if strategy == 'log_only':
+                logging.info(f"  策略 '{strategy}': 仅记录剩余冲突，不修改记录。")
+            elif strategy == 'add_note_keep_latest':
+                logging.info(f"  策略 '{strategy}': 保留剩余冲突中最新日期记录，为其他冲突记录添加备注/改状态。")
+                # Sort remaining online records by date, latest first (稳定排序，同日期保持组内顺序)
+                online_records.sort(key=lambda g: g.get('date', '0000-00-00'), reverse=True)
+                latest_online_record = online_records[0]
+                logging.info(f"    保留剩余冲突中的最新上线记录: {latest_online_record.get('date')}")
+                _add_conflict_note(latest_online_record, note_latest)
+
+                # Process older online records among the remaining ones
+                for old_record in online_records[1:]:
+                    logging.info(f"    处理剩余冲突中的旧上线记录: {old_record.get('date')}")
+                    _add_conflict_note(old_record, note_old)
+                    old_record['status'] = "未知状态"
+                    logging.info(f"      状态已修改为 '未知状态'")
+            else:
+                logging.warning(f"  未知的上线冲突处理策略: '{strategy}'。不修改剩余冲突记录。")
+        elif removed_indices:
+            logging.info(f"  移除 AppStore 记录后，上线冲突已解决。")
+        else: # This case shouldn't be reached if the initial check found > 1, but included for safety
+            logging.info(f"  冲突检查后无需进一步操作。")
 
-        else:
-            # No initial conflict in this group, add all its records to the final list
-            final_processed_list.extend(current_group)
+        # Add the group (AppStore conflicts removed, online records updated) to the final list
+        final_processed_list.extend(games_list[index] for index in indices if index not in removed_indices)
 
     if conflict_resolved_count > 0:
         logging.info(f"处理了 {conflict_resolved_count} 个游戏的上线日期冲突。")
     else:
         logging.info("未发现上线日期冲突。")
-        
+
     return final_processed_list # Return the newly built list
 
+# --- 流式处理辅助函数 ---
+# 各阶段以记录迭代器衔接，只有去重和冲突处理保存按键索引的记录；
+# 需要整列批量计算的阶段 (标准化) 按块处理，块大小与总记录数无关。
+STREAM_CHUNK_SIZE = 10000
+
+def _iter_chunks(records, chunk_size=STREAM_CHUNK_SIZE):
+    """把记录迭代器切分为列表块"""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _drain(records):
+    """按原顺序逐条取出列表中的记录，并随即释放列表对它们的引用"""
+    records.reverse()
+    while records:
+        yield records.pop()
+
+def _iter_frame_records(df, chunk_size=STREAM_CHUNK_SIZE):
+    """逐块把 DataFrame 转为记录字典，避免一次性生成整表的 to_dict('records')"""
+    for start in range(0, len(df), chunk_size):
+        yield from df.iloc[start:start + chunk_size].to_dict('records')
+
+def iter_standardized_games(games, excel_columns_map, chunk_size=STREAM_CHUNK_SIZE):
+    """流式版本的 standardize_game_data：按块批量标准化，逐条产出"""
+    for chunk in _iter_chunks(games, chunk_size):
+        yield from standardize_game_data(chunk, excel_columns_map)
+
+def _iter_with_excel_feature_flags(games, excel_feature_flags, locked_records, stats):
+    """把 Excel 历史记录中的 '是否重点' 标记应用到名称/日期匹配且未锁定的记录上，成功应用的 True 标记数计入 stats"""
+    for std_game in games:
+        key = (std_game.get('cleaned_name'), std_game.get('date'))
+        if key in excel_feature_flags and key not in locked_records:
+            std_game['is_featured'] = excel_feature_flags[key]
+            if excel_feature_flags[key]: # Only count if flag was True
+                 stats['applied_flags'] += 1
+        yield std_game
+
 # --- Data Loading Functions ---
 
 def _load_excel_data(master_excel_file, excel_columns_map):
@@ -565,11 +606,9 @@ def _load_excel_data(master_excel_file, excel_columns_map):
         date_col = 'date'
         cleaned_name_col = 'cleaned_name' # Assume cleaned_name might exist in Excel
 
-        excel_records_list = df_excel.to_dict('records')
-
-        for record in excel_records_list:
-            # Create a dictionary for the current record using internal field names
-            current_game_record = {}
+        for record in _iter_frame_records(df_excel):
+            # Create a record for the current row using internal field names
+            current_game_record = GameRecord()
             # Prioritize existing cleaned_name, else clean the 'name'
             original_name = record.get(name_col, '')
             if cleaned_name_col in record and pd.notna(record[cleaned_name_col]) and record[cleaned_name_col].strip():
@@ -598,7 +637,7 @@ def _load_excel_data(master_excel_file, excel_columns_map):
             is_featured_excel = str(record.get(is_featured_col, '')).strip().lower() in ['true', '是', 'yes', '1']
             is_manually_checked = str(record.get(manual_checked_col, '')).strip() # Keep the string value for checking
 
-            # Populate the record dict using internal field names mapped from config
+            # Populate the record using internal field names mapped from config
             for internal_field in excel_columns_map.values():
                 value = record.get(internal_field) # Direct access using internal name
                 if internal_field == 'rating': current_game_record[internal_field] = float(value) if pd.notna(value) else 0.0
@@ -620,6 +659,8 @@ def _load_excel_data(master_excel_file, excel_columns_map):
             if is_manually_checked.lower() in ['true', '是', 'yes', '1', '错误']:
                  locked_records[key] = current_game_record # Add to locked records if checked or marked as error
 
+        del df_excel # 记录已全部转换，尽早释放整表
+
         featured_count = sum(1 for flag in excel_feature_flags.values() if flag)
         logging.info(f"从主 Excel 加载了 {len(all_excel_records)} 条记录，其中 {len(locked_records)} 条为人工校对/错误标记记录，{featured_count} 条标记为重点。")
 
@@ -629,107 +670,454 @@ def _load_excel_data(master_excel_file, excel_columns_map):
 
     return all_excel_records, locked_records, excel_feature_flags
 
-def _fetch_new_data(fetch_taptap, fetch_16p, process_history_only=False):
-    """根据选择调用爬虫(如果不是 history_only 模式)并加载新数据"""
-    newly_fetched_games = []
+# --- 增量处理: JSONL 字节偏移检查点 + 记录哈希清单 ---
+# 爬虫只向 JSONL 文件追加记录，上次成功运行处理过的记录已合并进主 Excel。
+# 每次只读取检查点之后追加的字节，并按记录哈希跳过内容未变化的重复记录，
+# 使日常运行的耗时只与当天新增记录数有关。检查点只在主文件成功保存后更新。
+INCREMENTAL_STATE_FILE = os.path.join(data_dir, 'collect_incremental_state.json')
+INCREMENTAL_STATE_VERSION = 1
+CHECKPOINT_HEAD_BYTES = 4096 # 用文件开头的内容指纹识别文件被替换或重写
+
+def _config_fingerprint():
+    """影响 JSONL 记录处理结果的配置指纹；配置变化后已处理记录的结果可能不同，需要全量重建"""
+    relevant = {k: v for k, v in CONFIG.items() if k != 'analysis_min_interval_days'}
+    return hashlib.sha1(json.dumps(relevant, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _record_identity(game):
+    """记录身份键：同一来源、同一原始名称、同一日期视为同一条记录"""
+    return json.dumps([game.get('source', ''), game.get('name', ''), game.get('date', '') or game.get('status_date', '')], ensure_ascii=False)
+
+def _record_hash(game):
+    return hashlib.sha1(json.dumps(game, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _load_incremental_state(full_rebuild=False):
+    """加载增量状态；文件缺失、损坏、版本或配置指纹不符时返回空状态 (即全量重建)"""
+    empty_state = {'version': INCREMENTAL_STATE_VERSION, 'config_hash': _config_fingerprint(), 'files': {}, 'manifest': {}}
+    if full_rebuild:
+        logging.info("已指定 --full-rebuild，忽略增量检查点，重新处理全部 JSONL 记录。")
+        return empty_state
+    if not os.path.exists(INCREMENTAL_STATE_FILE):
+        logging.info("未找到增量检查点，本次将处理全部 JSONL 记录并建立检查点。")
+        return empty_state
+    try:
+        with open(INCREMENTAL_STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"读取增量检查点 {INCREMENTAL_STATE_FILE} 失败: {e}，本次全量重建。")
+        return empty_state
+    if state.get('version') != INCREMENTAL_STATE_VERSION:
+        logging.info("增量检查点格式版本不同，本次全量重建。")
+        return empty_state
+    if state.get('config_hash') != empty_state['config_hash']:
+        logging.info("处理配置已变化，之前的检查点不再适用，本次全量重建。")
+        return empty_state
+    state.setdefault('files', {})
+    state.setdefault('manifest', {})
+    logging.info(f"已加载增量检查点: {len(state['files'])} 个文件，清单中 {len(state['manifest'])} 条记录。")
+    return state
+
+def _save_incremental_state(state):
+    """原子写入增量状态 (临时文件 + 重命名)"""
+    tmp_file = f"{INCREMENTAL_STATE_FILE}.tmp"
+    try:
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_file, INCREMENTAL_STATE_FILE)
+        logging.info(f"增量检查点已更新: {INCREMENTAL_STATE_FILE} (清单 {len(state['manifest'])} 条记录)")
+    except Exception as e:
+        logging.error(f"保存增量检查点失败: {e}。下次运行将重新处理这些记录。", exc_info=True)
+
+# --- 运行间变更检测 (见 changelog.py) ---
+CHANGELOG_DIR = os.path.join(data_dir, 'changelog')
+
+def _record_changelog(final_games_list, stage):
+    """与上次保存的结果比较，写出版本化的变更日志；失败不影响本次运行结果"""
+    try:
+        path, counts = ChangelogStore(CHANGELOG_DIR).record_run(final_games_list)
+    except Exception as e:
+        logging.error(f"写出变更日志失败: {e}。下次运行将与上一次成功写出的版本比较。", exc_info=True)
+        return None
+    stage.details.update(counts)
+    if path:
+        stage.details['changelog'] = os.path.basename(path)
+        logging.info(f"变更日志已写出: {path} (新增 {counts['added']}, 变化 {counts['changed']}, 删除 {counts['removed']})")
+    return counts
+
+# --- 主 Excel 历史版本 (见 snapshot_history.py) ---
+HISTORY_DIR = os.path.join(data_dir, 'history')
+
+def _snapshot_workbook(history, excel_file, metadata):
+    """把现有工作簿整体存为一个历史版本 (首次启用历史快照、恢复前保存当前状态时使用)"""
+    from openpyxl import load_workbook
+    workbook = load_workbook(excel_file, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = list(next(rows, ()))
+        return history.save(header, (list(row) for row in rows), metadata)
+    finally:
+        workbook.close()
+
+def _begin_history_snapshot(master_excel_file, header):
+    """准备本次保存的历史快照写入器；历史中还没有任何版本时，先把保存前的主 Excel 导入为基线版本"""
+    try:
+        history = SnapshotHistory(HISTORY_DIR)
+        if not history.list_versions() and os.path.exists(master_excel_file):
+            logging.info("历史快照为空，先将保存前的主 Excel 导入为基线版本。")
+            _snapshot_workbook(history, master_excel_file, {'source': 'baseline_import'})
+        return history.begin(header)
+    except Exception as e:
+        logging.error(f"准备历史快照失败: {e}。本次保存不生成历史版本。", exc_info=True)
+        return None
+
+def _commit_history_snapshot(snapshot_writer, metadata, stage):
+    """主 Excel 保存成功后提交历史版本并执行保留策略；失败不影响本次运行结果"""
+    try:
+        manifest = snapshot_writer.commit(metadata)
+        if manifest is None:
+            return
+        stage.details['history_version'] = manifest['version']
+        stage.details['history_new_blocks'] = manifest['new_blocks']
+        snapshot_writer.history.prune()
+    except Exception as e:
+        logging.error(f"提交历史快照失败: {e}", exc_info=True)
+
+def list_snapshots():
+    """列出历史快照中的所有版本"""
+    manifests = SnapshotHistory(HISTORY_DIR).manifests()
+    if not manifests:
+        print(f"历史快照目录 {HISTORY_DIR} 中还没有任何版本。")
+        return
+    for manifest in manifests:
+        source = manifest.get('metadata', {}).get('source', '')
+        print(f"版本 {manifest['version']:>4}  {manifest['created_at']}  {manifest['record_count']:>8} 行  "
+              f"{len(manifest['blocks'])} 个数据块 (新增 {manifest.get('new_blocks', 0)})  {source}")
+
+def restore_snapshot(as_of):
+    """把主 Excel 恢复为历史版本 (版本号、日期或时间点，取不晚于该时间点的最新版本)，返回是否成功
+
+    恢复前先把当前主 Excel 存为一个新版本，人工修改不会因恢复而丢失。
+    恢复后清除增量检查点，下次运行以恢复后的主 Excel 为基础对 JSONL 全量重建，并重新生成 all_games.json。
+    """
+    master_excel_file = os.path.join(data_dir, "all_games_data.xlsx")
+    history = SnapshotHistory(HISTORY_DIR)
+    try:
+        version = history.resolve(as_of)
+    except ValueError as e:
+        logging.error(str(e))
+        return False
+    if version is None:
+        logging.error(f"历史快照中没有与 '{as_of}' 对应的版本。可用 --list-snapshots 查看所有版本。")
+        return False
+
+    try:
+        manifest = history.load_manifest(version)
+        if os.path.exists(master_excel_file):
+            current = _snapshot_workbook(history, master_excel_file, {'source': 'pre_restore', 'restore_target': version})
+            if current is not None:
+                logging.info(f"恢复前的主 Excel 已保存为历史版本 {current['version']}。")
+        _write_excel_rows(manifest['header'], history.iter_rows(version, manifest), master_excel_file)
+    except Exception as e:
+        logging.error(f"恢复历史版本 {version} 失败: {e}。主 Excel 未被修改。", exc_info=True)
+        return False
+
+    try:
+        os.remove(INCREMENTAL_STATE_FILE)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logging.error(f"清除增量检查点失败: {e}。请手动删除 {INCREMENTAL_STATE_FILE} 或下次运行时使用 --full-rebuild。")
+    logging.info(f"主 Excel 已恢复为历史版本 {version} ({manifest['created_at']}, {manifest['record_count']} 行)。"
+                 "下次运行将对 JSONL 全量重建。")
+    return True
+
+def _load_jsonl_records(file_path, incremental_state=None, checkpoint_key=None):
+    """读取 JSONL 文件中的记录 (checkpoint_key 为该文件在检查点中的键，默认为文件名)
+
+    incremental_state 为 None 时读取全部记录。否则从该文件的字节偏移检查点开始读取，
+    跳过清单中哈希未变化的记录，并在 incremental_state 中记录新的偏移和哈希
+    (由调用方在主文件保存成功后持久化)。文件被截断或开头内容变化时从头读取。
+    末尾未写完的半行不会被消费，留待下次读取。解析由 jsonl_reader.iter_jsonl 完成 (orjson + 内存映射，大文件并行)。
+    """
+    file_name = os.path.basename(file_path)
+    checkpoint_key = checkpoint_key or file_name
+    records = []
+    with open(file_path, 'rb') as f:
+        head = f.read(CHECKPOINT_HEAD_BYTES)
+        size = os.fstat(f.fileno()).st_size
+    head_hash = hashlib.sha1(head).hexdigest()
+
+    start_offset = 0
+    if incremental_state is not None:
+        checkpoint = incremental_state['files'].get(checkpoint_key)
+        if checkpoint:
+            checkpoint_offset = checkpoint.get('offset', 0)
+            checkpoint_head = hashlib.sha1(head[:checkpoint_offset]).hexdigest() if checkpoint_offset < CHECKPOINT_HEAD_BYTES else head_hash
+            if checkpoint_offset > size or checkpoint_head != checkpoint.get('head_hash'):
+                logging.warning(f"{file_name} 已被截断或重写，从文件开头重新读取 (仍按清单跳过未变化的记录)。")
+            else:
+                start_offset = checkpoint_offset
+        if start_offset:
+            logging.info(f"{file_name}: 从检查点偏移 {start_offset} 继续读取 (文件大小 {size} 字节)。")
+
+    new_count = changed_count = unchanged_count = 0
+    stats = JsonlReadStats(start_offset)
+    for game in iter_jsonl(file_path, start_offset, stats):
+        if incremental_state is not None:
+            identity = _record_identity(game)
+            record_hash = _record_hash(game)
+            previous_hash = incremental_state['manifest'].get(identity)
+            if previous_hash == record_hash:
+                unchanged_count += 1
+                continue
+            if previous_hash is None: new_count += 1
+            else: changed_count += 1
+            incremental_state['manifest'][identity] = record_hash
+        records.append(game)
+    if stats.bad_lines:
+        logging.warning(stats.describe_bad_lines(file_name))
+
+    offset = stats.end_offset
+    if incremental_state is not None:
+        incremental_state['files'][checkpoint_key] = {
+            'offset': offset,
+            'head_hash': hashlib.sha1(head[:offset]).hexdigest() if offset < CHECKPOINT_HEAD_BYTES else head_hash,
+        }
+        logging.info(f"{file_name}: 新增 {new_count} 条，内容变化 {changed_count} 条，跳过未变化 {unchanged_count} 条。")
+    return records
+
+def _load_source_records(output_file, incremental_state=None):
+    """读取一个来源的全部原始记录：先按清单读取压缩归档的各月分区 (见 raw_partitions.py)，再读取活动 JSONL
+
+    增量模式下，清单中 SHA-1 与检查点相同的分区自上次成功运行后没有变化，直接跳过，不打开文件；
+    变化的分区 (压缩时并入了新记录) 从头读取，仍按清单跳过内容未变化的记录。
+    """
+    raw = RawPartitions(output_file)
+    records = []
+    skipped = 0
+    for month, path, entry in raw.partitions():
+        checkpoint_key = raw.checkpoint_key(month)
+        if incremental_state is not None:
+            checkpoint = incremental_state['files'].pop(checkpoint_key, None) # 分区整体重写，不沿用字节偏移
+            if checkpoint and checkpoint.get('sha1') == entry['sha1']:
+                incremental_state['files'][checkpoint_key] = checkpoint
+                skipped += 1
+                continue
+        records.extend(_load_jsonl_records(path, incremental_state, checkpoint_key))
+        if incremental_state is not None:
+            incremental_state['files'][checkpoint_key]['sha1'] = entry['sha1']
+    if skipped:
+        logging.info(f"{raw.name}: {skipped} 个归档分区自上次运行后没有变化，已跳过。")
+    records.extend(_load_jsonl_records(output_file, incremental_state))
+    return records
+
+@contextlib.contextmanager
+def _gc_paused():
+    """暂停自动循环垃圾回收，结束后恢复并回收一次
+
+    记录对象 (GameRecord) 之间没有循环引用，百万条记录时分代回收会反复遍历全部记录。
+    只用于纯内存的记录处理阶段；爬虫 (Selenium、线程池) 和版号匹配运行时回收保持开启。
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+            gc.collect()
+
+def compact_raw_files():
+    """把 TapTap 和 16p 的活动 JSONL 压缩归档到按月分区 (data/raw/)，返回是否全部成功
+
+    有爬虫正在写入的文件跳过压缩并记为失败 (见 file_lock)。
+    """
+    success = True
+    for file_name in ['taptap_games.jsonl', 'p16_games.jsonl']:
+        raw = RawPartitions(os.path.join(data_dir, file_name))
+        try:
+            result = raw.compact()
+        except LockBusyError:
+            logging.error(f"{file_name} 正在被爬虫写入，跳过压缩。请在爬虫结束后重新运行 --compact-raw。")
+            success = False
+            continue
+        except Exception as e:
+            logging.error(f"压缩 {file_name} 失败: {e}。活动 JSONL 未被修改。", exc_info=True)
+            success = False
+            continue
+        if not result['compacted']:
+            logging.info(f"{file_name}: 没有需要压缩的记录。")
+            continue
+        logging.info(f"{file_name}: 读取 {result['records_read']} 条记录，合并重复 (来源, 名称, 日期) {result['collapsed']} 条，"
+                     f"写出 {result['partitions_written']} 个月份分区；归档共 {result['partitions_total']} 个分区、"
+                     f"{result['records_total']} 条记录 (第 {result['generation']} 代)。")
+    return success
+
+def _fetch_source(source_label, scrape, output_file, process_history_only, incremental_state, current_date_str, fill_missing_date=False):
+    """抓取并加载单个来源，返回 (预处理后的记录, 各阶段耗时)
+
+    非 history-only 模式下先运行爬虫；爬虫结束后立即加载该来源的 JSONL，
+    并完成名称清理和 AppStore 过滤，不等待其他来源。
+    """
+    timings = {'scrape': 0.0, 'load': 0.0, 'preprocess': 0.0, 'records': 0}
+    load_desc = "新增/变化的" if incremental_state is not None else ""
+
+    if not process_history_only: # Only run scraper if not in history-only mode
+        logging.info(f"--- (在线) 开始获取 {source_label} 数据 --- ")
+        started = time.perf_counter()
+        try:
+            new_count_reported = scrape()
+            logging.info(f"{source_label} 爬虫完成，报告新增 {new_count_reported} 条记录到文件。")
+        except Exception as e:
+            logging.error(f"在线获取 {source_label} 数据时出错: {e}", exc_info=True)
+            new_count_reported = 0 # Assume failure means 0 new
+        timings['scrape'] = time.perf_counter() - started
+    else:
+        logging.info(f"--- (本地) 跳过在线获取 {source_label} 数据 (history-only模式) ---")
+        new_count_reported = "(未执行)" # Indicate scraper didn't run
+
+    # Always try to load from file
+    logging.info(f"--- (本地) 开始加载 {source_label} 文件: {output_file} ---")
+    if not os.path.exists(output_file):
+        logging.warning(f"{source_label} 数据文件 {output_file} 不存在。即使爬虫报告成功({new_count_reported}条)，也无法加载数据。")
+        return [], timings
+
+    started = time.perf_counter()
+    try:
+        games = _load_source_records(output_file, incremental_state)
+        if fill_missing_date:
+            for game in games:
+                # Ensure date exists (maybe redundant now but safe)
+                if 'date' not in game or not game['date']:
+                    game['date'] = game.get('status_date') or current_date_str
+    except Exception as e:
+        if not fill_missing_date:
+            raise
+        logging.error(f"读取或解析 {source_label} 文件 {output_file} 时出错: {e}", exc_info=True)
+        games = []
+    timings['load'] = time.perf_counter() - started
+    if not games:
+        logging.info(f"{source_label} 文件没有{load_desc}数据。爬虫报告新增 {new_count_reported} 条。")
+        return [], timings
+    logging.info(f"从 {source_label} 文件加载了 {len(games)} 条{load_desc}数据。")
+
+    # Clean names first (batch), ensure cleaned_name exists for key calculation/filtering
+    started = time.perf_counter()
+    games_missing_name = [game for game in games if not game.get('cleaned_name')]
+    cleaned_names = clean_game_names(game.get('name') for game in games_missing_name)
+    for game, cleaned_name in zip(games_missing_name, cleaned_names):
+         game['cleaned_name'] = cleaned_name # Store back
+
+    # Treat loaded JSONL data as "new" unless in history_only mode
+    logging.info(f"对 {source_label} 数据应用 AppStore 过滤规则 (is_history_data={process_history_only})")
+    games = _filter_appstore_games(games, is_history_data=process_history_only)
+    timings['preprocess'] = time.perf_counter() - started
+    timings['records'] = len(games)
+    return games, timings
+
+def _fetch_new_data(fetch_taptap, fetch_16p, process_history_only=False, incremental_state=None, stage=None):
+    """根据选择调用爬虫(如果不是 history_only 模式)并加载新数据
+
+    各来源在各自的线程中并发抓取，哪个来源先结束就先加载并预处理 (名称清理、AppStore 过滤)
+    它的 JSONL。返回的记录按 TapTap、16p 的固定顺序拼接，与来源完成的先后无关。
+    传入 incremental_state 时只加载上次成功运行后追加或内容变化的记录 (见 _load_jsonl_records)；
+    两个文件的记录来源不同，身份键不会重叠，并发更新清单不会互相影响。
+    传入运行报告的阶段 (stage) 时，各来源的耗时写入其 details，--profile 模式下每个来源单独生成性能分析结果
+    (Python 3.12+ 上各来源因此依次运行，见 run_report.StageRecord.call_profiled)。
+    """
+    load_desc = "新增/变化的" if incremental_state is not None else ""
     current_date_str = datetime.now().strftime("%Y-%m-%d")
     taptap_output_file = os.path.join(data_dir, 'taptap_games.jsonl')
     p16_output_file = os.path.join(data_dir, 'p16_games.jsonl')
 
-    # --- TapTap ---
+    sources = [] # (来源名称, 抓取函数, JSONL 文件, 是否补全日期)
     if fetch_taptap and fetch_taptap_func:
-        if not process_history_only: # Only run scraper if not in history-only mode
-             logging.info("--- (在线) 开始获取 TapTap 数据 --- ")
-             try:
-                 taptap_new_count_reported = fetch_taptap_func(current_date_str)
-                 logging.info(f"TapTap 爬虫完成，报告新增 {taptap_new_count_reported} 条记录到文件。")
-             except Exception as e:
-                 logging.error(f"在线获取 TapTap 数据时出错: {e}", exc_info=True)
-                 taptap_new_count_reported = 0 # Assume failure means 0 new
-        else:
-             logging.info("--- (本地) 跳过在线获取 TapTap 数据 (history-only模式) ---")
-             taptap_new_count_reported = "(未执行)" # Indicate scraper didn't run
-
-        # Always try to load from file
-        logging.info(f"--- (本地) 开始加载 TapTap 文件: {taptap_output_file} ---")
-        if os.path.exists(taptap_output_file):
-            tap_all_games = []
-            with open(taptap_output_file, 'r', encoding='utf-8') as f_tap:
-                for line in f_tap:
-                    try:
-                        game = json.loads(line)
-                        tap_all_games.append(game)
-                    except json.JSONDecodeError:
-                         logging.warning(f"解析 {os.path.basename(taptap_output_file)} 时跳过无效行: {line.strip()}")
-            if tap_all_games:
-                 logging.info(f"从 TapTap 文件加载了 {len(tap_all_games)} 条数据。")
-                 newly_fetched_games.extend(tap_all_games)
-            else:
-                 logging.info(f"TapTap 文件为空或无法解析。爬虫报告新增 {taptap_new_count_reported} 条。")
-        else:
-            logging.warning(f"TapTap 数据文件 {taptap_output_file} 不存在。即使爬虫报告成功({taptap_new_count_reported}条)，也无法加载数据。")
-
+        sources.append(("TapTap", lambda: fetch_taptap_func(current_date_str), taptap_output_file, False))
     elif fetch_taptap: logging.warning("TapTap 模块未加载，跳过 TapTap 处理。")
     else: logging.info("根据用户选择，跳过 TapTap 数据处理。")
 
-
-    # --- 16p ---
     if fetch_16p and fetch_16p_func:
-        if not process_history_only: # Only run scraper if not in history-only mode
-             logging.info("--- (在线) 开始获取 16p (好游快爆/AppStore) 数据 --- ")
-             try:
-                 p16_new_count_reported = fetch_16p_func()
-                 logging.info(f"16p 爬虫完成，报告新增 {p16_new_count_reported} 条记录到文件。")
-             except Exception as e:
-                 logging.error(f"在线获取 16p 数据时出错: {e}", exc_info=True)
-                 p16_new_count_reported = 0
-        else:
-             logging.info("--- (本地) 跳过在线获取 16p 数据 (history-only模式) ---")
-             p16_new_count_reported = "(未执行)"
-
-        # Always try to load from file
-        logging.info(f"--- (本地) 开始加载 16p 文件: {p16_output_file} ---")
-        if os.path.exists(p16_output_file):
-            try: # Add try-except for file reading/parsing
-                 with open(p16_output_file, 'r', encoding='utf-8') as f_16p:
-                      p16_all_games = []
-                      for line in f_16p:
-                          try:
-                               game = json.loads(line)
-                               # Ensure date exists (maybe redundant now but safe)
-                               if 'date' not in game or not game['date']:
-                                   game['date'] = game.get('status_date') or current_date_str
-                               p16_all_games.append(game)
-                          except json.JSONDecodeError:
-                               logging.warning(f"解析 {os.path.basename(p16_output_file)} 时跳过无效行: {line.strip()}")
-                 if p16_all_games:
-                      logging.info(f"从 16p 文件加载了 {len(p16_all_games)} 条数据。")
-                      newly_fetched_games.extend(p16_all_games)
-                 else:
-                      logging.info(f"16p 文件为空或无法解析。爬虫报告新增 {p16_new_count_reported} 条。")
-            except Exception as e:
-                 logging.error(f"读取或解析 16p 文件 {p16_output_file} 时出错: {e}", exc_info=True)
-        else:
-             logging.warning(f"16p 数据文件 {p16_output_file} 不存在。即使爬虫报告成功({p16_new_count_reported}条)，也无法加载数据。")
-
+        sources.append(("16p", lambda: fetch_16p_func(), p16_output_file, True))
     elif fetch_16p: logging.warning("16p 模块未加载，跳过 16p 处理。")
     else: logging.info("根据用户选择，跳过 16p 数据处理。")
 
+    newly_fetched_games = []
+    if sources:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix='fetch') as executor:
+            futures = [
+                executor.submit(_fetch_source, source_label, scrape, output_file, process_history_only,
+                                incremental_state, current_date_str, fill_missing_date)
+                if stage is None else
+                executor.submit(stage.call_profiled, source_label, _fetch_source, source_label, scrape, output_file,
+                                process_history_only, incremental_state, current_date_str, fill_missing_date)
+                for source_label, scrape, output_file, fill_missing_date in sources
+            ]
+            results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+
+        for (source_label, _, _, _), (games, timings) in zip(sources, results):
+            newly_fetched_games.extend(games)
+            logging.info(f"来源耗时 [{source_label}]: 抓取 {timings['scrape']:.2f}s, 加载 {timings['load']:.2f}s, "
+                         f"预处理 {timings['preprocess']:.2f}s, 得到 {timings['records']} 条记录")
+        logging.info(f"各来源并发处理总耗时 {elapsed:.2f}s (串行合计约 {sum(sum(t[k] for k in ('scrape', 'load', 'preprocess')) for _, t in results):.2f}s)")
+        if stage is not None:
+            stage.details['sources'] = {
+                source_label: {key: round(value, 3) for key, value in timings.items()}
+                for (source_label, _, _, _), (_, timings) in zip(sources, results)
+            }
+
     log_mode = "本地文件" if process_history_only else "在线爬取+本地文件"
-    logging.info(f"通过 '{log_mode}' 模式，总共获取到 {len(newly_fetched_games)} 条来自 JSONL 文件的数据待处理。")
+    logging.info(f"通过 '{log_mode}' 模式，总共获取到 {len(newly_fetched_games)} 条来自 JSONL 文件的{load_desc}数据待处理 (已清理名称并完成 AppStore 过滤)。")
     return newly_fetched_games
 
+def _months_between(earlier_month, later_month):
+    """两个 YYYY-MM 月份之间相差的月数，格式无效时视为相差很久"""
+    try:
+        y1, m1 = (int(x) for x in str(earlier_month).split('-')[:2])
+        y2, m2 = (int(x) for x in str(later_month).split('-')[:2])
+    except (ValueError, TypeError):
+        return 9999
+    return (y2 - y1) * 12 + (m2 - m1)
+
+def _cached_version_state(cleaned_name, version_cache, current_month, negative_recheck_months):
+    """按 cleaned_name 查询已持久化的版号匹配状态
+
+    返回 ('positive', 结果)、('negative', None) 或 (None, None)。后者表示从未查询过，
+    或者无结果的记录已过期 (距上次查询满 negative_recheck_months 个月)，需要交给匹配器重新查询。
+    有结果的记录不过期，与 version_matcher 的缓存规则一致。
+    """
+    if not cleaned_name or cleaned_name == "未知名称":
+        return 'negative', None # 匹配器对空名称直接返回无结果
+    entry = version_cache.get(cleaned_name)
+    if entry is None:
+        return None, None
+    if entry.get('result') is not None:
+        return 'positive', entry['result']
+    if _months_between(entry.get('query_month', '2000-01'), current_month) < negative_recheck_months:
+        return 'negative', None
+    return None, None
+
 def _run_version_matching(games_list, locked_records, description="数据"):
-    """对未锁定的游戏运行版号匹配并合并结果"""
+    """对未锁定的游戏运行版号匹配并合并结果
+
+    已有匹配状态 (版号缓存中有结果，或无结果但尚未过期) 的名称直接使用缓存结果，
+    不再进入匹配器；其余名称每个只查询一次，结果分发给同名的所有记录。
+    """
     if not match_versions_func or not games_list:
         if not match_versions_func: logging.warning(f"版号匹配模块未导入，跳过 {description} 匹配。")
         else: logging.info(f"没有需要进行版号匹配的 {description}。")
         return games_list # Return original list if no matching needed/possible
-        
-    games_to_match = []
-    original_indices = {} 
+
+    cfg = CONFIG.get('version_matching', {})
+    negative_recheck_months = cfg.get('negative_result_recheck_months', 1)
+    current_month = datetime.now().strftime("%Y-%m")
+    version_cache = load_version_cache_func() if load_version_cache_func else {}
+
+    indices_by_name = {} # cleaned_name -> 需要匹配结果的记录下标
     skipped_locked_count = 0
-    
+    skipped_positive_count = 0
+    skipped_negative_count = 0
+
     for i, game in enumerate(games_list):
          if 'cleaned_name' not in game: game['cleaned_name'] = clean_game_name(game.get('name'))
          name = game['cleaned_name']
@@ -740,36 +1128,54 @@ def _run_version_matching(games_list, locked_records, description="数据"):
          if key in locked_records:
              skipped_locked_count += 1
              continue # Skip locked records
-             
-         matcher_index = len(games_to_match)
-         original_indices[matcher_index] = i
-         games_to_match.append({"name": name, "_original_index": matcher_index})
+
+         # --- 已有未过期匹配状态的名称直接应用缓存结果 ---
+         state, cached_result = _cached_version_state(name, version_cache, current_month, negative_recheck_months)
+         if state == 'positive':
+             game.update(cached_result)
+             game['version_checked'] = True
+             skipped_positive_count += 1
+             continue
+         if state == 'negative':
+             game['version_checked'] = True
+             skipped_negative_count += 1
+             continue
+
+         indices_by_name.setdefault(name, []).append(i)
 
     if skipped_locked_count > 0:
          logging.info(f"版号匹配：跳过 {skipped_locked_count} 条已锁定记录 ({description})。")
+    pending_record_count = sum(len(indices) for indices in indices_by_name.values())
+    logging.info(
+        f"版号匹配统计 ({description}): 共 {len(games_list)} 条，锁定跳过 {skipped_locked_count}，"
+        f"缓存有结果跳过 {skipped_positive_count}，缓存无结果未过期跳过 {skipped_negative_count}，"
+        f"需查询 {pending_record_count} 条记录 / {len(indices_by_name)} 个名称。"
+    )
 
-    if not games_to_match:
-        logging.info(f"没有需要进行版号匹配的未锁定 {description}。")
+    if not indices_by_name:
+        logging.info(f"没有需要进行版号匹配的未锁定 {description}，不启动匹配器。")
         return games_list
-        
-    logging.info(f"--- 开始对 {len(games_to_match)} 条未锁定 {description} 进行版号匹配 --- ")
+
+    games_to_match = [{"name": name, "_original_index": matcher_index} for matcher_index, name in enumerate(indices_by_name)]
+    names_by_matcher_index = list(indices_by_name)
+
+    logging.info(f"--- 开始对 {len(games_to_match)} 个名称 ({description}) 进行版号匹配 --- ")
     try:
         match_versions_func(games_to_match) # Modifies games_to_match in place
         
         matched_count = 0
         for matched_info in games_to_match:
             matcher_idx = matched_info.get("_original_index", -1)
-            original_idx = original_indices.get(matcher_idx, -1)
-            
-            if original_idx != -1 and original_idx < len(games_list):
+            if not (0 <= matcher_idx < len(names_by_matcher_index)):
+                 logging.warning(f"无法将版号匹配结果合并回原始记录 (匹配器索引 {matcher_idx})。")
+                 continue
+            update_data = {k: v for k, v in matched_info.items() if k not in ['name', '_original_index']}
+            for original_idx in indices_by_name[names_by_matcher_index[matcher_idx]]:
                 target_game = games_list[original_idx]
-                update_data = {k: v for k, v in matched_info.items() if k not in ['name', '_original_index']}
                 target_game.update(update_data)
                 target_game['version_checked'] = True 
                 if update_data.get('approval_num'):
                      matched_count += 1
-            else:
-                 logging.warning(f"无法将版号匹配结果合并回索引 {original_idx} (匹配器索引 {matcher_idx}) 的原始记录。")
                  
         logging.info(f"{description} 版号匹配完成，成功匹配 {matched_count} 条。")
     except Exception as e:
@@ -777,60 +1183,159 @@ def _run_version_matching(games_list, locked_records, description="数据"):
 
     return games_list
     
-def _save_results(final_games_list, master_json_file, master_excel_file, excel_columns_map):
-    """保存最终结果到 JSON 和 Excel 文件"""
+EXCEL_TRUE_VALUES = ['true', '是', 'yes', '1']
+
+def _excel_flag_cell(value):
+    """布尔列 (是否重点、版号已查) 导出为 '是' 或空"""
+    return '是' if value is True or str(value).strip().lower() in EXCEL_TRUE_VALUES else ''
+
+def _excel_manual_checked_cell(value):
+    """是否人工校对列：简单的 True/Yes/1 转为 '是'，其余备注原样保留"""
+    text = str(value)
+    return '是' if text.lower() in ['true', 'yes', '1'] else text
+
+def _excel_plain_cell(value):
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, float) and value != value: # NaN 写为空单元格
+        return None
+    return value
+
+def _write_master_excel(final_games_list, master_excel_file, excel_columns_map, snapshot_writer=None):
+    """以 openpyxl 只写模式逐行写出主 Excel，先写临时文件再原子替换
+
+    只写模式下已写出的行不再保留在内存中，峰值内存与行数无关。
+    单元格取值与之前经 DataFrame.to_excel 导出的结果一致：
+    某字段在所有记录中都不存在时按默认值填充，仅部分记录缺失时写为空单元格。
+    传入 snapshot_writer (snapshot_history.SnapshotWriter) 时，写出的每一行同时写入历史快照。
+    """
+    internal_fields = list(excel_columns_map.values())
+    present_fields = set()
+    for game in final_games_list:
+        present_fields.update(game.keys())
+        if len(present_fields) >= len(internal_fields) and present_fields.issuperset(internal_fields):
+            break
+
+    # 每列的取值函数：(记录) -> 单元格值
+    column_getters = []
+    for field in internal_fields:
+        if field in ['is_featured', 'version_checked']: # Format boolean columns for Excel
+            if field in present_fields:
+                column_getters.append(lambda game, field=field: _excel_flag_cell(game.get(field, float('nan'))))
+            else:
+                column_getters.append(lambda game: '')
+        elif field == 'manual_checked': # Handle manual_checked notes correctly
+            if field in present_fields:
+                column_getters.append(lambda game: _excel_manual_checked_cell(game.get('manual_checked', float('nan'))))
+            else:
+                column_getters.append(lambda game: '')
+        elif field in present_fields:
+            column_getters.append(lambda game, field=field: _excel_plain_cell(game.get(field)))
+        else:
+            default = 0.0 if field == 'rating' else ''
+            column_getters.append(lambda game, default=default: default)
+
+    header_names = {v: k for k, v in excel_columns_map.items()}
+    header = [header_names[field] for field in internal_fields]
+    rows = ([getter(game) for getter in column_getters] for game in final_games_list)
+    _write_excel_rows(header, rows, master_excel_file, snapshot_writer)
+
+def _write_excel_rows(header, rows, master_excel_file, snapshot_writer=None):
+    """按表头和单元格取值逐行写出工作簿 (主 Excel 导出和历史快照恢复共用)"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Border, Font, Side
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    # 表头样式与 pandas 导出时一致
+    thin = Side(style='thin')
+    header_font = Font(bold=True)
+    header_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header_alignment = Alignment(horizontal='center', vertical='top')
+    header_row = []
+    for name in header:
+        cell = WriteOnlyCell(sheet, value=name)
+        cell.font, cell.border, cell.alignment = header_font, header_border, header_alignment
+        header_row.append(cell)
+    sheet.append(header_row)
+
+    for row in rows:
+        sheet.append(row)
+        if snapshot_writer is not None:
+            snapshot_writer.add(row)
+
+    temp_file = f"{master_excel_file}.tmp"
+    try:
+        workbook.save(temp_file)
+        os.replace(temp_file, master_excel_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+def _save_results(final_games_list, master_json_file, master_excel_file, excel_columns_map, snapshot_writer=None):
+    """保存最终结果到 JSON 和 Excel 文件，返回主 Excel 文件是否保存成功"""
     logging.info("--- 保存最终结果 (覆盖主文件) --- ")
     # Save JSON
     try:
         with open(master_json_file, 'w', encoding='utf-8') as f:
-            json.dump(final_games_list, f, ensure_ascii=False, indent=2)
+            json.dump(final_games_list, f, ensure_ascii=False, indent=2, default=to_json_value)
         logging.info(f"最终数据已覆盖保存到 {master_json_file}")
     except Exception as e: 
         logging.error(f"保存最终 JSON 数据时出错: {e}", exc_info=True)
 
     # Save Excel
     try:
-        df_final = pd.DataFrame(final_games_list)
-        internal_fields = list(excel_columns_map.values())
-
-        # Ensure all expected columns exist
-        for field in internal_fields:
-            if field not in df_final.columns:
-                if field == 'rating': df_final[field] = 0.0
-                elif field in ['is_featured', 'version_checked']: df_final[field] = False
-                else: df_final[field] = ''
-
-        cols_to_export = [col for col in internal_fields if col in df_final.columns]
-        df_final_excel = df_final[cols_to_export].copy()
-
-        # Format boolean columns for Excel
-        for col in ['is_featured', 'version_checked']:
-            if col in df_final_excel.columns:
-                 df_final_excel[col] = df_final_excel[col].apply(
-                     lambda x: '是' if x is True or str(x).strip().lower() in ['true', '是', 'yes', '1'] else ''
-                 )
-        # Handle manual_checked notes correctly
-        if 'manual_checked' in df_final_excel.columns:
-             df_final_excel['manual_checked'] = df_final_excel['manual_checked'].astype(str).fillna('')
-             # Only convert simple True/Yes/1 to '是', keep other notes
-             df_final_excel['manual_checked'] = df_final_excel['manual_checked'].apply(
-                 lambda x: '是' if x.lower() in ['true', 'yes', '1'] else x
-             )
-
-        df_final_excel.rename(columns={v: k for k, v in excel_columns_map.items()}, inplace=True)
-        df_final_excel.to_excel(master_excel_file, index=False, engine='openpyxl')
+        _write_master_excel(final_games_list, master_excel_file, excel_columns_map, snapshot_writer)
         logging.info(f"最终数据已覆盖保存到 Excel: {master_excel_file}")
+        return True
     except ImportError:
-        logging.error("需要安装 'pandas' 和 'openpyxl' 才能导出 Excel。")
+        logging.error("需要安装 'openpyxl' 才能导出 Excel。")
     except Exception as e: 
         logging.error(f"导出最终 Excel 数据时出错: {e}", exc_info=True)
+    return False
+
+def _remove_short_interval_tests(games_list):
+    """流水线阶段：删除同一游戏日期间隔过短的旧测试记录 (规则见 analyze_game_updates.py)"""
+    logging.info("--- 开始执行测试日期间隔分析和清理 --- ")
+    status_config = CONFIG.get('status_standardization', {})
+    # Determine the standardized name for 'test' status
+    status_test_name = '测试' # Default
+    test_keys_to_check = ['status_test', '测试', 'Test'] # Keys to check in config
+    for key in test_keys_to_check:
+        if key in status_config:
+             status_test_name = status_config[key]
+             break
+    logging.info(f"将使用状态名 '{status_test_name}' 进行测试间隔分析。")
+
+    # Get min_days from config, default to 7 if not found
+    min_days = CONFIG.get('analysis_min_interval_days', 7)
+    logging.info(f"将使用最小间隔天数: {min_days} 进行分析。")
+
+    try:
+        kept_games, removed_count = remove_old_test_records(games_list, status_test_name, min_days)
+    except Exception as analysis_error:
+        logging.error(f"执行测试日期间隔分析时发生错误: {analysis_error}", exc_info=True)
+        logging.error("本次保存的数据未进行测试间隔清理，请检查。")
+        return games_list
+    if removed_count:
+        logging.info(f"测试日期间隔分析完成，已删除 {removed_count} 条旧记录。")
+    else:
+        logging.info("测试日期间隔分析完成，未发现需删除的记录。")
+    return kept_games
 
 # --- Refactored Core Data Processing (Excel-Centric) ---
-def collect_all_game_data(fetch_taptap=True, fetch_16p=True, process_history_only=False):
+def collect_all_game_data(fetch_taptap=True, fetch_16p=True, process_history_only=False, full_rebuild=False,
+                          profile=False, trace_memory=False):
+    """完整的数据收集流程，返回最终记录列表 (失败时返回空列表)
+
+    每个阶段的耗时、CPU 时间、记录数和内存峰值写入 logs/run_reports/ 下的运行报告 (见 run_report.py)；
+    profile=True 时额外为每个阶段写出 cProfile 结果，trace_memory=True 时用 tracemalloc 统计各阶段内存峰值 (明显变慢)。
+    """
     load_config()
     if not CONFIG:
         logging.error("无法加载配置, 脚本无法继续运行。")
-        return
+        return []
 
     start_time = time.time()
     # Updated task description logic
@@ -847,77 +1352,97 @@ def collect_all_game_data(fetch_taptap=True, fetch_16p=True, process_history_onl
     final_games_list = []
     execution_successful = False
 
+    incremental_state = None
+    run_report = RunReport('collect_games', RUN_REPORT_DIR, profile=profile, trace_memory=trace_memory)
+    run_report.summary.update({
+        'process_history_only': process_history_only,
+        'fetch_taptap': fetch_taptap,
+        'fetch_16p': fetch_16p,
+    })
+
     try:
         # 1. Load Base Data From Excel (Always)
-        base_data_from_excel, locked_records, excel_feature_flags = _load_excel_data(master_excel_file, excel_columns_map)
+        with run_report.stage('load_excel') as stage:
+            base_data_from_excel, locked_records, excel_feature_flags = _load_excel_data(master_excel_file, excel_columns_map)
+            stage.records_out = len(base_data_from_excel)
+            stage.details['locked_records'] = len(locked_records)
+
+            # 主 Excel 是之前所有 JSONL 记录的合并结果；主文件缺失时必须全量处理 JSONL
+            if not base_data_from_excel and not full_rebuild:
+                logging.info("主 Excel 无数据，本次对 JSONL 全量重建。")
+                full_rebuild = True
+            incremental_state = _load_incremental_state(full_rebuild)
+        run_report.summary['full_rebuild'] = full_rebuild
 
         # 2. Fetch/Load Data from JSONL files (Calls scraper only if not history_only)
-        # Pass process_history_only flag to the function
-        data_from_jsonl = _fetch_new_data(fetch_taptap, fetch_16p, process_history_only)
+        # Pass process_history_only flag to the function; only records appended/changed since the last checkpoint are loaded
+        with run_report.stage('fetch') as stage:
+            data_from_jsonl = _fetch_new_data(fetch_taptap, fetch_16p, process_history_only, incremental_state, stage=stage)
+            stage.records_out = len(data_from_jsonl)
 
-        # 3. Process Data from JSONL files
+        # 3. Process Data from JSONL files (名称清理和 AppStore 过滤已在各来源加载时完成，见 _fetch_source)
         logging.info("--- 处理来自 JSONL 文件的数据 --- ")
-        processed_jsonl_data = []
+        flag_stats = {'applied_flags': 0}
+        jsonl_count = len(data_from_jsonl)
         if data_from_jsonl:
-            # Clean names first
-            for game in data_from_jsonl:
-                 # Ensure cleaned_name exists for key calculation/filtering
-                 name_for_key = game.get('cleaned_name')
-                 if not name_for_key:
-                      name_for_key = clean_game_name(game.get('name'))
-                      game['cleaned_name'] = name_for_key # Store back if newly calculated
-
-            # Filter JSONL data (use process_history_only to decide if it's "history")
-            # Treat loaded JSONL data as "new" unless in history_only mode
-            is_history_filter = process_history_only
-            logging.info(f"对 JSONL 数据应用 AppStore 过滤规则 (is_history_data={is_history_filter})")
-            filtered_jsonl = _filter_appstore_games(data_from_jsonl, is_history_data=is_history_filter)
-
-            # Run version matching on filtered, non-locked JSONL data
-            logging.info(f"对 {len(filtered_jsonl)} 条过滤后的 JSONL 数据进行版号匹配 (跳过锁定记录)")
+            # Run version matching on filtered, non-locked JSONL data (需要全部名称，原地更新记录)
+            logging.info(f"对 {jsonl_count} 条过滤后的 JSONL 数据进行版号匹配 (跳过锁定记录)")
             # Pass locked_records for skipping check inside
-            matched_jsonl = _run_version_matching(filtered_jsonl, locked_records, description="JSONL数据")
-
-            # Standardize the matched JSONL data
-            logging.info("标准化匹配后的 JSONL 数据")
-            processed_jsonl_data = standardize_game_data(matched_jsonl, excel_columns_map)
-
-            # Apply feature flags from Excel to standardized JSONL data if name/date matches & not locked
-            logging.info("尝试从 Excel 历史记录应用 '是否重点' 标记到 JSONL 数据 (如果匹配且未锁定)")
-            applied_flag_count = 0
-            for std_game in processed_jsonl_data:
-                key = (std_game.get('cleaned_name'), std_game.get('date'))
-                if key in excel_feature_flags and key not in locked_records:
-                    std_game['is_featured'] = excel_feature_flags[key]
-                    if excel_feature_flags[key]: # Only count if flag was True
-                         applied_flag_count +=1
-            logging.info(f"已将 {applied_flag_count} 个 '重点' 标记从 Excel 应用到匹配的 JSONL 记录。")
+            with run_report.stage('version_matching', records_in=jsonl_count) as stage:
+                _run_version_matching(data_from_jsonl, locked_records, description="JSONL数据")
+                stage.records_out = jsonl_count
+
+            # Standardize the matched JSONL data, then apply feature flags from Excel (流式，逐块处理)
+            logging.info("标准化匹配后的 JSONL 数据，并从 Excel 历史记录应用 '是否重点' 标记 (如果匹配且未锁定)")
+            processed_jsonl_stream = _iter_with_excel_feature_flags(
+                iter_standardized_games(_drain(data_from_jsonl), excel_columns_map),
+                excel_feature_flags, locked_records, flag_stats)
         else:
              logging.info("未从 JSONL 文件加载到数据，跳过处理步骤。")
-
+             processed_jsonl_stream = iter(())
 
         # 4. Merge All Data (Base Excel + Processed JSONL)
         logging.info("--- 开始合并 Excel 基础数据和处理后的 JSONL 数据 --- ")
-        # Use base_data_from_excel (all original excel rows)
-        # Use processed_jsonl_data (standardized, matched, filtered JSONL data)
-        combined_games = base_data_from_excel + processed_jsonl_data
-        logging.info(f"合并后共 {len(combined_games)} 条数据待去重。")
-
-        # 5. Deduplicate Combined List
-        # Pass the combined list and locked records dictionary
-        temp_final_list = _deduplicate_games(combined_games, locked_records)
+        combined_count = len(base_data_from_excel) + jsonl_count
+        logging.info(f"合并后共 {combined_count} 条数据待去重。")
+        # Base Excel rows first, then the standardized JSONL stream
+        combined_games = itertools.chain(_drain(base_data_from_excel), processed_jsonl_stream)
+
+        # 5-7 只在内存中处理记录 (去重、冲突处理、排序)，这几个阶段暂停自动循环垃圾回收 (见 _gc_paused)
+        with _gc_paused():
+            # 5. Deduplicate Combined List (消费合并后的记录流，JSONL 记录的标准化在此阶段内逐块完成)
+            # Pass the combined stream and locked records dictionary
+            with run_report.stage('standardize_dedup', records_in=combined_count) as stage:
+                temp_final_list, dedup_report = _deduplicate_games(combined_games, locked_records)
+                stage.records_out = len(temp_final_list)
+                stage.details.update({key: value for key, value in dedup_report.items() if key != 'conflicts'})
+                stage.details['applied_feature_flags'] = flag_stats['applied_flags']
+            if jsonl_count:
+                logging.info(f"已将 {flag_stats['applied_flags']} 个 '重点' 标记从 Excel 应用到匹配的 JSONL 记录。")
+
+            resolved_list = []
+            if temp_final_list:
+                # 6. Resolve Online Conflicts (Applied to the deduplicated list)
+                with run_report.stage('online_conflicts', records_in=len(temp_final_list)) as stage:
+                    resolved_list = _resolve_online_conflicts(temp_final_list)
+                    stage.records_out = len(resolved_list)
+
+                # 7. Sort
+                logging.info("--- 按日期倒序排列数据 ---")
+                with run_report.stage('sort', records_in=len(resolved_list)) as stage:
+                    resolved_list.sort(key=lambda x: (x.get('date', '0000-00-00'), x.get('name', '')), reverse=True) # Sort by date then name
+                    stage.records_out = len(resolved_list)
 
 
         # --- Common Post-Processing Steps --- #
         if not temp_final_list:
             logging.warning("最终数据列表为空，流程结束。")
         else:
-            # 6. Resolve Online Conflicts (Applied to the deduplicated list)
-            resolved_list = _resolve_online_conflicts(temp_final_list)
-
-            # 7. Sort
-            logging.info("--- 按日期倒序排列数据 ---")
-            resolved_list.sort(key=lambda x: (x.get('date', '0000-00-00'), x.get('name', '')), reverse=True) # Sort by date then name
+            # 8. Remove short-interval test records (在内存中完成，随后只保存一次)
+            if remove_old_test_records: # Check if function was imported successfully
+                with run_report.stage('remove_old_tests', records_in=len(resolved_list)) as stage:
+                    resolved_list = _remove_short_interval_tests(resolved_list)
+                    stage.records_out = len(resolved_list)
 
             final_games_list = resolved_list
             execution_successful = True
@@ -928,62 +1453,37 @@ def collect_all_game_data(fetch_taptap=True, fetch_16p=True, process_history_onl
         # execution_successful remains False
 
     finally:
+        saved = False
         # Save results if successful
         if execution_successful and final_games_list:
-            _save_results(final_games_list, master_json_file, master_excel_file, excel_columns_map)
-
-            # 8. Backup and Run analysis/cleanup on the saved Excel file
-            if analyze_and_remove_old_tests: # Check if function was imported successfully
-                logging.info("--- 开始执行测试日期间隔分析和清理 --- ")
-                
-                # --- Backup before analysis --- 
-                backup_file = os.path.join(data_dir, f"all_games_data.xlsx.bak") 
-                try:
-                    if os.path.exists(master_excel_file):
-                        shutil.copy2(master_excel_file, backup_file)
-                        logging.info(f"已创建/覆盖分析前备份文件: {backup_file}")
-                    else:
-                         logging.warning(f"无法创建备份，因为主文件 {master_excel_file} 不存在。")
-                except Exception as e:
-                    logging.error(f"创建分析前备份文件失败: {e}。请注意！")
-
-                # --- Get parameters for analysis --- 
-                status_config = CONFIG.get('status_standardization', {})
-                # Determine the standardized name for 'test' status
-                status_test_name = '测试' # Default
-                test_keys_to_check = ['status_test', '测试', 'Test'] # Keys to check in config
-                for key in test_keys_to_check:
-                    if key in status_config:
-                         status_test_name = status_config[key]
-                         break
-                logging.info(f"将使用状态名 '{status_test_name}' 进行测试间隔分析。")
-                
-                # Get min_days from config, default to 7 if not found
-                min_days = CONFIG.get('analysis_min_interval_days', 7)
-                logging.info(f"将使用最小间隔天数: {min_days} 进行分析。")
-                
-                # --- Run the analysis function --- 
-                try:
-                     analysis_modified = analyze_and_remove_old_tests(
-                         master_excel_file,
-                         status_test_name,
-                         min_days
-                     )
-                     if analysis_modified:
-                          logging.info("测试日期间隔分析完成，旧记录已根据规则删除。")
-                     else:
-                          logging.info("测试日期间隔分析完成，未进行修改（未发现需删除的记录或操作失败）。")
-                except Exception as analysis_error:
-                     logging.error(f"执行测试日期间隔分析时发生错误: {analysis_error}", exc_info=True)
-                     logging.error("Excel 文件可能未被清理，请检查。")
+            with run_report.stage('save', records_in=len(final_games_list)) as stage:
+                # 写出主 Excel 的同时记录一个历史版本 (可用 --restore 恢复)，代替覆盖式的 .bak 备份
+                snapshot_writer = _begin_history_snapshot(master_excel_file, list(excel_columns_map))
+                saved = _save_results(final_games_list, master_json_file, master_excel_file, excel_columns_map, snapshot_writer)
+                stage.records_out = len(final_games_list) if saved else 0
+                if saved and snapshot_writer is not None:
+                    _commit_history_snapshot(snapshot_writer, {'source': 'collect_games', 'run': run_report.timestamp}, stage)
+                # 新记录已合并进主文件后才推进检查点，保存失败时下次运行会重新处理它们
+                if saved and incremental_state is not None:
+                    _save_incremental_state(incremental_state)
+            if saved:
+                with run_report.stage('changelog', records_in=len(final_games_list)) as stage:
+                    changes = _record_changelog(final_games_list, stage)
+                    if changes is not None:
+                        run_report.summary['changes'] = {key: changes[key] for key in ('added', 'changed', 'removed')}
         elif execution_successful and not final_games_list:
              logging.warning("处理流程成功但最终列表为空，不执行保存和分析操作。")
         elif not execution_successful:
              logging.info("处理流程未成功完成，跳过保存和分析操作。")
 
+        run_report.summary.update({'records': len(final_games_list), 'saved': saved})
+        run_report.finish(success=execution_successful)
         logging.info(f"任务结束，总耗时: {time.time() - start_time:.2f} 秒。")
         logging.info("="*50 + "\n")
 
+    # 返回最终列表，供 update_data.py 判断是否需要通知后端重载
+    return final_games_list if execution_successful else []
+
 
 # --- Main Execution Guard ---
 def main():
@@ -994,14 +1494,36 @@ def main():
     parser.add_argument('--no-taptap', action='store_true', help='跳过 TapTap 数据获取')
     parser.add_argument('--no-16p', action='store_true', help='跳过 16p (好游快爆/AppStore) 数据获取')
     parser.add_argument('--history-only', action='store_true', help='只处理历史数据，不爬取新数据')
+    parser.add_argument('--full-rebuild', action='store_true', help='忽略增量检查点，重新处理 JSONL 文件中的全部记录')
+    parser.add_argument('--profile', action='store_true', help='为每个阶段写出 cProfile 性能分析结果 (logs/run_reports/profile_<时间戳>/)；'
+                        'Python 3.12+ 同一时间只能启用一个 cProfile，抓取阶段的各来源改为依次运行 (总耗时变长)')
+    parser.add_argument('--trace-memory', action='store_true', help='用 tracemalloc 统计各阶段的 Python 内存峰值 (运行会明显变慢)')
+    parser.add_argument('--list-snapshots', action='store_true', help='列出主 Excel 的历史版本')
+    parser.add_argument('--restore', metavar='VERSION', help='把主 Excel 恢复为指定历史版本 (版本号、YYYY-MM-DD 或 ISO 时间) 后退出')
+    parser.add_argument('--compact-raw', action='store_true', help='把爬虫 JSONL 压缩归档到按月分区 (data/raw/) 后退出；有爬虫正在写入的文件会被跳过')
     
     args = parser.parse_args()
+
+    if args.list_snapshots:
+        list_snapshots()
+        return
+    if args.restore:
+        if not restore_snapshot(args.restore):
+            sys.exit(1)
+        return
+    if args.compact_raw:
+        if not compact_raw_files():
+            sys.exit(1)
+        return
     
     # 调用核心处理函数
     collect_all_game_data(
         fetch_taptap=not args.no_taptap,
         fetch_16p=not args.no_16p,
-        process_history_only=args.history_only
+        process_history_only=args.history_only,
+        full_rebuild=args.full_rebuild,
+        profile=args.profile,
+        trace_memory=args.trace_memory
     )
 
 if __name__ == "__main__":
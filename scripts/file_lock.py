@@ -0,0 +1,94 @@
+# scripts/file_lock.py
+# 进程间建议锁：在数据文件旁的 <文件名>.lock 上加锁，协调爬虫写入与原始记录压缩
+#
+# 爬虫的 JsonlWriter 在打开活动 JSONL 期间持有共享锁 (多个写入方可同时持有)；
+# 压缩 (raw_partitions.RawPartitions.compact) 需要独占锁，有写入方时拒绝运行，
+# 压缩期间启动的写入方等待压缩完成后再打开文件，不会向已被替换的旧文件追加记录。
+# 锁随文件句柄关闭或进程退出自动释放；锁文件本身保留，不删除 (删除会让不同进程锁住不同的文件)。
+# POSIX 使用 fcntl.flock；Windows 使用 msvcrt.locking，没有共享锁，写入方之间也互斥。
+
+import os
+import time
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_SUFFIX = '.lock'
+WAIT_INTERVAL = 0.5 # 秒，Windows 下阻塞获取时的重试间隔
+
+class LockBusyError(OSError):
+    """锁已被其他写入方或压缩进程持有 (非阻塞获取失败)"""
+
+def lock_path_for(path):
+    return f"{path}{LOCK_SUFFIX}"
+
+class FileLock:
+    """path 对应的 <path>.lock 上的建议锁；shared=True 为共享锁，否则为独占锁
+
+    同一进程内对同一文件的两个 FileLock 也互相排斥 (与不同进程相同)。
+    """
+
+    def __init__(self, path, shared=False):
+        self.path = lock_path_for(path)
+        self.shared = shared and fcntl is not None
+        self._file = None
+
+    @property
+    def locked(self):
+        return self._file is not None
+
+    def acquire(self, blocking=True):
+        """获取锁；blocking=False 且锁被占用时抛出 LockBusyError"""
+        if self._file is not None:
+            return
+        f = open(self.path, 'a+b')
+        try:
+            if not self._try_lock(f):
+                if not blocking:
+                    raise LockBusyError(f"{os.path.basename(self.path)} 已被其他进程锁定")
+                self._wait(f)
+        except BaseException:
+            f.close()
+            raise
+        self._file = f
+
+    def _try_lock(self, f):
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), (fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except (BlockingIOError, PermissionError): # 锁被占用 (POSIX: EWOULDBLOCK, Windows: EACCES)
+            return False
+        return True
+
+    def _wait(self, f):
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+            return
+        while not self._try_lock(f):
+            time.sleep(WAIT_INTERVAL)
+
+    def release(self):
+        f, self._file = self._file, None
+        if f is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            f.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
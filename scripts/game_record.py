@@ -0,0 +1,223 @@
+# scripts/game_record.py
+# 流水线中的紧凑游戏记录：__slots__ 对象代替 24 个键的字典
+#
+# 每条字典记录都带一张完整的哈希表，百万条记录时仅键表就占用约 1 GB；
+# 平台、来源、状态、厂商、日期等取值高度重复，但从 JSONL 解析出的每条记录都持有各自的字符串副本。
+# GameRecord 把标准字段存放在固定槽位中，并对这些分类字段的字符串取值做驻留 (sys.intern)，
+# 相同取值的记录共享同一个字符串对象。
+#
+# GameRecord 实现 MutableMapping 接口 (get / [] / in / keys / items / update ...)，
+# 去重、冲突处理、排序和导出代码无需区分字典与记录。字段缺失的语义与字典一致 (未赋值的槽位视为不存在)，
+# 自定义列映射中多出的字段存放在附加字典中。写 JSON 时用 to_json_value 转换为字典。
+#
+# 槽位、分类字段驻留和 to_dict 由 SlottedRecord 统一实现，具体记录类型用 record_type 按字段表生成；
+# 后端进程内快照的记录 (backend/snapshot_store.GameRecord) 也由这里生成，两边不再各自维护一份实现。
+
+import sys
+from collections.abc import MutableMapping
+
+# 标准字段，顺序与 collect_games.standardize_game_data 输出的键顺序一致
+GAME_FIELDS = (
+    'name', 'cleaned_name', 'date', 'status', 'platform', 'category', 'rating',
+    'publisher', 'source', 'link', 'icon_url', 'description', 'is_featured', 'version_checked',
+    'nppa_name', 'approval_num', 'publication_num', 'approval_date', 'publisher_unit', 'operator_unit',
+    'game_type_version', 'declaration_category', 'multiple_results', 'manual_checked',
+)
+_FIELD_SET = frozenset(GAME_FIELDS)
+
+# 取值种类很少、在记录间大量重复的字段，字符串取值驻留后共享
+INTERNED_FIELDS = frozenset([
+    'date', 'status', 'platform', 'category', 'publisher', 'source', 'approval_date',
+    'publisher_unit', 'operator_unit', 'game_type_version', 'declaration_category', 'manual_checked',
+])
+
+_intern = sys.intern
+_MISSING = object()
+
+class SlottedRecord:
+    """固定字段紧凑记录的公共部分：按字段读取、分类字段驻留、to_dict
+
+    不直接使用，由 record_type 按字段表生成带槽位的子类；未赋值的槽位视为字段不存在。
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+    FIELD_SET = frozenset()
+    INTERNED_FIELDS = frozenset()
+
+    def _set_field(self, field, value):
+        if field in self.INTERNED_FIELDS and type(value) is str:
+            value = _intern(value)
+        setattr(self, field, value)
+
+    @classmethod
+    def _intern_column(cls, field, column):
+        """整列驻留分类字段的字符串取值 (按列批量构建记录时使用)"""
+        if field not in cls.INTERNED_FIELDS:
+            return column
+        return [_intern(value) if type(value) is str else value for value in column]
+
+    def get(self, field, default=None):
+        if field in self.FIELD_SET:
+            return getattr(self, field, default)
+        return default
+
+    def _iter_fields(self):
+        missing = _MISSING
+        for field in self.FIELDS:
+            value = getattr(self, field, missing)
+            if value is not missing:
+                yield field, value
+
+    def to_dict(self):
+        return dict(self._iter_fields())
+
+def record_type(name, fields, interned_fields, extra_slots=()):
+    """按字段表生成 SlottedRecord 的子类：fields 为槽位 (顺序即 to_dict 的键顺序)，interned_fields 必须是其子集"""
+    fields = tuple(fields)
+    interned_fields = frozenset(interned_fields)
+    unknown = interned_fields.difference(fields)
+    if unknown:
+        raise ValueError(f"{name} 的驻留字段不在字段表中: {', '.join(sorted(unknown))}")
+    return type(name, (SlottedRecord,), {
+        '__slots__': fields + tuple(extra_slots),
+        'FIELDS': fields,
+        'FIELD_SET': frozenset(fields),
+        'INTERNED_FIELDS': interned_fields,
+        '__module__': __name__,
+    })
+
+class GameRecord(record_type('GameRecordSlots', GAME_FIELDS, INTERNED_FIELDS, extra_slots=('_extra',)), MutableMapping):
+    """按字段名读写的紧凑游戏记录，行为与同内容的字典一致 (键顺序为标准字段顺序 + 附加字段)"""
+
+    __slots__ = ()
+
+    def __init__(self, items=()):
+        self._extra = None
+        if hasattr(items, 'items'):
+            items = items.items()
+        for key, value in items:
+            self[key] = value
+
+    @classmethod
+    def from_columns(cls, keys, columns):
+        """按列批量构建记录 (standardize_game_data 的输出)：先整列驻留分类字段，再逐行填充槽位"""
+        columns = [cls._intern_column(key, column) for key, column in zip(keys, columns)]
+        keys = list(keys)
+        standard_prefix = tuple(keys[:len(GAME_FIELDS)]) == GAME_FIELDS
+        extra_start = len(GAME_FIELDS) if standard_prefix else 0
+        extra_keys = keys[extra_start:]
+        new = object.__new__
+        records = []
+        append = records.append
+        for row in zip(*columns):
+            record = new(cls)
+            record._extra = None
+            if standard_prefix:
+                record._assign_standard(row)
+            for key, value in zip(extra_keys, row[extra_start:]):
+                record[key] = value
+            append(record)
+        return records
+
+    def _assign_standard(self, row):
+        """按 GAME_FIELDS 顺序一次性赋值全部标准字段 (row 的前 len(GAME_FIELDS) 项)"""
+        (self.name, self.cleaned_name, self.date, self.status, self.platform, self.category, self.rating,
+         self.publisher, self.source, self.link, self.icon_url, self.description, self.is_featured, self.version_checked,
+         self.nppa_name, self.approval_num, self.publication_num, self.approval_date, self.publisher_unit, self.operator_unit,
+         self.game_type_version, self.declaration_category, self.multiple_results, self.manual_checked) = row[:len(GAME_FIELDS)]
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        extra = self._extra
+        if extra is None:
+            raise KeyError(key)
+        return extra[key]
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            self._set_field(key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            return
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __iter__(self):
+        for field in GAME_FIELDS:
+            if hasattr(self, field):
+                yield field
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        count = sum(1 for field in GAME_FIELDS if hasattr(self, field))
+        return count + (len(self._extra) if self._extra else 0)
+
+    def __contains__(self, key):
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return bool(self._extra) and key in self._extra
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        extra = self._extra
+        return default if extra is None else extra.get(key, default)
+
+    def items(self):
+        return list(self._iter_items())
+
+    def values(self):
+        return [value for _, value in self._iter_items()]
+
+    def _iter_items(self):
+        yield from self._iter_fields()
+        if self._extra:
+            yield from self._extra.items()
+
+    def to_dict(self):
+        return dict(self._iter_items())
+
+    def copy(self):
+        return GameRecord(self._iter_items())
+
+    def __eq__(self, other):
+        if isinstance(other, GameRecord):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"GameRecord({self.to_dict()!r})"
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self._extra = None
+        for key, value in state.items():
+            self[key] = value
+
+def to_json_value(value):
+    """json.dump 的 default 回调：把 GameRecord 转为字典，其余类型按原样报错"""
+    if isinstance(value, GameRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,175 @@
+# scripts/jsonl_reader.py
+# 共享的 JSONL 读取：内存映射文件 + 快速解析器 + 大文件多进程并行解析
+#
+# 数据收集流程 (collect_games)、爬虫的已存在键加载 (taptap_selenium / p16_selenium)
+# 和版号缓存 (version_matcher) 都通过 iter_jsonl 读取 JSONL:
+#   - 解析器优先使用 orjson (可选依赖，未安装时使用标准库 json)；
+#     每批行拼成一个 JSON 数组一次解析，减少逐行调用的开销，同一批记录共享键名字符串。
+#   - 文件以只读内存映射方式访问，按不超过 CHUNK_BYTES 的整行区段切分；
+#     待读内容不少于 PARALLEL_MIN_BYTES 时各区段在进程池中并行解析，按文件顺序逐段产出记录。
+#   - 只读取以换行结尾的完整行 (末尾未写完的半行留待下次读取)，stats.end_offset 为已消费到的字节偏移。
+#   - 无效行 (无法解析或不是 JSON 对象) 不逐行记录日志，只计入 stats.bad_lines 并保留少量示例，
+#     由调用方汇总输出一次。
+
+import os
+import json
+import mmap
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None # 可选依赖：pip install orjson
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+CHUNK_BYTES = 16 * 1024 * 1024 # 每个区段的大小 (并行解析的任务粒度)
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024 # 待读内容达到此大小时才启用进程池 (进程启动和结果回传有固定开销)
+BATCH_LINES = 10000 # 每次拼成一个数组解析的行数
+BAD_LINE_SAMPLES = 5 # 保留的无效行示例数量
+BAD_LINE_SAMPLE_CHARS = 200
+
+class JsonlReadStats:
+    """一次读取的统计：有效记录数、无效行数及示例、已消费到的字节偏移"""
+
+    def __init__(self, start_offset=0):
+        self.records = 0
+        self.bad_lines = 0
+        self.bad_samples = []
+        self.end_offset = start_offset
+
+    def _add_bad(self, bad_lines, samples):
+        self.bad_lines += bad_lines
+        room = BAD_LINE_SAMPLES - len(self.bad_samples)
+        if room > 0:
+            self.bad_samples.extend(samples[:room])
+
+    def describe_bad_lines(self, file_name):
+        """无效行的汇总说明 (没有无效行时返回空字符串)"""
+        if not self.bad_lines:
+            return ''
+        samples = '; '.join(self.bad_samples)
+        return f"{file_name}: 跳过 {self.bad_lines} 行无效数据 (示例: {samples})"
+
+def _parse_line(line):
+    """解析单行，无法解析或不是 JSON 对象时返回 None"""
+    try:
+        value = _loads(line)
+    except ValueError:
+        try:
+            # orjson 只接受合法 UTF-8 且不接受 NaN 等扩展写法，退回标准库按原有方式解析
+            value = json.loads(line.decode('utf-8', errors='replace'))
+        except ValueError:
+            return None
+    return value if type(value) is dict else None
+
+def _parse_batch(lines, project):
+    """解析一批非空行，返回 (结果列表, 无效行数, 无效行示例)"""
+    try:
+        values = _loads(b'[' + b','.join(lines) + b']')
+    except ValueError:
+        values = None
+    bad_lines = 0
+    samples = []
+    if values is None or len(values) != len(lines) or not all(type(value) is dict for value in values):
+        # 批中有无效行 (或某行含多个值)：逐行解析，跳过无效行
+        values = []
+        for line in lines:
+            value = _parse_line(line)
+            if value is None:
+                bad_lines += 1
+                if len(samples) < BAD_LINE_SAMPLES:
+                    samples.append(line[:BAD_LINE_SAMPLE_CHARS].decode('utf-8', errors='replace'))
+            else:
+                values.append(value)
+    if project is not None:
+        values = [result for result in map(project, values) if result is not None]
+    return values, bad_lines, samples
+
+def _iter_range_batches(buffer, start, end, project):
+    """逐批解析 buffer[start:end] (以换行结尾的整行)，产出 (结果列表, 无效行数, 无效行示例)"""
+    lines = buffer[start:end].split(b'\n')
+    batch = []
+    for line in lines:
+        if not line.strip():
+            continue
+        batch.append(line)
+        if len(batch) >= BATCH_LINES:
+            yield _parse_batch(batch, project)
+            batch = []
+    if batch:
+        yield _parse_batch(batch, project)
+
+def _parse_range(path, start, end, project):
+    """进程池任务：在子进程中映射文件并解析一个区段，返回 (结果列表, 无效行数, 无效行示例)"""
+    results = []
+    bad_lines = 0
+    samples = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        for values, batch_bad, batch_samples in _iter_range_batches(buffer, start, end, project):
+            results.extend(values)
+            bad_lines += batch_bad
+            samples.extend(batch_samples[:BAD_LINE_SAMPLES - len(samples)])
+    return results, bad_lines, samples
+
+def _split_ranges(buffer, start, end, chunk_bytes):
+    """把 [start, end) 切分为不超过约 chunk_bytes 的整行区段"""
+    ranges = []
+    position = start
+    while position < end:
+        boundary = buffer.find(b'\n', min(position + chunk_bytes, end) - 1, end)
+        boundary = end if boundary == -1 else boundary + 1
+        ranges.append((position, boundary))
+        position = boundary
+    return ranges
+
+def _pool_context():
+    # 调用方可能有其他线程在运行 (例如并发抓取)，不从当前进程直接 fork 子进程
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+def iter_jsonl(path, start_offset=0, stats=None, project=None, workers=None):
+    """按文件顺序逐条产出 JSONL 文件中 start_offset 之后的记录 (字典)
+
+    project: 可选的映射函数，对每条记录调用，返回 None 的记录被丢弃；
+             并行解析时在子进程中执行，必须是可被 pickle 的模块级函数。
+    workers: 并行解析的进程数；None 表示待读内容达到 PARALLEL_MIN_BYTES 时使用 CPU 核数，1 表示不使用进程池。
+    stats:   传入 JsonlReadStats 以获取记录数、无效行数和读取结束后的字节偏移。
+    """
+    stats = stats if stats is not None else JsonlReadStats(start_offset)
+    stats.end_offset = start_offset
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= start_offset:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            end = buffer.rfind(b'\n', start_offset, size) + 1
+            if end <= start_offset:
+                return # 只有一行未写完的半行
+            if workers is None:
+                workers = (os.cpu_count() or 1) if end - start_offset >= PARALLEL_MIN_BYTES else 1
+            ranges = _split_ranges(buffer, start_offset, end, CHUNK_BYTES)
+            if workers > 1 and len(ranges) > 1:
+                batches = _iter_parallel(path, ranges, project, workers)
+            else:
+                batches = (batch for range_start, range_end in ranges
+                           for batch in _iter_range_batches(buffer, range_start, range_end, project))
+            for values, bad_lines, samples in batches:
+                stats.records += len(values)
+                stats._add_bad(bad_lines, samples)
+                yield from values
+            stats.end_offset = end
+
+def _iter_parallel(path, ranges, project, workers):
+    """在进程池中解析各区段，按区段顺序产出结果；同时在途的任务数有上限，已产出的区段结果不再保留"""
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=_pool_context()) as executor:
+        pending = deque()
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < workers * 2:
+                range_start, range_end = ranges[next_range]
+                pending.append(executor.submit(_parse_range, path, range_start, range_end, project))
+                next_range += 1
+            yield pending.popleft().result()
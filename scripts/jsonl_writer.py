@@ -0,0 +1,226 @@
+# scripts/jsonl_writer.py
+# 爬虫输出的缓冲写入：后台线程从队列接收记录，按批追加到 JSONL
+#
+# TapTap 和 16p 爬虫都通过 JsonlWriter 写出记录：
+#   - write() 只把记录放入队列，抓取线程不再等待文件写入，也不需要全局文件锁；
+#   - 后台线程攒够 batch_size 条或距本批第一条记录超过 flush_interval 秒时，把整批编码为完整行一次写出；
+#   - durability 决定每批写出后的持久化程度：
+#       'none'   只写入 Python 缓冲区，缓冲区满、调用 flush() 或关闭时才交给操作系统 (最快，进程崩溃会丢失缓冲区中的批次)
+#       'flush'  每批写出后 flush 到操作系统 (默认，进程崩溃不丢已写出的批次)
+#       'fsync'  每批写出后 fsync 到磁盘 (断电也不丢已写出的批次，最慢)
+#   - 批次写出并落盘后才把记录的键写入键索引 (key_index.KeyIndex)，索引中不会出现文件里没有的键；
+#     写出后、写索引前崩溃时，下次打开索引会从 JSONL 补入。
+#   - 打开文件时若末尾有上次崩溃留下的半行 (不以换行结尾)，先截掉这部分，新记录不会与它拼在一起。
+#     读取方 (jsonl_reader) 本来就不消费未写完的半行。
+#   - 打开文件期间持有 <文件名>.lock 上的共享锁 (file_lock.FileLock)，压缩归档 (raw_partitions) 不会在写入期间替换文件；
+#     正在压缩时等待压缩完成后再打开文件。
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from file_lock import FileLock, LockBusyError
+
+DURABILITY_POLICIES = ('none', 'flush', 'fsync')
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 1.0 # 秒
+DEFAULT_DURABILITY = 'flush'
+
+_STOP = object()
+
+class JsonlWriter:
+    """在后台线程中按批追加 JSONL 记录
+
+    key_index: 可选的 KeyIndex，批次落盘后写入各记录的键；key_func 从记录取出键 (返回 None 的记录不写入索引)。
+    `key in writer` 在已落盘的键 (键索引) 和已提交但尚未写出的键中查找，用于同一次运行内去重。
+    """
+
+    def __init__(self, path, key_index=None, key_func=None, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, durability=DEFAULT_DURABILITY):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"durability 应为 {', '.join(DURABILITY_POLICIES)} 之一，收到 '{durability}'")
+        self.path = path
+        self.key_index = key_index
+        self.key_func = key_func
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.written = 0 # 已写出的记录数
+        self.batches = 0
+        self.error = None # 写入失败时的错误说明，之后的 write 会抛出 OSError
+        self._queue = queue.Queue()
+        self._pending_keys = {} # 已提交、尚未写出的键 -> 条数
+        self._lock = threading.Lock()
+        self._closed = False
+        self._file_lock = FileLock(path, shared=True)
+        try:
+            self._file_lock.acquire(blocking=False)
+        except LockBusyError:
+            logging.warning(f"{os.path.basename(path)} 正在压缩归档 (collect_games --compact-raw)，等待完成后再写入...")
+            self._file_lock.acquire()
+        try:
+            self._file = self._open()
+        except Exception:
+            self._file_lock.release()
+            raise
+        self._thread = threading.Thread(target=self._run, name=f"jsonl-writer-{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        """以追加方式打开文件，截掉末尾未写完的半行"""
+        f = open(self.path, 'a+b')
+        try:
+            size = f.seek(0, os.SEEK_END)
+            if size:
+                f.seek(size - 1)
+                if f.read(1) != b'\n':
+                    keep = self._last_line_end(f, size)
+                    f.truncate(keep)
+                    logging.warning(f"{os.path.basename(self.path)} 末尾有 {size - keep} 字节未写完的半行 (上次写入中断)，已截掉。")
+        except Exception:
+            f.close()
+            raise
+        return f
+
+    @staticmethod
+    def _last_line_end(f, size, block_size=65536):
+        """从文件末尾向前查找最后一个换行，返回其后的偏移 (没有换行时为 0)"""
+        end = size
+        while end > 0:
+            start = max(0, end - block_size)
+            f.seek(start)
+            position = f.read(end - start).rfind(b'\n')
+            if position != -1:
+                return start + position + 1
+            end = start
+        return 0
+
+    # --- 提交 ---
+    def write(self, record):
+        """提交一条记录 (立即返回)；写入线程已失败或写入器已关闭时抛出 OSError"""
+        if self.error is not None:
+            raise OSError(f"写入 {os.path.basename(self.path)} 失败: {self.error}")
+        if self._closed:
+            raise OSError(f"{os.path.basename(self.path)} 的写入器已关闭")
+        key = self.key_func(record) if self.key_func is not None else None
+        if key is not None:
+            with self._lock:
+                self._pending_keys[key] = self._pending_keys.get(key, 0) + 1
+        self._queue.put((record, key))
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._pending_keys:
+                return True
+        return self.key_index is not None and key in self.key_index
+
+    def flush(self):
+        """等待已提交的记录全部写出 (按 durability 落盘)"""
+        done = threading.Event()
+        self._queue.put(done)
+        while not done.wait(0.1):
+            if not self._thread.is_alive():
+                break
+
+    def close(self):
+        """写出剩余记录并关闭文件；返回本写入器写出的记录数"""
+        if self._closed:
+            return self.written
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        return self.written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- 后台线程 ---
+    def _run(self):
+        batch = []
+        deadline = None
+        stopping = False
+        try:
+            while True:
+                if stopping:
+                    timeout = 0 # 收到关闭信号后只取完队列中剩余的记录
+                else:
+                    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                waiters = []
+                while item is not None:
+                    if item is _STOP:
+                        stopping = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        if not batch:
+                            deadline = time.monotonic() + self.flush_interval
+                        batch.append(item)
+                    if waiters or len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        item = None
+                if batch and (stopping or waiters or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                    self._write_batch(batch)
+                    batch = []
+                    deadline = None
+                if waiters and self.durability == 'none':
+                    self._file.flush() # flush() 的调用方需要数据已交给操作系统
+                for waiter in waiters:
+                    waiter.set()
+                if stopping and not batch and self._queue.empty():
+                    break
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logging.error(f"后台写入 {os.path.basename(self.path)} 失败: {self.error}")
+            self._drain_after_error()
+        finally:
+            try:
+                self._file.close()
+            except OSError as e:
+                self.error = self.error or f"{type(e).__name__}: {e}"
+            finally:
+                self._file_lock.release() # 文件关闭后才允许压缩
+
+    def _write_batch(self, batch):
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record, _ in batch).encode('utf-8')
+        self._file.write(data) # 整批都是完整行；写到一半中断时，下次打开会截掉末尾的半行
+        if self.durability != 'none':
+            self._file.flush()
+        if self.durability == 'fsync':
+            os.fsync(self._file.fileno())
+        self.written += len(batch)
+        self.batches += 1
+        keys = [key for _, key in batch if key is not None]
+        if keys and self.key_index is not None:
+            try:
+                self.key_index.add_many(keys)
+            except Exception as e: # 索引写入失败不影响数据，下次打开索引时会从 JSONL 补入
+                logging.warning(f"更新键索引失败: {e}")
+        with self._lock:
+            for key in keys:
+                remaining = self._pending_keys.get(key, 0) - 1
+                if remaining > 0:
+                    self._pending_keys[key] = remaining
+                else:
+                    self._pending_keys.pop(key, None)
+
+    def _drain_after_error(self):
+        """写入失败后丢弃队列中剩余的记录，唤醒等待 flush 的调用方"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
@@ -0,0 +1,211 @@
+# scripts/key_index.py
+# 爬虫去重用的键索引：为输出 JSONL 维护一个旁路 SQLite 文件 (<JSONL 文件名>.keys.sqlite)
+#
+# 爬虫启动时不再解析整个 JSONL 来构建 (名称, 日期) 键集合，而是直接打开索引：
+#   - 索引记录已索引到的 JSONL 字节偏移及文件开头内容的指纹 (与 collect_games 的增量检查点相同的做法)；
+#   - JSONL 在上次索引之后有追加 (例如爬虫中途退出、其他程序写入) 时，只解析新增部分补入索引；
+#   - 索引文件缺失、损坏、键的映射函数变化，或 JSONL 被截断/重写时，自动从头重建；
+#     JSONL 已压缩归档到按月分区 (见 raw_partitions.py) 时，重建同时读取各分区，归档代数变化时也重建。
+# 查询走 SQLite 主键索引，每次写出一条记录后调用 add 把键写入索引。
+# 索引无法写入 (例如目录只读) 时退回内存中的 SQLite 数据库，行为与原先每次全量解析相同。
+
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+from jsonl_reader import JsonlReadStats, iter_jsonl
+from raw_partitions import RawPartitions
+
+KEY_INDEX_FORMAT = 1
+INDEX_SUFFIX = '.keys.sqlite'
+HEAD_BYTES = 4096 # 用文件开头的内容指纹识别文件被替换或重写
+INSERT_BATCH = 10000
+
+def index_path_for(jsonl_path):
+    return f"{jsonl_path}{INDEX_SUFFIX}"
+
+class KeyIndex:
+    """JSONL 文件中记录键的持久化集合，支持 `key in index`、`index.add(key)` 和 `len(index)`
+
+    可在多个线程中使用 (例如爬虫线程查询、后台写入线程 jsonl_writer.JsonlWriter 写入键)。
+
+    project: 从记录取出键 (二元组) 的模块级函数，返回 None 的记录不计入；与 iter_jsonl 的 project 参数相同。
+    key_version: 映射函数的逻辑变化时递增，使已有索引失效并重建。
+    """
+
+    def __init__(self, jsonl_path, project, key_version=1, index_path=None):
+        self.jsonl_path = jsonl_path
+        self.project = project
+        self.key_id = f"{project.__module__}.{project.__qualname__}:{key_version}"
+        self.index_path = index_path or index_path_for(jsonl_path)
+        self.status = None # 'fresh' / 'caught_up' / 'rebuilt'
+        self.reason = ''
+        self.stats = None
+        self.in_memory = False
+        self._conn = None
+        self._lock = threading.RLock()
+        try:
+            self._open(self.index_path)
+        except (sqlite3.OperationalError, OSError) as e: # 无法打开或写入 (目录只读、被其他进程锁定等)
+            self._open_in_memory(e)
+        except sqlite3.DatabaseError as e:
+            # 索引文件损坏：删除后重建
+            logging.warning(f"键索引 {self.index_path} 已损坏 ({e})，删除后重建。")
+            try:
+                self._discard()
+                self._open(self.index_path)
+            except (sqlite3.Error, OSError) as retry_error:
+                self._open_in_memory(retry_error)
+
+    # --- 打开与同步 ---
+    def _open(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False) # 访问由 self._lock 串行化
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS keys (name TEXT, date TEXT, PRIMARY KEY (name, date)) WITHOUT ROWID")
+        self._conn.commit()
+        self.sync()
+
+    def _open_in_memory(self, error):
+        logging.warning(f"无法使用键索引文件 {self.index_path} ({error})，本次在内存中构建索引。")
+        self._close_connection()
+        self.in_memory = True
+        self._open(':memory:')
+
+    def _discard(self):
+        self._close_connection()
+        for path in (self.index_path, f"{self.index_path}-journal"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _meta(self):
+        return dict(self._conn.execute("SELECT name, value FROM meta"))
+
+    def sync(self):
+        """把 JSONL 中尚未索引的内容补入索引；索引与 JSONL 不一致时从头重建"""
+        meta = self._meta()
+        try:
+            with open(self.jsonl_path, 'rb') as f:
+                head = f.read(HEAD_BYTES)
+                size = os.fstat(f.fileno()).st_size
+        except FileNotFoundError:
+            head, size = b'', 0
+
+        raw = RawPartitions(self.jsonl_path)
+        try:
+            archive = raw.load_manifest()
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取原始记录分区清单失败 ({e})，键索引只包含活动 JSONL 中的记录。")
+            archive = {'generation': -1, 'partitions': {}}
+        generation = str(archive.get('generation', 0))
+
+        offset = int(meta['offset']) if meta.get('offset', '').isdigit() else 0
+        rebuild_reason = None
+        if not meta:
+            rebuild_reason = '索引不存在'
+        elif meta.get('format') != str(KEY_INDEX_FORMAT) or meta.get('key_id') != self.key_id:
+            rebuild_reason = '索引格式或键的映射函数已变化'
+        elif meta.get('archive_generation', '0') != generation:
+            rebuild_reason = 'JSONL 已压缩归档'
+        elif offset > size or _head_hash(head, offset) != meta.get('head_hash'):
+            rebuild_reason = 'JSONL 已被截断或重写'
+        if rebuild_reason is None and offset == size:
+            self._set_status('fresh', '', None)
+            return
+        if rebuild_reason is not None:
+            offset = 0
+            self._conn.execute("DELETE FROM keys")
+
+        stats = JsonlReadStats(offset)
+        if rebuild_reason is not None:
+            for _, path, _ in raw.partitions(archive):
+                partition_stats = JsonlReadStats()
+                self._insert_keys(path, 0, partition_stats)
+                stats.records += partition_stats.records
+                stats._add_bad(partition_stats.bad_lines, partition_stats.bad_samples)
+        if size > offset:
+            self._insert_keys(self.jsonl_path, offset, stats)
+        if rebuild_reason is not None:
+            self._set_status('rebuilt', rebuild_reason, stats)
+        else:
+            self._set_status('caught_up', f"补入偏移 {offset} 之后的新增内容", stats)
+        end_offset = stats.end_offset # 末尾未写完的半行不计入，下次同步时再读取
+        self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+            ('format', str(KEY_INDEX_FORMAT)),
+            ('key_id', self.key_id),
+            ('offset', str(end_offset)),
+            ('archive_generation', generation),
+            ('head_hash', _head_hash(head, end_offset)),
+        ])
+        self._conn.commit()
+
+    def _insert_keys(self, path, offset, stats):
+        batch = []
+        for key in iter_jsonl(path, offset, stats, project=self.project):
+            batch.append((str(key[0]), str(key[1])))
+            if len(batch) >= INSERT_BATCH:
+                self._conn.executemany("INSERT OR IGNORE INTO keys VALUES (?, ?)", batch)
+                batch = []
+        if batch:
+            self._conn.executemany("INSERT OR IGNORE INTO keys VALUES (?, ?)", batch)
+
+    def _set_status(self, status, reason, stats):
+        # 只记录打开时的同步结果 (供 describe 使用)，close 时的同步不覆盖
+        if self.status is None:
+            self.status, self.reason, self.stats = status, reason, stats
+
+    # --- 查询与更新 ---
+    def __contains__(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM keys WHERE name = ? AND date = ?", (str(key[0]), str(key[1]))).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+
+    def add(self, key):
+        """记录新写出的键 (JSONL 偏移在下次 sync / close 时推进)"""
+        self.add_many([key])
+
+    def add_many(self, keys):
+        """一次事务记录多个新写出的键"""
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO keys VALUES (?, ?)", [(str(key[0]), str(key[1])) for key in keys])
+            self._conn.commit()
+
+    def describe(self):
+        """索引加载情况的说明 (供爬虫打印)"""
+        file_name = os.path.basename(self.jsonl_path)
+        where = '内存中的索引' if self.in_memory else os.path.basename(self.index_path)
+        if self.status == 'fresh':
+            message = f"从键索引 {where} 加载了 {len(self)} 个已存在的 (名称, 日期) 键。"
+        elif self.status == 'caught_up':
+            message = f"键索引 {where} 已补入 {file_name} 的 {self.stats.records} 条新增记录 ({self.reason})，共 {len(self)} 个 (名称, 日期) 键。"
+        else:
+            message = f"已从 {file_name} 重建键索引 {where} ({self.reason})，共 {len(self)} 个 (名称, 日期) 键。"
+        if self.stats is not None and self.stats.bad_lines:
+            message += f"\n警告: {self.stats.describe_bad_lines(file_name)}"
+        return message
+
+    def close(self):
+        """补入本次运行追加到 JSONL 的内容并关闭索引"""
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self.sync()
+            except (sqlite3.Error, OSError) as e:
+                logging.warning(f"同步键索引 {self.index_path} 失败: {e}，下次启动时将自动补入。")
+            self._close_connection()
+
+    def _close_connection(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+def _head_hash(head, offset):
+    return hashlib.sha1(head[:offset]).hexdigest() if offset < HEAD_BYTES else hashlib.sha1(head).hexdigest()
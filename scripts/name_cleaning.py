@@ -0,0 +1,133 @@
+# scripts/name_cleaning.py
+# 游戏名称清理引擎：按配置预编译一次，带有界记忆缓存
+#
+# collect_games.py、analyze_game_updates.py 等模块共用同一套清理规则。
+# 规则来自配置 game_name_cleaning:
+#   normalize_unicode_form  Unicode 规范化形式 (默认 NFKC)
+#   remove_patterns_regex   依次删除的正则；以 '$' 结尾的模式忽略大小写，
+#                           末尾的 '$' (或 'i$') 作为标记被去掉
+#
+# 各模式原本按顺序逐个 re.sub，前一个模式删除内容后可能让后一个模式产生新的匹配，
+# 因此不能简单合并成一次替换。这里把所有模式合并为一个正则只用于快速判断：
+# 绝大多数名称一次扫描即可确认没有任何模式命中，命中时再按原顺序逐个替换，结果与逐个替换完全一致。
+
+import re
+import json
+import hashlib
+import logging
+import unicodedata
+from functools import lru_cache
+
+DEFAULT_MEMO_SIZE = 65536 # 每套配置缓存的名称数量上限
+UNKNOWN_NAME = "未知名称"
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def _parse_pattern(pattern):
+    """解析配置中的模式，返回 (正则文本, flags)；'$' 结尾表示忽略大小写，标记本身被去掉"""
+    flags = 0
+    if pattern.endswith('$'): # Assume case-insensitive if ends with $
+        flags = re.IGNORECASE
+        # Remove flag marker if present (simple check)
+        if len(pattern) > 1 and pattern[-2] == 'i': pattern = pattern[:-2]
+        else: pattern = pattern[:-1] # Just remove $
+    return pattern, flags
+
+def config_hash(cleaning_config):
+    """名称清理配置的指纹"""
+    return hashlib.sha1(json.dumps(cleaning_config or {}, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class GameNameCleaner:
+    """按一份名称清理配置预编译的清理器
+
+    clean() 对单个名称清理 (带记忆缓存)，clean_many() 对整列名称批量清理。
+    """
+
+    def __init__(self, cleaning_config=None, memo_size=DEFAULT_MEMO_SIZE):
+        cleaning_config = cleaning_config or {}
+        self.config_hash = config_hash(cleaning_config)
+        self.norm_form = cleaning_config.get('normalize_unicode_form', 'NFKC')
+
+        self.patterns = []
+        merged_parts = []
+        for raw_pattern in cleaning_config.get('remove_patterns_regex', []):
+            pattern, flags = _parse_pattern(raw_pattern)
+            try:
+                self.patterns.append(re.compile(pattern, flags))
+            except re.error as e:
+                logging.warning(f"应用名称清理正则失败 ('{pattern}'): {e}")
+                continue
+            merged_parts.append(f"(?i:{pattern})" if flags & re.IGNORECASE else f"(?:{pattern})")
+
+        self.any_pattern = None
+        # 含反向引用的模式合并后组号会错位，此时不使用合并正则
+        has_backreference = any(re.search(r'\\\d|\(\?P=', p.pattern) for p in self.patterns)
+        if merged_parts and not has_backreference:
+            try:
+                self.any_pattern = re.compile('|'.join(merged_parts))
+            except re.error:
+                self.any_pattern = None # 模式中含有无法合并的写法 (例如全局内联标志)，每次都逐个替换
+
+        self._memo_clean = lru_cache(maxsize=memo_size)(self._clean_uncached)
+
+    def _clean_uncached(self, name):
+        if not name: return UNKNOWN_NAME
+
+        # 1. Unicode 规范化
+        try:
+            normalized_name = unicodedata.normalize(self.norm_form, str(name))
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Unicode规范化失败 ('{name}', form='{self.norm_form}'): {e}")
+            normalized_name = str(name) # Fallback
+
+        cleaned = normalized_name
+        # 2. 应用正则表达式移除模式 (合并正则未命中时全部跳过)
+        if self.any_pattern is None or self.any_pattern.search(cleaned):
+            for pattern in self.patterns:
+                cleaned = pattern.sub('', cleaned)
+
+        # 3. 替换多个空格为单个空格，去除首尾空格
+        cleaned = _WHITESPACE_RE.sub(' ', cleaned).strip()
+
+        # 如果清理后为空，返回原始名称（规范化后）
+        return cleaned if cleaned else normalized_name.strip()
+
+    def clean(self, name):
+        """清理单个名称"""
+        try:
+            return self._memo_clean(name)
+        except TypeError: # 不可哈希的值无法缓存
+            return self._clean_uncached(name)
+
+    def clean_many(self, names):
+        """批量清理一列名称 (列表、pandas Series 等可迭代对象)，返回等长列表
+
+        同一批中重复的名称只清理一次。
+        """
+        results = {}
+        cleaned_names = []
+        for name in names:
+            try:
+                cleaned = results.get(name)
+                if cleaned is None:
+                    cleaned = results[name] = self.clean(name)
+            except TypeError:
+                cleaned = self._clean_uncached(name)
+            cleaned_names.append(cleaned)
+        return cleaned_names
+
+    def cache_info(self):
+        return self._memo_clean.cache_info()
+
+# 按配置指纹共享清理器，配置不变时各模块拿到同一个实例 (及同一份记忆缓存)
+_cleaners = {}
+
+def get_name_cleaner(cleaning_config=None):
+    """返回与配置对应的共享清理器"""
+    key = config_hash(cleaning_config)
+    cleaner = _cleaners.get(key)
+    if cleaner is None:
+        if len(_cleaners) >= 8: # 配置极少变化，只保留最近几份
+            _cleaners.pop(next(iter(_cleaners)))
+        cleaner = _cleaners[key] = GameNameCleaner(cleaning_config)
+    return cleaner
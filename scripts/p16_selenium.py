@@ -19,6 +19,8 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
 from selenium.webdriver.common.action_chains import ActionChains
+from key_index import KeyIndex
+from jsonl_writer import JsonlWriter
 
 # --- 常量定义 ---
 # 保存结果的文件夹
@@ -36,8 +38,11 @@ DEFAULT_TARGET_URL = f"{BASE_URL}/newgame"
 # 多线程配置
 MAX_WORKERS = 3
 
-# 文件写入锁
-file_lock = threading.Lock()
+# 输出写入配置 (见 jsonl_writer.py)：各线程把记录提交给同一个后台写入器，按批写出
+# 每批最多条数、最长攒批秒数、每批写出后的持久化方式 ('none' / 'flush' / 'fsync')
+WRITE_BATCH_SIZE = 20
+WRITE_FLUSH_INTERVAL = 2.0
+WRITE_DURABILITY = 'flush'
 
 # Base64 占位符图标模式
 BASE64_PLACEHOLDER_PATTERN = re.compile(r'^data:image\/gif;base64,')
@@ -92,27 +97,19 @@ def setup_driver(headless=True):
         return None
 
 # --- 修改：加载 (name, date) 键 --- 
+def _existing_p16_key(data):
+    """键索引 (iter_jsonl) 的映射函数：取出记录的 (清理后名称, 日期) 键，缺少任一项时返回 None (大文件时在子进程中执行)"""
+    name = data.get('name')
+    date = data.get('date')
+    if name and date and isinstance(date, str):
+        # 注意：这里的名称可能需要与后续提取的名称做同样的清理
+        return (clean_game_name(name), date.strip())
+    return None
+
 def load_existing_p16_keys(filepath):
-    """从 JSONL 文件加载已存在的 (游戏名称, 日期) 键"""
-    existing_keys = set()
-    if os.path.exists(filepath):
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        data = json.loads(line.strip())
-                        name = data.get('name')
-                        date = data.get('date')
-                        if name and date:
-                            # 注意：这里的名称可能需要与后续提取的名称做同样的清理
-                            existing_keys.add((clean_game_name(name), date.strip()))
-                    except json.JSONDecodeError:
-                        print(f"警告: 无法解析行: {line.strip()}")
-                    except Exception as parse_e:
-                        print(f"警告: 解析行时出错 ({line.strip()}): {parse_e}")
-            print(f"从 {filepath} 加载了 {len(existing_keys)} 个已存在的 (名称, 日期) 键。")
-        except Exception as e:
-            print(f"读取已存在键文件时出错 ({filepath}): {e}")
+    """打开 JSONL 文件的键索引 (旁路 SQLite 文件，缺失或过期时自动重建)，返回已存在的 (游戏名称, 日期) 键集合"""
+    existing_keys = KeyIndex(filepath, _existing_p16_key)
+    print(existing_keys.describe())
     return existing_keys
 
 def scroll_to_bottom(driver, max_attempts=5, scroll_pause_time=2):
@@ -504,7 +501,7 @@ def get_game_details(driver, game_url, list_page_icon_url=None):
     return description, category, rating, external_link, source, icon_url
 
 # --- 修改：移除 existing_original_links 参数 --- 
-def process_game_item(original_16p_link, basic_info, list_page_icon_url, output_path):
+def process_game_item(original_16p_link, basic_info, list_page_icon_url, writer):
     """
     单个游戏条目的处理函数（在线程中运行）
     返回: 成功处理的数据字典或 None
@@ -551,18 +548,15 @@ def process_game_item(original_16p_link, basic_info, list_page_icon_url, output_
         #      print(f"[线程 {thread_id}] 链接 {original_16p_link} 在处理过程中发现已存在，取消写入。")
         #      return None
 
-        # 写入文件（加锁）
-        with file_lock:
-            try:
-                with open(output_path, 'a', encoding='utf-8') as outfile:
-                    json.dump(item_data, outfile, ensure_ascii=False)
-                    outfile.write('\n')
-                print(f"[线程 {thread_id}] -> 成功保存条目 {item_data['name']} 到 {os.path.basename(output_path)} (来源: {final_source})")
-                # 返回数据以便主线程更新计数和集合
-                return item_data
-            except Exception as write_e:
-                print(f"[线程 {thread_id}] 写入条目 {item_data['name']} 数据到文件时出错: {write_e}")
-                return None # 写入失败
+        # 提交给后台写入器 (线程安全，按批写出并更新键索引)
+        try:
+            writer.write(item_data)
+            print(f"[线程 {thread_id}] -> 成功处理条目 {item_data['name']}，已提交写入 {os.path.basename(writer.path)} (来源: {final_source})")
+            # 返回数据以便主线程更新计数
+            return item_data
+        except Exception as write_e:
+            print(f"[线程 {thread_id}] 写入条目 {item_data['name']} 数据到文件时出错: {write_e}")
+            return None # 写入失败
 
     except Exception as e:
         print(f"[线程 {thread_id}] 处理条目 {original_16p_link} 时发生错误: {e}")
@@ -590,6 +584,7 @@ def get_16p_data(target_url=DEFAULT_TARGET_URL):
     main_driver = setup_driver(headless=True)
     if not main_driver:
         print("主 WebDriver 初始化失败，无法继续。")
+        existing_keys.close()
         return 0
 
     tasks_submitted = 0
@@ -770,16 +765,19 @@ def get_16p_data(target_url=DEFAULT_TARGET_URL):
     newly_scraped_count = 0
     if not items_to_process:
         print("没有新的游戏条目需要处理。")
+        existing_keys.close()
         return 0 # 直接返回新增数量 0
 
     # --- 修改：移除 existing_links 传递 --- 
     # current_existing_links = existing_keys.copy()
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+    writer = JsonlWriter(output_path, existing_keys, _existing_p16_key, batch_size=WRITE_BATCH_SIZE,
+                         flush_interval=WRITE_FLUSH_INTERVAL, durability=WRITE_DURABILITY)
+    with writer, ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
         # 提交所有任务
         # --- 修改：移除 existing_links 参数 ---
         future_to_item = {
-            executor.submit(process_game_item, item["link"], item["basic_info"], item["icon"], output_path): item["link"]
+            executor.submit(process_game_item, item["link"], item["basic_info"], item["icon"], writer): item["link"]
             for item in items_to_process
         }
 
@@ -794,10 +792,7 @@ def get_16p_data(target_url=DEFAULT_TARGET_URL):
                 result_data = future.result() # 获取线程返回的数据
                 if result_data:
                     newly_scraped_count += 1
-                    # 添加新处理成功的键到内存缓存（如果需要实时避免重复提交，但这里过滤已在提交前完成）
-                    # new_key = (result_data.get('name'), result_data.get('date'))
-                    # if new_key[0] and new_key[1]:
-                    #     existing_keys.add(new_key) 
+                    # 新记录的键由后台写入器在写出后写入键索引 (提交前已过滤重复)
                 # 打印进度
                 if processed_count % 10 == 0 or processed_count == total_tasks:
                      print(f"  处理进度: {processed_count}/{total_tasks} (新增: {newly_scraped_count})", end='\r') # 使用\r覆盖
@@ -805,6 +800,10 @@ def get_16p_data(target_url=DEFAULT_TARGET_URL):
             except Exception as exc:
                 print(f"\n  处理链接 {original_link} 时线程产生异常: {exc}")
 
+    if writer.error:
+        print(f"\n警告: 后台写入 {OUTPUT_FILENAME} 失败 ({writer.error})，实际写出 {writer.written} 条。")
+        newly_scraped_count = writer.written
+    existing_keys.close() # 同步键索引的 JSONL 偏移
     print(f"\n\n16p 页面 {target_url} 处理完成。") # 换行以清除进度条
     print(f"总共提交 {tasks_submitted} 个新游戏条目进行处理。")
     print(f"因 (名称, 日期) 已存在而跳过 {skipped_due_to_cache} 个条目。")
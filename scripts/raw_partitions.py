@@ -0,0 +1,219 @@
+# scripts/raw_partitions.py
+# 爬虫原始记录的压缩归档：把只追加的 JSONL (taptap_games.jsonl / p16_games.jsonl) 中的记录按月分区保存
+#
+# 目录结构 (data/raw/<JSONL 文件名去掉扩展名>/):
+#   manifest.json     分区清单：每个分区的文件名、记录数、字节数、内容 SHA-1、日期范围，及归档代数 (generation)
+#   <YYYY-MM>.jsonl   该月 (按记录的 date，缺失时按 status_date) 的记录；日期无法识别的记录在 unknown.jsonl
+#
+# 压缩 (compact) 把活动 JSONL 中以换行结尾的完整行并入各月分区，同一 (来源, 名称, 日期) 只保留一条：
+# 取非空字段最多的记录，相同时取较新的 (后写入的) 一条。分区内记录保持各键首次出现的顺序。
+# 写完分区和清单后，活动 JSONL 只保留末尾未写完的半行，爬虫继续向其追加。
+# 压缩中途失败时活动 JSONL 不变，再次压缩结果相同 (合并按键取最丰富的记录，可重复执行)。
+# 压缩替换活动 JSONL 时，正在写入的爬虫仍会向旧文件追加，这些记录会丢失。因此压缩前先获取 <文件名>.lock 上的
+# 独占锁 (file_lock.FileLock)：爬虫的 JsonlWriter 打开文件期间持有共享锁，有写入方时压缩抛出 LockBusyError、不做任何修改；
+# 压缩期间启动的写入方等待压缩完成。
+#
+# 读取方先按清单读取各分区，再读取活动 JSONL；清单中的 SHA-1 用于增量加载时跳过未变化的分区，不必打开文件。
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import logging
+from datetime import datetime
+from jsonl_reader import JsonlReadStats, iter_jsonl
+from file_lock import FileLock
+
+RAW_FORMAT = 1
+RAW_DIR = 'raw'
+MANIFEST_FILE = 'manifest.json'
+UNKNOWN_MONTH = 'unknown'
+INCOMING_DIR = '.incoming' # 压缩时按月暂存活动 JSONL 记录的临时目录
+
+_MONTH_PATTERN = re.compile(r'^(\d{4}-\d{2})(?:-\d{2})?')
+
+def record_key(record):
+    """归档时的去重键: (来源, 原始名称, 日期)，与 collect_games 增量清单的记录身份键一致"""
+    return (str(record.get('source', '')), str(record.get('name', '')), str(record.get('date', '') or record.get('status_date', '')))
+
+def record_month(record):
+    """记录所属的分区 (YYYY-MM)，日期无法识别时为 unknown"""
+    date = record.get('date') or record.get('status_date')
+    match = _MONTH_PATTERN.match(date.strip()) if isinstance(date, str) else None
+    return match.group(1) if match else UNKNOWN_MONTH
+
+def record_richness(record):
+    """非空/非 False 字段的数量 (与 collect_games._calculate_richness 的口径相同)"""
+    return sum(1 for value in record.values() if value not in [None, '', False, 0, 0.0])
+
+def _empty_result():
+    return {'compacted': False, 'records_read': 0, 'bad_lines': 0, 'partitions_written': 0,
+            'records_written': 0, 'collapsed': 0}
+
+def _encode(record):
+    return json.dumps(record, ensure_ascii=False) + '\n' # 与爬虫写入的格式相同
+
+class RawPartitions:
+    """一个活动 JSONL 文件及其按月分区的归档"""
+
+    def __init__(self, jsonl_path):
+        self.jsonl_path = jsonl_path
+        self.name = os.path.splitext(os.path.basename(jsonl_path))[0]
+        self.directory = os.path.join(os.path.dirname(jsonl_path), RAW_DIR, self.name)
+        self.manifest_path = os.path.join(self.directory, MANIFEST_FILE)
+
+    def checkpoint_key(self, month):
+        """分区在 collect_games 增量检查点中的键 (相对 data 目录的路径)"""
+        return f"{RAW_DIR}/{self.name}/{month}.jsonl"
+
+    def load_manifest(self):
+        """读取分区清单；从未压缩过或清单无法读取时返回没有分区的清单"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = None
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"读取原始记录分区清单 {self.manifest_path} 失败: {e}")
+            raise
+        if manifest is None:
+            return {'format': RAW_FORMAT, 'generation': 0, 'partitions': {}}
+        if manifest.get('format') != RAW_FORMAT:
+            raise ValueError(f"原始记录分区清单 {self.manifest_path} 的格式版本 {manifest.get('format')} 不受支持")
+        return manifest
+
+    def partitions(self, manifest=None):
+        """按月份升序 (unknown 在最后) 返回 [(月份, 分区文件路径, 清单条目)]"""
+        manifest = manifest or self.load_manifest()
+        months = sorted(manifest['partitions'], key=lambda month: (month == UNKNOWN_MONTH, month))
+        return [(month, os.path.join(self.directory, manifest['partitions'][month]['file']), manifest['partitions'][month])
+                for month in months]
+
+    def paths(self, manifest=None):
+        """所有分区文件及活动 JSONL 的路径 (按读取顺序)"""
+        return [path for _, path, _ in self.partitions(manifest)] + [self.jsonl_path]
+
+    # --- 压缩 ---
+    def compact(self):
+        """把活动 JSONL 中的完整行并入按月分区，返回统计 (没有可压缩的内容时 compacted 为 False)
+
+        有爬虫正在写入活动 JSONL 时抛出 file_lock.LockBusyError，不做任何修改。
+        """
+        if not os.path.exists(self.jsonl_path):
+            return _empty_result()
+        lock = FileLock(self.jsonl_path)
+        lock.acquire(blocking=False)
+        try:
+            return self._compact()
+        finally:
+            lock.release()
+
+    def _compact(self):
+        """compact 的实际步骤，调用方已持有独占锁"""
+        manifest = self.load_manifest()
+        stats = JsonlReadStats()
+        result = _empty_result()
+        if not os.path.exists(self.jsonl_path):
+            return result
+
+        # 1. 按月把活动 JSONL 的记录暂存到单独的文件，每次只需在内存中合并一个月的记录
+        incoming_dir = os.path.join(self.directory, INCOMING_DIR)
+        shutil.rmtree(incoming_dir, ignore_errors=True)
+        os.makedirs(incoming_dir)
+        incoming = {}
+        try:
+            for record in iter_jsonl(self.jsonl_path, 0, stats):
+                month = record_month(record)
+                f = incoming.get(month)
+                if f is None:
+                    f = incoming[month] = open(os.path.join(incoming_dir, f"{month}.jsonl"), 'w', encoding='utf-8')
+                f.write(_encode(record))
+        finally:
+            for f in incoming.values():
+                f.close()
+        result['records_read'] = stats.records
+        result['bad_lines'] = stats.bad_lines
+        if stats.bad_lines:
+            logging.warning(f"压缩时{stats.describe_bad_lines(os.path.basename(self.jsonl_path))}")
+        if stats.end_offset == 0:
+            shutil.rmtree(incoming_dir, ignore_errors=True)
+            return result
+
+        # 2. 逐月合并已有分区与暂存的新记录，写出新分区文件
+        for month in sorted(incoming):
+            entry = self._merge_partition(month, manifest['partitions'].get(month), os.path.join(incoming_dir, f"{month}.jsonl"))
+            result['collapsed'] += entry.pop('collapsed')
+            manifest['partitions'][month] = entry
+            result['partitions_written'] += 1
+            result['records_written'] += entry['records']
+
+        # 3. 写出清单，然后从活动 JSONL 中移除已归档的行 (保留末尾未写完的半行)
+        manifest['generation'] = manifest.get('generation', 0) + 1
+        manifest['compacted_at'] = datetime.now().isoformat(timespec='seconds')
+        manifest['source_file'] = os.path.basename(self.jsonl_path)
+        self._write_atomic(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+        with open(self.jsonl_path, 'rb') as f:
+            f.seek(stats.end_offset)
+            tail = f.read()
+        self._write_atomic(self.jsonl_path, tail)
+        shutil.rmtree(incoming_dir, ignore_errors=True)
+        result['compacted'] = True
+        result['generation'] = manifest['generation']
+        result['partitions_total'] = len(manifest['partitions'])
+        result['records_total'] = sum(entry['records'] for entry in manifest['partitions'].values())
+        return result
+
+    def _merge_partition(self, month, entry, incoming_path):
+        """合并一个月的已有分区和新记录，按键只保留最丰富的记录，返回新的清单条目"""
+        merged = {} # 键 -> (丰富度, 记录)；替换时保持键首次出现的位置
+        input_count = 0
+        sources = [incoming_path]
+        if entry is not None:
+            sources.insert(0, os.path.join(self.directory, entry['file']))
+        for path in sources:
+            if not os.path.exists(path):
+                logging.warning(f"原始记录分区 {path} 不存在，按空分区处理。")
+                continue
+            part_stats = JsonlReadStats()
+            for record in iter_jsonl(path, 0, part_stats, workers=1):
+                input_count += 1
+                key = record_key(record)
+                richness = record_richness(record)
+                current = merged.get(key)
+                if current is None or richness >= current[0]: # 相同时取较新的记录
+                    merged[key] = (richness, record)
+            if part_stats.bad_lines:
+                logging.warning(f"压缩时{part_stats.describe_bad_lines(os.path.basename(path))}")
+
+        file_name = f"{month}.jsonl"
+        digest = hashlib.sha1()
+        size = 0
+        dates = []
+        tmp_path = os.path.join(self.directory, f"{file_name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            for _, record in merged.values():
+                data = _encode(record).encode('utf-8')
+                f.write(data)
+                digest.update(data)
+                size += len(data)
+                date = record.get('date') or record.get('status_date')
+                if isinstance(date, str) and date:
+                    dates.append(date)
+        os.replace(tmp_path, os.path.join(self.directory, file_name))
+        return {
+            'file': file_name,
+            'records': len(merged),
+            'bytes': size,
+            'sha1': digest.hexdigest(),
+            'min_date': min(dates) if dates else None,
+            'max_date': max(dates) if dates else None,
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+            'collapsed': input_count - len(merged),
+        }
+
+    def _write_atomic(self, path, payload):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
@@ -0,0 +1,277 @@
+# scripts/run_report.py
+# 数据收集运行报告：逐阶段记录耗时、CPU 时间、输入/输出记录数和内存峰值
+#
+# 每次运行写出一份 JSON 报告，并在 history.jsonl 中追加一行摘要，便于对比各次运行:
+#   <report_dir>/collect_games_<时间戳>.json   完整报告 (只保留最近 KEEP_REPORTS 份)
+#   <report_dir>/history.jsonl                 每次运行一行的摘要
+#   <report_dir>/profile_<时间戳>/             --profile 模式下各阶段的 cProfile 结果
+#                                              (.prof 可用 pstats/snakeviz 打开，.txt 为按累计耗时排序的前若干行)
+#
+# 每个阶段结束时记录进程峰值 RSS (单调不减，峰值在哪个阶段上升即由哪个阶段造成；Windows 下无此项)。
+# trace_memory=True 时另用 tracemalloc 统计各阶段内 Python 分配的内存峰值 (每个阶段开始时重置峰值)；
+# tracemalloc 会让分配密集的阶段慢数倍，因此默认关闭。
+#
+# cProfile 在 Python 3.12 以前按线程工作，工作线程中的调用可以同时各自分析 (StageRecord.call_profiled)。
+# 3.12 起 cProfile 基于 sys.monitoring，整个进程同一时间只能启用一个 profiler (并记录所有线程)：
+# call_profiled 会暂停所在阶段的 profiler 并让各次调用依次执行，以便每次调用仍单独生成结果，
+# 代价是原本并发的调用 (例如各来源的抓取) 变为串行。
+
+import os
+import io
+import sys
+import shutil
+import json
+import time
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None # Windows 下没有 resource 模块，不记录峰值 RSS
+
+KEEP_REPORTS = 90 # 保留的完整报告份数 (history.jsonl 不清理)
+KEEP_PROFILES = 10 # 保留的性能分析目录份数
+HISTORY_FILE = 'history.jsonl'
+PROFILE_TOP_LINES = 40
+# 能否在多个线程中同时各自启用 cProfile (3.12 起同一进程只能有一个)
+PER_THREAD_PROFILING = sys.version_info < (3, 12)
+
+def _mb(size_bytes):
+    return round(size_bytes / 1024 / 1024, 2)
+
+def _max_rss_mb():
+    """进程至今的峰值常驻内存 (MB)，不支持时返回 None"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return _mb(max_rss if sys.platform == 'darwin' else max_rss * 1024) # macOS 单位为字节，Linux 为 KB
+
+class StageRecord:
+    """一个阶段的测量结果；阶段内可设置 records_out 并在 details 中补充信息"""
+
+    def __init__(self, report, index, name, records_in=None):
+        self.report = report
+        self.index = index
+        self.name = name
+        self.records_in = records_in
+        self.records_out = None
+        self.details = {}
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.memory = None
+        self.max_rss_mb = None
+        self.error = None
+        self.profiler = None # 阶段自身的 profiler (由 RunReport.stage 设置)
+        self._profile_lock = threading.Lock()
+
+    def call_profiled(self, label, func, *args, **kwargs):
+        """在当前线程中调用 func；--profile 模式下单独为这次调用生成 cProfile 结果
+
+        用于在工作线程中执行的部分。Python 3.12+ 上各次调用依次执行，期间暂停阶段的 profiler (见文件开头说明)。
+        """
+        if not self.report.profile:
+            return func(*args, **kwargs)
+        if PER_THREAD_PROFILING:
+            return self._run_profiled(label, func, args, kwargs)
+        if self._profile_lock.locked():
+            logging.info(f"阶段 '{self.name}' 的 '{label}' 等待其他调用的性能分析结束 (Python 3.12+ 同一时间只能启用一个 cProfile)。")
+        with self._profile_lock:
+            stage_profiler = self.profiler
+            if stage_profiler is not None:
+                stage_profiler.disable()
+            try:
+                return self._run_profiled(label, func, args, kwargs)
+            finally:
+                if stage_profiler is not None:
+                    stage_profiler.enable()
+
+    def _run_profiled(self, label, func, args, kwargs):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError: # 其他代码 (例如外部调试器) 已启用了 profiler
+            logging.warning(f"阶段 '{self.name}' 的 '{label}' 无法启用 cProfile (已有其他 profiler 在运行)，跳过分析。")
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            self.report._dump_profile(profiler, f"{self.index:02d}_{self.name}.{label}")
+
+    def to_dict(self):
+        result = {
+            'name': self.name,
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'records_in': self.records_in,
+            'records_out': self.records_out,
+        }
+        if self.max_rss_mb is not None:
+            result['max_rss_mb'] = self.max_rss_mb
+        if self.memory is not None:
+            result['memory_mb'] = self.memory
+        if self.details:
+            result['details'] = self.details
+        if self.error:
+            result['error'] = self.error
+        return result
+
+class RunReport:
+    """一次运行的阶段报告
+
+    用法:
+        report = RunReport('collect_games', report_dir, profile=args.profile)
+        with report.stage('dedup', records_in=len(games)) as stage:
+            result = ...
+            stage.records_out = len(result)
+        report.finish(success=True)
+    """
+
+    def __init__(self, run_name, report_dir, profile=False, trace_memory=False):
+        self.run_name = run_name
+        self.report_dir = report_dir
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.started_at = datetime.now()
+        self.timestamp = self.started_at.strftime('%Y%m%d_%H%M%S')
+        self.stages = []
+        self.summary = {}
+        self.profile_dir = os.path.join(report_dir, f"profile_{self.timestamp}") if profile else None
+        self._started_wall = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self._owns_tracemalloc = False
+        self._lock = threading.Lock()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    @contextmanager
+    def stage(self, name, records_in=None):
+        """测量一个阶段；阶段内抛出的异常会记录在报告中并继续向上抛出"""
+        stage = StageRecord(self, len(self.stages) + 1, name, records_in)
+        self.stages.append(stage)
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+        profiler = None
+        if self.profile:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                logging.warning(f"阶段 '{name}' 无法启用 cProfile (已有其他 profiler 在运行)，跳过分析。")
+                profiler = None
+            stage.profiler = profiler
+        started_wall = time.perf_counter()
+        started_cpu = time.process_time()
+        try:
+            yield stage
+        except BaseException as e:
+            stage.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stage.wall_seconds = round(time.perf_counter() - started_wall, 3)
+            stage.cpu_seconds = round(time.process_time() - started_cpu, 3)
+            if profiler is not None:
+                stage.profiler = None
+                profiler.disable()
+                self._dump_profile(profiler, f"{stage.index:02d}_{name}")
+            stage.max_rss_mb = _max_rss_mb()
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                stage.memory = {'start': _mb(memory_start), 'end': _mb(current), 'peak': _mb(peak)}
+
+    def _dump_profile(self, profiler, file_stem):
+        try:
+            with self._lock:
+                os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{file_stem}.prof"))
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP_LINES)
+            with open(os.path.join(self.profile_dir, f"{file_stem}.txt"), 'w', encoding='utf-8') as f:
+                f.write(text.getvalue())
+        except Exception as e:
+            logging.error(f"写出性能分析结果 {file_stem} 失败: {e}")
+
+    def to_dict(self, success):
+        stages = [stage.to_dict() for stage in self.stages]
+        peaks = [stage['memory_mb']['peak'] for stage in stages if 'memory_mb' in stage]
+        return {
+            'run': self.run_name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'success': success,
+            'wall_seconds': round(time.perf_counter() - self._started_wall, 3),
+            'cpu_seconds': round(time.process_time() - self._started_cpu, 3),
+            'max_rss_mb': _max_rss_mb(),
+            'peak_memory_mb': max(peaks) if peaks else None,
+            'trace_memory': self.trace_memory,
+            'profile_dir': self.profile_dir,
+            'summary': self.summary,
+            'stages': stages,
+        }
+
+    def finish(self, success):
+        """写出完整报告并追加历史摘要，返回报告路径 (写出失败时返回 None)"""
+        report = self.to_dict(success)
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+        self._log_summary(report)
+        try:
+            os.makedirs(self.report_dir, exist_ok=True)
+            path = os.path.join(self.report_dir, f"{self.run_name}_{self.timestamp}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            history_entry = {
+                'started_at': report['started_at'],
+                'success': success,
+                'wall_seconds': report['wall_seconds'],
+                'cpu_seconds': report['cpu_seconds'],
+                'max_rss_mb': report['max_rss_mb'],
+                'peak_memory_mb': report['peak_memory_mb'],
+                'summary': report['summary'],
+                'stages': {stage['name']: stage['wall_seconds'] for stage in report['stages']},
+                'report': os.path.basename(path),
+            }
+            with open(os.path.join(self.report_dir, HISTORY_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(history_entry, ensure_ascii=False) + '\n')
+            self._prune_reports()
+        except Exception as e:
+            logging.error(f"写出运行报告失败: {e}", exc_info=True)
+            return None
+        logging.info(f"运行报告已写出: {path}")
+        return path
+
+    def _log_summary(self, report):
+        logging.info("--- 各阶段耗时 ---")
+        for stage in report['stages']:
+            counts = ''
+            if stage['records_in'] is not None or stage['records_out'] is not None:
+                counts = f", 记录 {stage['records_in'] if stage['records_in'] is not None else '-'} -> {stage['records_out'] if stage['records_out'] is not None else '-'}"
+            memory = f", 峰值 RSS {stage['max_rss_mb']} MB" if 'max_rss_mb' in stage else ''
+            if 'memory_mb' in stage:
+                memory += f", 阶段内 Python 内存峰值 {stage['memory_mb']['peak']} MB"
+            logging.info(f"  {stage['name']}: 耗时 {stage['wall_seconds']:.2f}s, CPU {stage['cpu_seconds']:.2f}s{counts}{memory}")
+
+    def _prune_reports(self):
+        """删除超出保留份数的旧报告和旧性能分析目录 (文件名中的时间戳按字典序即时间顺序)"""
+        prefix = f"{self.run_name}_"
+        entries = os.listdir(self.report_dir)
+        reports = sorted(f for f in entries if f.startswith(prefix) and f.endswith('.json'))
+        profiles = sorted(f for f in entries if f.startswith('profile_') and os.path.isdir(os.path.join(self.report_dir, f)))
+        for stale in reports[:-KEEP_REPORTS] + profiles[:-KEEP_PROFILES]:
+            stale_path = os.path.join(self.report_dir, stale)
+            try:
+                if os.path.isdir(stale_path):
+                    shutil.rmtree(stale_path)
+                else:
+                    os.remove(stale_path)
+            except OSError as e:
+                logging.warning(f"删除旧运行报告 {stale} 失败: {e}")
@@ -0,0 +1,285 @@
+# scripts/snapshot_history.py
+# 主 Excel 的版本化历史快照：每次成功保存后记录一个不可变版本，替代只能回退一次的 .bak 副本
+#
+# 目录结构 (data/history/):
+#   versions/<版本号>.json            版本清单：表头、数据块列表 (哈希 + 行数)、创建时间和运行信息
+#   objects/<哈希前两位>/<哈希>.json.gz  数据块：若干行单元格取值组成的 JSON 数组 (gzip 压缩)，按内容 SHA-1 寻址
+#
+# 快照保存的是写入主 Excel 的行 (与表头顺序一致的单元格取值)，恢复时原样写回工作簿。
+# 数据块按内容切分 (content-defined chunking)：某行内容的 CRC32 满足条件时在该行之后切块，
+# 插入或修改记录只影响所在的块，其余块的内容和哈希不变，在各版本之间共享，不重复存储。
+# 版本清单写入后不再修改；保留策略删除过期清单后，不再被任何清单引用的数据块一并删除。
+#
+# 后端 (backend/app.py) 的 as_of 参数通过 resolve / iter_rows 按需读取历史版本。
+
+import os
+import json
+import gzip
+import zlib
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+HISTORY_FORMAT = 1
+VERSIONS_DIR = 'versions'
+OBJECTS_DIR = 'objects'
+OBJECT_SUFFIX = '.json.gz'
+COMPRESS_LEVEL = 6
+
+# 数据块大小：平均约 AVERAGE_BLOCK_ROWS 行 (须为 2 的幂)，不少于 MIN_BLOCK_ROWS、不多于 MAX_BLOCK_ROWS 行
+AVERAGE_BLOCK_ROWS = 256
+MIN_BLOCK_ROWS = 32
+MAX_BLOCK_ROWS = 2048
+
+# 保留策略：最近 KEEP_LAST 个版本全部保留；此外最近 KEEP_DAILY_DAYS 天内每天保留最后一个版本，
+# 最近 KEEP_MONTHLY_MONTHS 个月内每月保留最后一个版本
+KEEP_LAST = 30
+KEEP_DAILY_DAYS = 90
+KEEP_MONTHLY_MONTHS = 24
+
+def _encode_row(row):
+    return json.dumps(row, ensure_ascii=False, default=str) # 旧工作簿中的日期单元格等按字符串保存
+
+def parse_as_of(as_of):
+    """解析 as_of 参数：整数为版本号，日期 (YYYY-MM-DD) 或日期时间 (ISO 格式) 为时间点
+
+    返回 ('version', 版本号) 或 ('time', datetime)；只给日期时表示当天结束时。格式无效时抛出 ValueError。
+    """
+    text = str(as_of).strip()
+    if text.isdigit():
+        return 'version', int(text)
+    try:
+        if len(text) == 10:
+            return 'time', datetime.strptime(text, '%Y-%m-%d') + timedelta(days=1) - timedelta(microseconds=1)
+        moment = datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"as_of 应为版本号、YYYY-MM-DD 日期或 ISO 格式时间，收到 '{as_of}'") from None
+    if moment.tzinfo is not None: # 版本创建时间为本地时间
+        moment = moment.astimezone().replace(tzinfo=None)
+    return 'time', moment
+
+class SnapshotWriter:
+    """逐行接收一个新版本的数据，按内容切块写出数据块，commit 时写出版本清单
+
+    写入失败 (例如磁盘已满) 时记录错误并停止写入，不影响调用方继续写主 Excel；commit 时返回 None。
+    """
+
+    def __init__(self, history, header):
+        self.history = history
+        self.header = list(header)
+        self.blocks = []
+        self.record_count = 0
+        self.new_blocks = 0
+        self.error = None
+        self._pending = []
+
+    def add(self, row):
+        if self.error is not None:
+            return
+        encoded = _encode_row(row)
+        self._pending.append(encoded)
+        self.record_count += 1
+        pending = len(self._pending)
+        if pending >= MAX_BLOCK_ROWS or (
+                pending >= MIN_BLOCK_ROWS and zlib.crc32(encoded.encode('utf-8')) & (AVERAGE_BLOCK_ROWS - 1) == 0):
+            self._flush_block()
+
+    def _flush_block(self):
+        if not self._pending or self.error is not None:
+            return
+        data = ('[' + ',\n'.join(self._pending) + ']').encode('utf-8')
+        digest = hashlib.sha1(data).hexdigest()
+        try:
+            if self.history._write_object(digest, data):
+                self.new_blocks += 1
+        except (OSError, TypeError, ValueError) as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logging.error(f"写出历史快照数据块失败，本次不生成历史版本: {self.error}")
+        self.blocks.append([digest, len(self._pending)])
+        self._pending = []
+
+    def commit(self, metadata=None):
+        """写出版本清单，返回新版本的清单 (写入失败时返回 None)"""
+        self._flush_block()
+        if self.error is not None:
+            return None
+        try:
+            return self.history._write_manifest(self.header, self.blocks, self.record_count, self.new_blocks, metadata)
+        except OSError as e:
+            self.error = f"{type(e).__name__}: {e}"
+            logging.error(f"写出历史快照版本清单失败: {self.error}")
+            return None
+
+class SnapshotHistory:
+    """data/history/ 中的版本化快照"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.versions_dir = os.path.join(directory, VERSIONS_DIR)
+        self.objects_dir = os.path.join(directory, OBJECTS_DIR)
+        self._created_at = {} # 版本号 -> 创建时间；清单写入后不再修改，每个版本只读取一次
+
+    # --- 写入 ---
+    def begin(self, header):
+        """开始写入一个新版本；调用 writer.add(行) 逐行写入，writer.commit() 生效，不 commit 则不产生版本"""
+        os.makedirs(self.versions_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+        return SnapshotWriter(self, header)
+
+    def save(self, header, rows, metadata=None):
+        writer = self.begin(header)
+        for row in rows:
+            writer.add(row)
+        return writer.commit(metadata)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}{OBJECT_SUFFIX}")
+
+    def _write_object(self, digest, data):
+        """写出数据块，已存在 (其他版本共享) 时跳过；返回是否新写出"""
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write_atomic(path, gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+        return True
+
+    def _write_manifest(self, header, blocks, record_count, new_blocks, metadata):
+        versions = self.list_versions()
+        version = versions[-1] + 1 if versions else 1
+        manifest = {
+            'format': HISTORY_FORMAT,
+            'version': version,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'record_count': record_count,
+            'new_blocks': new_blocks,
+            'metadata': metadata or {},
+            'header': header,
+            'blocks': blocks,
+        }
+        self._write_atomic(self._manifest_path(version), json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+        logging.info(f"历史快照版本 {version} 已写出: {record_count} 行, {len(blocks)} 个数据块 (新增 {new_blocks} 个)")
+        return manifest
+
+    def _write_atomic(self, path, payload):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    # --- 读取 ---
+    def _manifest_path(self, version):
+        return os.path.join(self.versions_dir, f"{version:06d}.json")
+
+    def list_versions(self):
+        """按版本号升序返回所有版本号"""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        versions = []
+        for file_name in os.listdir(self.versions_dir):
+            stem, ext = os.path.splitext(file_name)
+            if ext == '.json' and stem.isdigit():
+                versions.append(int(stem))
+        return sorted(versions)
+
+    def load_manifest(self, version):
+        """读取版本清单，版本不存在时抛出 FileNotFoundError"""
+        with open(self._manifest_path(version), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def manifests(self):
+        """按版本号升序返回所有可读的版本清单"""
+        result = []
+        for version in self.list_versions():
+            try:
+                result.append(self.load_manifest(version))
+            except (OSError, json.JSONDecodeError) as e:
+                logging.warning(f"读取历史快照版本 {version} 的清单失败: {e}")
+        return result
+
+    def resolve(self, as_of):
+        """把 as_of 参数解析为已有的版本号，没有符合条件的版本时返回 None (格式无效时抛出 ValueError)"""
+        kind, value = parse_as_of(as_of)
+        versions = self.list_versions()
+        if kind == 'version':
+            return value if value in versions else None
+        for version in reversed(versions):
+            try:
+                created_at = self.created_at(version)
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"读取历史快照版本 {version} 的清单失败: {e}")
+                continue
+            if created_at <= value:
+                return version
+        return None
+
+    def created_at(self, version):
+        """版本的创建时间 (datetime)，首次查询时读取清单，之后从缓存返回"""
+        created_at = self._created_at.get(version)
+        if created_at is None:
+            created_at = datetime.fromisoformat(self.load_manifest(version)['created_at'])
+            self._created_at[version] = created_at
+        return created_at
+
+    def iter_rows(self, version, manifest=None):
+        """逐块读取版本中的所有行 (按保存时的顺序)"""
+        manifest = manifest or self.load_manifest(version)
+        for digest, row_count in manifest['blocks']:
+            with open(self._object_path(digest), 'rb') as f:
+                rows = json.loads(gzip.decompress(f.read()))
+            if len(rows) != row_count:
+                raise ValueError(f"历史快照版本 {version} 的数据块 {digest} 行数不符 (清单 {row_count}, 实际 {len(rows)})")
+            yield from rows
+
+    # --- 保留策略 ---
+    def prune(self, now=None):
+        """按保留策略删除过期版本及不再被引用的数据块，返回删除的版本号列表"""
+        now = now or datetime.now()
+        manifests = self.manifests()
+        keep = {manifest['version'] for manifest in manifests[-KEEP_LAST:]}
+        daily_cutoff = now - timedelta(days=KEEP_DAILY_DAYS)
+        monthly_cutoff = (now.year * 12 + now.month - 1) - KEEP_MONTHLY_MONTHS
+        latest_per_day = {}
+        latest_per_month = {}
+        for manifest in manifests:
+            created_at = datetime.fromisoformat(manifest['created_at'])
+            if created_at >= daily_cutoff:
+                latest_per_day[created_at.date()] = manifest['version']
+            if created_at.year * 12 + created_at.month - 1 > monthly_cutoff:
+                latest_per_month[(created_at.year, created_at.month)] = manifest['version']
+        keep.update(latest_per_day.values())
+        keep.update(latest_per_month.values())
+
+        removed = set()
+        for manifest in manifests:
+            if manifest['version'] in keep:
+                continue
+            try:
+                os.remove(self._manifest_path(manifest['version']))
+                removed.add(manifest['version'])
+            except OSError as e:
+                logging.warning(f"删除历史快照版本 {manifest['version']} 失败: {e}")
+        if removed:
+            referenced = {digest for manifest in manifests if manifest['version'] not in removed for digest, _ in manifest['blocks']}
+            deleted_blocks = self._sweep_objects(referenced)
+            logging.info(f"按保留策略删除了 {len(removed)} 个历史快照版本及 {deleted_blocks} 个不再引用的数据块。")
+        return sorted(removed)
+
+    def _sweep_objects(self, referenced):
+        """删除不在 referenced 中的数据块 (及写入中断残留的临时文件)"""
+        deleted = 0
+        if not os.path.isdir(self.objects_dir):
+            return deleted
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for file_name in os.listdir(prefix_dir):
+                if file_name.endswith(OBJECT_SUFFIX) and file_name[:-len(OBJECT_SUFFIX)] in referenced:
+                    continue
+                try:
+                    os.remove(os.path.join(prefix_dir, file_name))
+                    deleted += 1
+                except OSError as e:
+                    logging.warning(f"删除数据块 {file_name} 失败: {e}")
+        return deleted
@@ -0,0 +1,154 @@
+# scripts/status_standardization.py
+# 游戏状态标准化引擎：关键词组预编译为 Aho-Corasick 自动机，带记忆缓存
+#
+# 规则来自配置 status_standardization，按优先级依次为:
+#   招募 (keywords_recruit)  > 不删档 (keywords_no_delete) > 测试 (keywords_test)
+#   > 预约 (keywords_preorder) > 上线 (keywords_online) > 更新 (keywords_update)
+# 状态文本包含某组任一关键词即归入该组，同时命中多组时取优先级最高的一组。
+# 与原实现一致：招募组在去除首尾空白后的原文上匹配 (区分大小写)，其余各组在小写文本上匹配。
+#
+# 原始状态的种类很少 (几十种)，结果按原始值缓存，整列批量处理时每种状态只计算一次。
+
+import json
+import hashlib
+import logging
+from collections import deque
+
+MEMO_SIZE = 4096 # 缓存的原始状态种类上限
+UNKNOWN_STATUS = "未知状态"
+
+# (关键词配置键, 标准状态配置键)，按优先级从高到低
+STATUS_GROUPS = [
+    ('keywords_recruit', 'status_recruit'),
+    ('keywords_no_delete', 'status_no_delete'),
+    ('keywords_test', 'status_test'),
+    ('keywords_preorder', 'status_preorder'),
+    ('keywords_online', 'status_online'),
+    ('keywords_update', 'status_update'),
+]
+CASE_SENSITIVE_GROUPS = {'keywords_recruit'}
+
+_NO_MATCH = len(STATUS_GROUPS) # 大于任何组下标，表示未命中
+
+class KeywordAutomaton:
+    """多关键词 Aho-Corasick 自动机，一次扫描返回命中的最高优先级 (最小) 组号"""
+
+    def __init__(self, keyword_groups):
+        """keyword_groups: [(组号, [关键词, ...]), ...]"""
+        self.goto = [{}]
+        self.fail = [0]
+        self.best = [_NO_MATCH] # 在该状态结束的关键词 (含失败链上的) 中最小的组号
+
+        for group_index, keywords in keyword_groups:
+            for keyword in keywords:
+                state = 0
+                for char in keyword:
+                    next_state = self.goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(self.goto)
+                        self.goto[state][char] = next_state
+                        self.goto.append({})
+                        self.fail.append(0)
+                        self.best.append(_NO_MATCH)
+                    state = next_state
+                # 空关键词在根节点结束，与 "'' in text" 恒为真一致
+                self.best[state] = min(self.best[state], group_index)
+
+        # 广度优先构建失败链，并沿失败链合并命中组号
+        queue = deque(self.goto[0].values())
+        for state in queue:
+            self.best[state] = min(self.best[state], self.best[0])
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                fallback = self.goto[fail_state].get(char, 0)
+                self.fail[next_state] = fallback if fallback != next_state else 0
+                self.best[next_state] = min(self.best[next_state], self.best[self.fail[next_state]])
+                queue.append(next_state)
+
+    def best_group(self, text):
+        """返回文本中命中的最小组号，未命中返回 None"""
+        goto, fail, best = self.goto, self.fail, self.best
+        state = 0
+        found = best[0]
+        for char in text:
+            if found == 0:
+                break # 已命中最高优先级，无需继续扫描
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if best[state] < found:
+                found = best[state]
+        return found if found < _NO_MATCH else None
+
+def config_hash(status_config):
+    """状态标准化配置的指纹"""
+    return hashlib.sha1(json.dumps(status_config or {}, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class StatusStandardizer:
+    """按一份 status_standardization 配置预编译的状态标准化器
+
+    standardize() 对单个状态标准化 (按原始值缓存)，standardize_many() 对整列状态批量标准化。
+    """
+
+    def __init__(self, status_config=None):
+        status_config = status_config or {}
+        self.config_hash = config_hash(status_config)
+        self.status_config = status_config
+        sensitive_groups = []
+        lower_groups = []
+        for group_index, (keywords_key, _) in enumerate(STATUS_GROUPS):
+            keywords = status_config.get(keywords_key, [])
+            if keywords_key in CASE_SENSITIVE_GROUPS:
+                sensitive_groups.append((group_index, keywords))
+            else:
+                lower_groups.append((group_index, keywords))
+        self._sensitive_automaton = KeywordAutomaton(sensitive_groups)
+        self._lower_automaton = KeywordAutomaton(lower_groups)
+        self._memo = {}
+
+    def _standardize_uncached(self, status):
+        status_trimmed = status.strip()
+        if not status_trimmed: # Handle empty status
+            return UNKNOWN_STATUS
+
+        group = self._sensitive_automaton.best_group(status_trimmed)
+        lower_group = self._lower_automaton.best_group(status_trimmed.lower())
+        if group is None or (lower_group is not None and lower_group < group):
+            group = lower_group
+        if group is None:
+            logging.debug(f"状态 '{status_trimmed}' 未匹配任何标准化规则，返回原始值。")
+            return status_trimmed
+        return self.status_config.get(STATUS_GROUPS[group][1], status_trimmed)
+
+    def standardize(self, status):
+        """标准化单个状态值"""
+        if not isinstance(status, str):
+            status = str(status)
+        result = self._memo.get(status)
+        if result is None:
+            if len(self._memo) >= MEMO_SIZE: # 状态种类异常多时 (例如脏数据) 避免无限增长
+                self._memo.clear()
+            result = self._memo[status] = self._standardize_uncached(status)
+        return result
+
+    def standardize_many(self, statuses):
+        """批量标准化一列状态 (列表、pandas Series 等)，返回等长列表"""
+        standardize = self.standardize
+        return [standardize(status) for status in statuses]
+
+# 按配置指纹共享标准化器，配置不变时各模块拿到同一个实例 (及同一份缓存)
+_standardizers = {}
+
+def get_status_standardizer(status_config=None):
+    """返回与配置对应的共享标准化器"""
+    key = config_hash(status_config)
+    standardizer = _standardizers.get(key)
+    if standardizer is None:
+        if len(_standardizers) >= 8: # 配置极少变化，只保留最近几份
+            _standardizers.pop(next(iter(_standardizers)))
+        standardizer = _standardizers[key] = StatusStandardizer(status_config)
+    return standardizer
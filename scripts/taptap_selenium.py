@@ -14,6 +14,8 @@ from webdriver_manager.microsoft import EdgeChromiumDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from key_index import KeyIndex
+from jsonl_writer import JsonlWriter
 
 # 保存结果的文件夹
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
@@ -23,6 +25,11 @@ os.makedirs(DATA_DIR, exist_ok=True)
 # 修改：固定输出文件名
 OUTPUT_FILENAME = 'taptap_games.jsonl'
 
+# 输出写入配置 (见 jsonl_writer.py)：每批最多条数、最长攒批秒数、每批写出后的持久化方式 ('none' / 'flush' / 'fsync')
+WRITE_BATCH_SIZE = 20
+WRITE_FLUSH_INTERVAL = 2.0
+WRITE_DURABILITY = 'flush'
+
 def random_delay(min_sec=0.5, max_sec=1.5):
     """避免爬取过快"""
     time.sleep(random.uniform(min_sec, max_sec))
@@ -50,27 +57,19 @@ def setup_driver(headless=True):
         return None
 
 # --- 修改：加载 (name, date) 键 ---
+def _existing_game_key(data):
+    """键索引 (iter_jsonl) 的映射函数：取出记录的 (名称, 日期) 键，缺少任一项时返回 None (大文件时在子进程中执行)"""
+    name = data.get('name')
+    date = data.get('date')
+    if name and date and isinstance(name, str) and isinstance(date, str):
+        # 将名称规范化处理可能有助于去重，但这里暂时保持原始名称
+        return (name.strip(), date.strip())
+    return None
+
 def load_existing_game_keys(filepath):
-    """从 JSONL 文件加载已存在的 (游戏名称, 日期) 键"""
-    existing_keys = set()
-    if os.path.exists(filepath):
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        data = json.loads(line.strip())
-                        name = data.get('name')
-                        date = data.get('date')
-                        if name and date:
-                            # 将名称规范化处理可能有助于去重，但这里暂时保持原始名称
-                            existing_keys.add((name.strip(), date.strip()))
-                    except json.JSONDecodeError:
-                        print(f"警告: 无法解析行: {line.strip()}")
-                    except Exception as parse_e:
-                        print(f"警告: 解析行时出错 ({line.strip()}): {parse_e}")
-            print(f"从 {filepath} 加载了 {len(existing_keys)} 个已存在的 (名称, 日期) 键。")
-        except Exception as e:
-            print(f"读取已存在键文件时出错 ({filepath}): {e}")
+    """打开 JSONL 文件的键索引 (旁路 SQLite 文件，缺失或过期时自动重建)，返回已存在的 (游戏名称, 日期) 键集合"""
+    existing_keys = KeyIndex(filepath, _existing_game_key)
+    print(existing_keys.describe())
     return existing_keys
 
 def get_taptap_games_for_date(target_date_str):
@@ -88,6 +87,7 @@ def get_taptap_games_for_date(target_date_str):
     
     driver = setup_driver(headless=True)
     if not driver:
+        existing_keys.close()
         return 0 # 返回新增数量 0
 
     url = f"https://www.taptap.cn/app-calendar/{target_date_str}"
@@ -123,9 +123,10 @@ def get_taptap_games_for_date(target_date_str):
 
         original_window = driver.current_window_handle
         
-        # 2. 打开文件准备追加
+        # 2. 启动后台写入器准备追加 (按批写出，写出后更新键索引)
         # 修改：文件路径固定
-        with open(output_path, 'a', encoding='utf-8') as outfile:
+        with JsonlWriter(output_path, existing_keys, _existing_game_key, batch_size=WRITE_BATCH_SIZE,
+                         flush_interval=WRITE_FLUSH_INTERVAL, durability=WRITE_DURABILITY) as writer:
             for index, g_element in enumerate(game_elements):
                 processed_count += 1
                 print(f"\n-- 检查第 {index + 1}/{len(game_elements)} 个条目 --")
@@ -145,7 +146,7 @@ def get_taptap_games_for_date(target_date_str):
 
                     # 组合键进行检查
                     current_key = (game_name, target_date_str)
-                    if current_key in existing_keys:
+                    if current_key in writer: # 键索引中已有，或本次运行已提交写入
                         print(f"键 {current_key} 已存在于 {OUTPUT_FILENAME}，跳过。")
                         skipped_due_to_cache += 1
                         continue # 跳到下一个游戏
@@ -407,12 +408,10 @@ def get_taptap_games_for_date(target_date_str):
                         "source": "TapTap"
                     }
                     try:
-                        json.dump(game_data, outfile, ensure_ascii=False)
-                        outfile.write('\n')
+                        # 提交给后台写入器；记录写出后其键才写入键索引，提交后同一批次内即可据此去重
+                        writer.write(game_data)
                         newly_scraped_count += 1
-                        # 将新成功的键添加到内存缓存，避免同一批次内重复写入
-                        existing_keys.add(current_key) 
-                        print(f"成功处理并保存游戏 {game_name} 到 {OUTPUT_FILENAME}")
+                        print(f"成功处理游戏 {game_name}，已提交写入 {OUTPUT_FILENAME}")
                     except Exception as write_e:
                          print(f"写入游戏 {game_name} 数据到文件时出错: {write_e}")
                 else:
@@ -420,6 +419,9 @@ def get_taptap_games_for_date(target_date_str):
 
             # 循环结束
             print("\n所有列表条目处理完毕。")
+        if writer.error:
+            print(f"警告: 后台写入 {OUTPUT_FILENAME} 失败 ({writer.error})，实际写出 {writer.written} 条。")
+            newly_scraped_count = writer.written
 
     except Exception as e:
         print(f"抓取过程中发生未预料的错误: {e}")
@@ -428,6 +430,7 @@ def get_taptap_games_for_date(target_date_str):
         if driver:
             driver.quit()
             print("浏览器已关闭。")
+        existing_keys.close() # 同步键索引的 JSONL 偏移
 
     print(f"\nTapTap 日期 {target_date_str} 处理完成。")
     print(f"总共检查 {processed_count} 个列表条目。")
@@ -106,14 +106,44 @@ def run_collect_script():
         logger.error(f"运行数据收集脚本时出错: {e}")
         return False
 
+BACKEND_URL = os.environ.get('GAME_MONITOR_BACKEND_URL', 'http://localhost:5000')
+BACKEND_START_TIMEOUT = 60 # 等待新启动后端就绪的最长时间 (秒)
+
+def notify_backend_reload():
+    """
+    通知正在运行的后端重新加载数据 (调用 /api/admin/reload)
+    
+    返回:
+        bool: 后端是否接受了重载请求
+    """
+    import requests
+    
+    token = os.environ.get('GAME_MONITOR_RELOAD_TOKEN', '')
+    if not token:
+        logger.warning("未设置 GAME_MONITOR_RELOAD_TOKEN，无法调用重载接口；后端将通过文件监听自动加载新数据")
+        return False
+    
+    try:
+        response = requests.post(f'{BACKEND_URL}/api/admin/reload', params={'wait': '1'},
+                                 headers={'X-Reload-Token': token}, timeout=120)
+        if response.status_code == 200:
+            result = response.json()
+            logger.info(f"后端已重新加载数据 (版本: {result.get('version')}, 已替换: {result.get('reloaded')})")
+            return True
+        logger.warning(f"后端重载接口返回状态码: {response.status_code} - {response.text[:200]}")
+        return False
+    except Exception as e:
+        logger.error(f"调用后端重载接口时出错: {e}")
+        return False
+
 def restart_backend():
     """
-    尝试重启后端服务
+    让后端使用最新数据：后端已运行时调用重载接口 (无需重启)，否则启动后端
     
     返回:
-        bool: 是否成功重启
+        bool: 后端是否已在使用最新数据运行
     """
-    logger.info("尝试重启后端服务...")
+    logger.info("尝试让后端加载最新数据...")
     
     try:
         # 检查后端是否在运行
@@ -121,9 +151,11 @@ def restart_backend():
         import requests
         
         try:
-            response = requests.get('http://localhost:5000/')
+            response = requests.get(f'{BACKEND_URL}/', timeout=5)
             if response.status_code == 200:
-                logger.info("后端服务已在运行")
+                logger.info("后端服务已在运行，请求热重载数据")
+                if not notify_backend_reload():
+                    logger.info("重载接口不可用，后端的数据文件监听会在检测到变化后自动加载")
                 return True
         except:
             logger.info("后端服务未运行，尝试启动...")
@@ -137,24 +169,25 @@ def restart_backend():
                            creationflags=subprocess.CREATE_NEW_CONSOLE)
         else:  # Linux/Mac
             subprocess.Popen(['python3', app_path], 
-                           stdout=subprocess.PIPE, 
-                           stderr=subprocess.PIPE)
-        
-        # 给一些时间让后端启动
-        time.sleep(5)
+                           stdout=subprocess.DEVNULL, 
+                           stderr=subprocess.DEVNULL)
         
-        # 验证后端是否已启动
-        try:
-            response = requests.get('http://localhost:5000/')
-            if response.status_code == 200:
-                logger.info("后端服务已成功启动")
-                return True
-            else:
+        # 轮询等待后端就绪 (启动时会预热数据快照)，而不是固定等待
+        deadline = time.time() + BACKEND_START_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(1)
+            try:
+                response = requests.get(f'{BACKEND_URL}/', timeout=5)
+                if response.status_code == 200:
+                    logger.info("后端服务已成功启动")
+                    return True
                 logger.warning(f"后端服务启动，但返回状态码: {response.status_code}")
                 return False
-        except:
-            logger.error("后端服务启动失败")
-            return False
+            except:
+                continue
+        
+        logger.error(f"后端服务在 {BACKEND_START_TIMEOUT} 秒内未能启动")
+        return False
             
     except Exception as e:
         logger.error(f"重启后端服务时出错: {e}")
@@ -188,12 +221,12 @@ def main():
     success = run_collect_script()
     
     if success:
-        # 重启后端服务
+        # 通知后端重新加载数据 (未运行时启动后端)
         restart_success = restart_backend()
         if restart_success:
-            logger.info("数据更新和后端重启成功完成")
+            logger.info("数据更新和后端数据重载成功完成")
         else:
-            logger.warning("数据已更新，但后端重启失败")
+            logger.warning("数据已更新，但后端重载/启动失败")
     else:
         logger.error("数据更新失败")
     
@@ -17,6 +17,7 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import collections # Add this import at the top
+from jsonl_reader import JsonlReadStats, iter_jsonl
 
 # 并发工作线程数 (可以根据机器性能调整)
 MAX_MATCH_WORKERS = 3 # Adjusted for potentially longer individual queries
@@ -38,20 +39,19 @@ def load_version_cache():
     if not os.path.exists(CACHE_FILE):
         return cache
     try:
-        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    data = json.loads(line.strip())
-                    # Store result keyed by name
-                    if 'name' in data:
-                        # 新结构：包含结果和查询月份
-                        cache_entry = {
-                            'result': data.get('result'),
-                            'query_month': data.get('query_month', get_current_month())  # 默认为当前月份
-                        }
-                        cache[data['name']] = cache_entry
-                except json.JSONDecodeError:
-                    print(f"[缓存警告] 无法解析缓存行: {line.strip()}")
+        stats = JsonlReadStats()
+        current_month = get_current_month()
+        for data in iter_jsonl(CACHE_FILE, stats=stats):
+            # Store result keyed by name
+            if 'name' in data:
+                # 新结构：包含结果和查询月份
+                cache_entry = {
+                    'result': data.get('result'),
+                    'query_month': data.get('query_month', current_month)  # 默认为当前月份
+                }
+                cache[data['name']] = cache_entry
+        if stats.bad_lines:
+            print(f"[缓存警告] {stats.describe_bad_lines(os.path.basename(CACHE_FILE))}")
         print(f"[缓存] 从 {CACHE_FILE} 加载了 {len(cache)} 条记录。")
     except Exception as e:
         print(f"[缓存错误] 读取缓存文件时出错: {e}")
@@ -554,14 +554,16 @@ if __name__ == "__main__":
     # Keep the test logic, but it will now use the cache
     import json
     import os
-    # Need clean_game_name for testing
-    def clean_game_name(name):
-        """清理游戏名称，移除常见的宣传后缀和括号内容"""
-        if not name: return "未知名称"
-        cleaned = re.sub(r'[（(].*?[)）]', '', name)
-        cleaned = re.sub(r'[-–—]\s*[^-\s]+$', '', cleaned)
-        cleaned = cleaned.strip()
-        return cleaned if cleaned else name
+    # 与 collect_games.py 使用同一个名称清理器
+    from name_cleaning import get_name_cleaner
+    config_path = os.path.join(BASE_DIR, 'config', 'collect_games_config.json')
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            name_cleaning_cfg = json.load(f).get('game_name_cleaning', {})
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"[测试警告] 读取配置 {config_path} 失败: {e}，使用默认名称清理规则。")
+        name_cleaning_cfg = {}
+    clean_game_name = get_name_cleaner(name_cleaning_cfg).clean
 
     data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
     target_file = os.path.join(data_dir, "taptap_games_2025-04-08.jsonl") # Example test file
@@ -0,0 +1,32 @@
+# tests/conftest.py
+# 测试共用的导入路径与夹具
+#
+# 数据处理脚本 (scripts/) 和后端 (backend/) 都以所在目录为导入根，这里把两个目录加入 sys.path。
+# 固定的输入/期望输出 (golden) 数据在 tests/fixtures/ 下。
+
+import os
+import sys
+import json
+import logging
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TESTS_DIR)
+FIXTURES_DIR = os.path.join(TESTS_DIR, 'fixtures')
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+for path in (os.path.join(ROOT_DIR, 'scripts'), os.path.join(ROOT_DIR, 'backend')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+def load_fixture(file_name):
+    with open(os.path.join(FIXTURES_DIR, file_name), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@pytest.fixture(scope='session')
+def collect_games():
+    """导入 collect_games 并加载仓库配置 (导入时爬虫模块缺少 selenium 只记录错误日志)"""
+    import collect_games as cg
+    cg.load_config()
+    logging.disable(logging.INFO) # 只保留警告以上的日志，避免处理过程刷屏
+    yield cg
+    logging.disable(logging.NOTSET)
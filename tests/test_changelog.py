@@ -0,0 +1,96 @@
+# tests/test_changelog.py
+# 运行间变更检测 (changelog.ChangelogStore) 的测试：新增、变化、删除、baseline 与无变化的运行
+
+import json
+import os
+from changelog import (ChangelogStore, KEEP_CHANGELOGS, compute_fingerprints, diff_fingerprints,
+                       record_fingerprint)
+from game_record import GameRecord
+
+def game(name, date='2025-01-01', **fields):
+    return dict({'name': name, 'cleaned_name': name, 'date': date, 'status': '测试', 'platform': 'Android'}, **fields)
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def test_fingerprint_ignores_field_order_and_record_type():
+    record = game('甲', rating=7.5)
+    reordered = dict(reversed(list(record.items())))
+    assert record_fingerprint(record) == record_fingerprint(reordered) == record_fingerprint(GameRecord(record))
+    assert record_fingerprint(record) != record_fingerprint(dict(record, rating=8.0))
+
+def test_compute_fingerprints_last_duplicate_wins():
+    first, second = game('甲', status='测试'), game('甲', status='上线')
+    fingerprints, duplicates = compute_fingerprints([first, game('乙'), second])
+    assert duplicates == 1
+    assert list(fingerprints) == [('甲', '2025-01-01'), ('乙', '2025-01-01')]
+    assert fingerprints[('甲', '2025-01-01')] == record_fingerprint(second)
+
+def test_diff_fingerprints_keeps_run_order():
+    previous = {('甲', 'd'): 'a', ('乙', 'd'): 'b', ('丙', 'd'): 'c', ('丁', 'd'): 'd'}
+    current = {('戊', 'd'): 'e', ('乙', 'd'): 'x', ('甲', 'd'): 'a', ('己', 'd'): 'f', ('丁', 'd'): 'y'}
+    added, changed, removed = diff_fingerprints(previous, current)
+    assert added == [('戊', 'd'), ('己', 'd')]
+    assert changed == [('乙', 'd'), ('丁', 'd')]
+    assert removed == [('丙', 'd')]
+
+def test_first_run_writes_counts_only_baseline(tmp_path):
+    store = ChangelogStore(str(tmp_path))
+    path, counts = store.record_run([game('甲'), game('乙')])
+    assert path == store.changelog_path(1)
+    changelog = read_json(path)
+    assert changelog['baseline'] and changelog['version'] == 1 and changelog['previous_version'] is None
+    assert counts == {'total': 2, 'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 2}
+    assert 'added' not in changelog and 'changed' not in changelog and 'removed' not in changelog
+    version, fingerprints = store.load_state()
+    assert version == 1 and set(fingerprints) == {('甲', '2025-01-01'), ('乙', '2025-01-01')}
+
+def test_added_changed_and_removed_records(tmp_path):
+    store = ChangelogStore(str(tmp_path))
+    store.record_run([game('甲'), game('乙'), game('丙')])
+    updated = game('乙', status='上线')
+    path, counts = store.record_run(iter([game('甲'), updated, game('丁', '2025-02-01')])) # 也接受记录流
+    assert counts == {'total': 3, 'added': 1, 'changed': 1, 'removed': 1, 'unchanged': 1}
+    changelog = read_json(path)
+    assert not changelog['baseline'] and changelog['version'] == 2 and changelog['previous_version'] == 1
+    assert changelog['added'] == [game('丁', '2025-02-01')]
+    assert changelog['changed'] == [updated]
+    assert changelog['removed'] == [{'cleaned_name': '丙', 'date': '2025-01-01'}]
+
+def test_unchanged_run_creates_no_version(tmp_path):
+    store = ChangelogStore(str(tmp_path))
+    records = [game('甲'), game('乙')]
+    store.record_run(records)
+    path, counts = store.record_run([GameRecord(record) for record in reversed(records)]) # 顺序和记录类型不算变化
+    assert path is None
+    assert counts == {'total': 2, 'added': 0, 'changed': 0, 'removed': 0, 'unchanged': 2}
+    assert store.load_state()[0] == 1
+    assert not os.path.exists(store.changelog_path(2))
+
+def test_lost_or_corrupt_state_writes_new_baseline(tmp_path):
+    store = ChangelogStore(str(tmp_path))
+    store.record_run([game('甲')])
+    store.record_run([game('甲'), game('乙')])
+    os.remove(store.state_path)
+    path, counts = store.record_run([game('甲'), game('乙'), game('丙')])
+    changelog = read_json(path)
+    assert changelog['baseline'] and changelog['version'] == 3 # 版本号从已有的变更日志文件继续
+    assert counts['added'] == 0 and counts['total'] == 3
+
+    with open(store.state_path, 'w', encoding='utf-8') as f:
+        f.write('{"format": 1, "fingerp')
+    path, _ = store.record_run([game('甲')])
+    assert read_json(path)['baseline'] and read_json(path)['version'] == 4
+
+def test_prune_keeps_latest_changelogs(tmp_path):
+    store = ChangelogStore(str(tmp_path))
+    extra = 5
+    for version in range(1, KEEP_CHANGELOGS + extra):
+        with open(store.changelog_path(version), 'w', encoding='utf-8') as f:
+            f.write('{}')
+    path, _ = store.record_run([game('甲')]) # 没有状态文件：写出 baseline，版本号接在已有文件之后
+    assert path == store.changelog_path(KEEP_CHANGELOGS + extra)
+    versions = store._changelog_versions()
+    assert len(versions) == KEEP_CHANGELOGS
+    assert versions[0] == extra + 1 and versions[-1] == KEEP_CHANGELOGS + extra
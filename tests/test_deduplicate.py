@@ -0,0 +1,44 @@
+# tests/test_deduplicate.py
+# collect_games._deduplicate_games 的 golden 测试
+#
+# fixtures/dedup.json 中的期望输出和计数由优化前的两次遍历实现生成。输入覆盖：
+# 锁定记录的键、重复键 (保留首次出现)、cleaned_name 为空导致写入键相撞后按来源优先级
+# (含大小写与首尾空白不同的来源名) 或丰富度裁决、以及保留已有记录的情况。
+
+import gc
+import copy
+import pytest
+from conftest import load_fixture
+
+FIXTURE = load_fixture('dedup.json')
+
+def locked_records():
+    return {(record['cleaned_name'], record['date']): dict(record) for record in FIXTURE['locked']}
+
+def test_deduplicate_matches_golden(collect_games, monkeypatch):
+    monkeypatch.setitem(collect_games.CONFIG, 'deduplication', FIXTURE['config'])
+    games = copy.deepcopy(FIXTURE['games'])
+    result, report = collect_games._deduplicate_games(games, locked_records())
+
+    assert result == FIXTURE['expected']
+    assert {name: report[name] for name in FIXTURE['counts']} == FIXTURE['counts']
+    assert len(report['conflicts']) == sum(FIXTURE['counts'].values())
+    assert report['locked_records'] == len(FIXTURE['locked'])
+
+def test_deduplicate_accepts_a_stream(collect_games, monkeypatch):
+    monkeypatch.setitem(collect_games.CONFIG, 'deduplication', FIXTURE['config'])
+    games = copy.deepcopy(FIXTURE['games'])
+    result, _ = collect_games._deduplicate_games(iter(games), locked_records())
+    assert result == FIXTURE['expected']
+
+def test_gc_is_paused_only_inside_in_memory_stages(collect_games, monkeypatch):
+    monkeypatch.setitem(collect_games.CONFIG, 'deduplication', FIXTURE['config'])
+    assert gc.isenabled()
+    with collect_games._gc_paused():
+        assert not gc.isenabled()
+        collect_games._deduplicate_games(copy.deepcopy(FIXTURE['games']), locked_records())
+    assert gc.isenabled()
+    with pytest.raises(RuntimeError):
+        with collect_games._gc_paused():
+            raise RuntimeError('阶段失败')
+    assert gc.isenabled() # 阶段出错时也恢复
@@ -0,0 +1,66 @@
+# tests/test_game_record.py
+# 紧凑记录 (__slots__) 与同内容字典的行为一致性测试
+
+import pickle
+import pytest
+import game_record
+import snapshot_store
+from game_record import GameRecord
+
+SAMPLE = {
+    'name': '甲', 'cleaned_name': '甲', 'date': '2025-01-01', 'status': '测试', 'platform': 'Android',
+    'rating': 7.5, 'source': 'TapTap', 'is_featured': False,
+}
+
+def test_pipeline_record_behaves_like_dict():
+    record = GameRecord(SAMPLE)
+    assert record == SAMPLE
+    assert dict(record) == SAMPLE
+    assert list(record.keys()) == [field for field in game_record.GAME_FIELDS if field in SAMPLE]
+    assert 'publisher' not in record and record.get('publisher', '缺省') == '缺省'
+
+    record['extra_field'] = 1
+    record['publisher'] = '厂商A'
+    del record['platform']
+    expected = dict(SAMPLE, publisher='厂商A', extra_field=1)
+    del expected['platform']
+    assert record.to_dict() == expected
+    assert list(record)[-1] == 'extra_field' # 附加字段排在标准字段之后
+    assert pickle.loads(pickle.dumps(record)) == record
+
+def test_pipeline_record_from_columns_matches_rows():
+    keys = list(game_record.GAME_FIELDS) + ['extra_field']
+    rows = [[f"{key}-{index}" for key in keys] for index in range(3)]
+    records = GameRecord.from_columns(keys, list(zip(*rows)))
+    assert [record.to_dict() for record in records] == [dict(zip(keys, row)) for row in rows]
+
+def test_pipeline_record_interns_categorical_strings():
+    first = GameRecord({'status': ''.join(['测', '试']), 'link': ''.join(['a', 'b'])})
+    second = GameRecord({'status': ''.join(['测', '试']), 'link': ''.join(['a', 'b'])})
+    assert first['status'] is second['status']
+
+def test_backend_record_round_trip():
+    fields = {field: None for field in snapshot_store.RECORD_FIELDS}
+    fields.update({'id': 3, 'name': '甲', 'status': '测试', 'is_featured': True, 'score': 7.5})
+    record = snapshot_store.GameRecord(dict(fields, unknown='忽略'))
+    assert record.to_dict() == fields
+    assert list(record.to_dict()) == list(snapshot_store.RECORD_FIELDS)
+    assert record.get('name') == '甲' and record.get('unknown', '缺省') == '缺省'
+
+def test_backend_record_interns_categorical_strings():
+    first = snapshot_store.GameRecord({'status': ''.join(['测', '试'])})
+    second = snapshot_store.GameRecord({'status': ''.join(['测', '试'])})
+    assert first.get('status') is second.get('status')
+    assert first.get('platform') is None
+
+def test_record_types_share_slotted_base():
+    for record_class in (GameRecord, snapshot_store.GameRecord):
+        assert issubclass(record_class, game_record.SlottedRecord)
+        assert record_class.INTERNED_FIELDS <= record_class.FIELD_SET
+        assert not hasattr(record_class(SAMPLE), '__dict__')
+    assert GameRecord.FIELDS == game_record.GAME_FIELDS
+    assert snapshot_store.GameRecord.FIELDS == snapshot_store.RECORD_FIELDS
+
+def test_record_type_rejects_unknown_interned_field():
+    with pytest.raises(ValueError):
+        game_record.record_type('Broken', ('name', 'status'), ('status', 'platfrom'))
@@ -0,0 +1,103 @@
+# tests/test_jsonl_reader.py
+# jsonl_reader.iter_jsonl 与逐行 json.loads 的一致性测试
+#
+# 参照结果：只取以换行结尾的完整行，逐行用标准库解析，跳过空行、无法解析的行和不是 JSON 对象的行。
+
+import json
+import pytest
+import jsonl_reader
+from jsonl_reader import JsonlReadStats, iter_jsonl
+from raw_partitions import record_key
+
+LINES = [
+    {'name': '甲', 'date': '2025-01-01', 'source': 'TapTap'},
+    {'name': '乙', 'date': '2025-01-02', 'rating': 7.5, 'tags': ['a', 'b']},
+    '{"name": "丙", "rating": NaN}',     # orjson 不接受 NaN，退回标准库解析
+    '{"name": "丁", ',                   # 无法解析
+    '[1, 2, 3]',                         # 不是 JSON 对象
+    '',
+    '   ',
+    {'name': '戊', 'date': None, 'source': '16p'},
+    {'name': '己' * 50, 'date': '2025-03-01', 'source': 'AppStore'},
+]
+
+def write_lines(path, lines, repeat=1, tail=''):
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(repeat):
+            for line in lines:
+                f.write((line if isinstance(line, str) else json.dumps(line, ensure_ascii=False)) + '\n')
+        f.write(tail)
+
+def reference_read(path, start_offset=0):
+    with open(path, 'rb') as f:
+        f.seek(start_offset)
+        data = f.read()
+    records = []
+    for line in data[:data.rfind(b'\n') + 1].split(b'\n'):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError:
+            continue
+        if type(value) is dict:
+            records.append(value)
+    return records
+
+def same_records(actual, expected):
+    # NaN != NaN，按序列化结果比较
+    return json.dumps(actual, ensure_ascii=False) == json.dumps(expected, ensure_ascii=False)
+
+def test_matches_line_by_line_parse(tmp_path):
+    path = tmp_path / 'games.jsonl'
+    write_lines(path, LINES, tail='{"name": "未写完')
+    stats = JsonlReadStats()
+    records = list(iter_jsonl(str(path), 0, stats, workers=1))
+    assert same_records(records, reference_read(path))
+    assert stats.records == len(records)
+    assert stats.bad_lines == 2
+    assert stats.end_offset == path.stat().st_size - len('{"name": "未写完'.encode('utf-8'))
+    assert '跳过 2 行无效数据' in stats.describe_bad_lines('games.jsonl')
+
+def test_resumes_from_offset(tmp_path):
+    path = tmp_path / 'games.jsonl'
+    write_lines(path, LINES[:2])
+    first = JsonlReadStats()
+    assert len(list(iter_jsonl(str(path), 0, first))) == 2
+    write_lines(tmp_path / 'more.jsonl', LINES[7:])
+    with open(path, 'ab') as f:
+        f.write((tmp_path / 'more.jsonl').read_bytes())
+    second = JsonlReadStats(first.end_offset)
+    records = list(iter_jsonl(str(path), first.end_offset, second))
+    assert records == reference_read(path, first.end_offset) == LINES[7:]
+    assert second.end_offset == path.stat().st_size
+
+def test_partial_line_only(tmp_path):
+    path = tmp_path / 'games.jsonl'
+    path.write_bytes(b'{"name": "')
+    stats = JsonlReadStats()
+    assert list(iter_jsonl(str(path), 0, stats)) == []
+    assert stats.end_offset == 0
+
+def test_project_drops_none(tmp_path):
+    path = tmp_path / 'games.jsonl'
+    write_lines(path, LINES)
+    expected = [record_key(record) for record in reference_read(path)]
+    assert list(iter_jsonl(str(path), project=record_key)) == expected
+    assert list(iter_jsonl(str(path), project=lambda record: record.get('source'))) == ['TapTap', '16p', 'AppStore']
+
+@pytest.mark.parametrize('project', [None, record_key])
+def test_parallel_ranges_match_serial(tmp_path, monkeypatch, project):
+    path = tmp_path / 'games.jsonl'
+    write_lines(path, LINES, repeat=200, tail='{"name"')
+    monkeypatch.setattr(jsonl_reader, 'CHUNK_BYTES', 4096) # 强制切分为多个区段
+    monkeypatch.setattr(jsonl_reader, 'BATCH_LINES', 64)
+    serial_stats = JsonlReadStats()
+    parallel_stats = JsonlReadStats()
+    serial = list(iter_jsonl(str(path), 0, serial_stats, project=project, workers=1))
+    parallel = list(iter_jsonl(str(path), 0, parallel_stats, project=project, workers=2))
+    assert same_records(parallel, serial)
+    expected = reference_read(path)
+    assert same_records(serial, expected if project is None else [record_key(record) for record in expected])
+    assert (parallel_stats.records, parallel_stats.bad_lines, parallel_stats.end_offset) == \
+           (serial_stats.records, serial_stats.bad_lines, serial_stats.end_offset)
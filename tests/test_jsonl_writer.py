@@ -0,0 +1,76 @@
+# tests/test_jsonl_writer.py
+# 爬虫输出的缓冲写入 (jsonl_writer.JsonlWriter) 的测试
+#
+# 参照结果：每条记录一行 json.dumps(record, ensure_ascii=False) + '\n'，与原先逐条追加写出的内容逐字节相同。
+
+import json
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from jsonl_writer import JsonlWriter
+from key_index import KeyIndex
+
+def game_key(data):
+    name = data.get('name')
+    date = data.get('date')
+    if name and date and isinstance(name, str) and isinstance(date, str):
+        return (name.strip(), date.strip())
+    return None
+
+RECORDS = [{'name': f"游戏{index}", 'date': f"2025-01-{1 + index % 28:02d}", 'rating': index / 10, 'tags': ['a']}
+           for index in range(250)]
+
+def expected_bytes(records):
+    return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+
+@pytest.mark.parametrize('durability', ['none', 'flush', 'fsync'])
+def test_output_matches_line_by_line_append(tmp_path, durability):
+    path = tmp_path / 'out.jsonl'
+    with JsonlWriter(str(path), batch_size=16, durability=durability) as writer:
+        for record in RECORDS:
+            writer.write(record)
+    assert writer.written == len(RECORDS)
+    assert path.read_bytes() == expected_bytes(RECORDS)
+
+def test_concurrent_writers_keep_whole_lines(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    with JsonlWriter(str(path), batch_size=7) as writer, ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(writer.write, RECORDS))
+    assert sorted(path.read_bytes().splitlines()) == sorted(expected_bytes(RECORDS).splitlines())
+
+def test_flush_makes_records_visible(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    writer = JsonlWriter(str(path), batch_size=1000, flush_interval=60, durability='none')
+    for record in RECORDS[:10]:
+        writer.write(record)
+    writer.flush()
+    assert path.read_bytes() == expected_bytes(RECORDS[:10])
+    writer.close()
+    with pytest.raises(OSError):
+        writer.write(RECORDS[0])
+
+def test_partial_trailing_line_is_truncated(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    path.write_bytes(expected_bytes(RECORDS[:3]) + b'{"name": "\xe6\xb8')
+    with JsonlWriter(str(path)) as writer:
+        writer.write(RECORDS[3])
+    assert path.read_bytes() == expected_bytes(RECORDS[:4])
+
+def test_keys_reach_index_after_write(tmp_path):
+    path = tmp_path / 'out.jsonl'
+    path.write_bytes(expected_bytes(RECORDS[:5]))
+    index = KeyIndex(str(path), game_key)
+    writer = JsonlWriter(str(path), key_index=index, key_func=game_key, batch_size=1000, flush_interval=60)
+    for record in RECORDS[5:20]:
+        writer.write(record)
+    assert all(game_key(record) in writer for record in RECORDS[:20]) # 已落盘的键及尚未写出的键
+    assert game_key(RECORDS[19]) not in index
+    writer.close()
+    assert all(game_key(record) in index for record in RECORDS[:20])
+    index.close()
+    reopened = KeyIndex(str(path), game_key)
+    assert reopened.status == 'fresh' and len(reopened) == 20
+    reopened.close()
+
+def test_rejects_unknown_durability(tmp_path):
+    with pytest.raises(ValueError):
+        JsonlWriter(str(tmp_path / 'out.jsonl'), durability='sometimes')
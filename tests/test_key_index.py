@@ -0,0 +1,107 @@
+# tests/test_key_index.py
+# 爬虫键索引 (key_index.KeyIndex) 与逐行解析得到的键集合的一致性测试
+
+import json
+from key_index import KeyIndex, index_path_for
+
+def game_key(data):
+    """与 taptap_selenium._existing_game_key 相同的映射 (爬虫模块依赖 selenium，这里不导入)"""
+    name = data.get('name')
+    date = data.get('date')
+    if name and date and isinstance(name, str) and isinstance(date, str):
+        return (name.strip(), date.strip())
+    return None
+
+def append_records(path, records, tail=''):
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        f.write(tail)
+
+def reference_keys(path):
+    keys = set()
+    with open(path, 'rb') as f:
+        data = f.read()
+    for line in data[:data.rfind(b'\n') + 1].splitlines():
+        try:
+            key = game_key(json.loads(line))
+        except (ValueError, AttributeError):
+            continue
+        if key is not None:
+            keys.add(key)
+    return keys
+
+def records(start, count):
+    return [{'name': f" 游戏{index} ", 'date': f"2025-01-{1 + index % 28:02d}"} for index in range(start, start + count)]
+
+def check(index, path):
+    expected = reference_keys(path)
+    assert len(index) == len(expected)
+    assert all(key in index for key in expected)
+    assert ('不存在的游戏', '2025-01-01') not in index
+
+def test_build_reopen_and_catch_up(tmp_path):
+    path = str(tmp_path / 'taptap_games.jsonl')
+    append_records(path, records(0, 50) + [{'name': None, 'date': '2025-01-01'}], tail='not json\n')
+
+    index = KeyIndex(path, game_key)
+    assert index.status == 'rebuilt'
+    assert index.stats.bad_lines == 1
+    check(index, path)
+    index.close()
+
+    index = KeyIndex(path, game_key)
+    assert index.status == 'fresh'
+    check(index, path)
+    index.close()
+
+    append_records(path, records(50, 20), tail='{"name": "未写完')
+    index = KeyIndex(path, game_key)
+    assert index.status == 'caught_up' and index.stats.records == 20
+    check(index, path)
+    index.close()
+
+def test_add_is_kept_after_close(tmp_path):
+    path = str(tmp_path / 'taptap_games.jsonl')
+    append_records(path, records(0, 5))
+    index = KeyIndex(path, game_key)
+    new = records(5, 3)
+    append_records(path, new)
+    index.add_many([game_key(record) for record in new])
+    assert all(game_key(record) in index for record in new)
+    index.close()
+    index = KeyIndex(path, game_key)
+    assert index.status == 'fresh'
+    check(index, path)
+    index.close()
+
+def test_rebuilds_when_file_is_rewritten(tmp_path):
+    path = str(tmp_path / 'taptap_games.jsonl')
+    append_records(path, records(0, 30))
+    KeyIndex(path, game_key).close()
+
+    with open(path, 'w', encoding='utf-8'):
+        pass
+    append_records(path, records(100, 40)) # 内容不同且更长
+    index = KeyIndex(path, game_key)
+    assert index.status == 'rebuilt'
+    check(index, path)
+    index.close()
+
+def test_rebuilds_when_key_function_changes(tmp_path):
+    path = str(tmp_path / 'taptap_games.jsonl')
+    append_records(path, records(0, 10))
+    KeyIndex(path, game_key).close()
+    index = KeyIndex(path, game_key, key_version=2)
+    assert index.status == 'rebuilt'
+    index.close()
+
+def test_corrupt_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'taptap_games.jsonl')
+    append_records(path, records(0, 10))
+    with open(index_path_for(path), 'wb') as f:
+        f.write(b'this is not a sqlite database' * 100)
+    index = KeyIndex(path, game_key)
+    assert index.status == 'rebuilt' and not index.in_memory
+    check(index, path)
+    index.close()
@@ -0,0 +1,24 @@
+# tests/test_master_excel.py
+# 主 Excel 流式写出 (collect_games._write_master_excel) 的 golden 测试
+#
+# fixtures/master_excel.json 中的期望单元格取值由优化前的整表 DataFrame + to_excel 实现写出后读回得到。
+# 输入覆盖：缺失字段、None、NaN 评分、布尔/数字/字符串形式的 是否重点 和 版号已查、
+# 需要转换为 '是' 的人工校对取值与需要原样保留的备注、列映射之外的附加字段。
+
+import copy
+import openpyxl
+from conftest import load_fixture
+
+FIXTURE = load_fixture('master_excel.json')
+
+def read_sheet_values(path):
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    values = [list(row) for row in workbook.active.iter_rows(values_only=True)]
+    workbook.close()
+    return values
+
+def test_master_excel_matches_golden(collect_games, tmp_path):
+    path = tmp_path / 'all_games_data.xlsx'
+    records = copy.deepcopy(FIXTURE['records'])
+    collect_games._write_master_excel(records, str(path), collect_games.get_excel_columns())
+    assert read_sheet_values(path) == FIXTURE['expected_rows']
@@ -0,0 +1,23 @@
+# tests/test_name_cleaning.py
+# 名称清理 (name_cleaning.GameNameCleaner) 的 golden 测试
+#
+# fixtures/clean_names.json 中的期望输出由优化前的逐条 re.sub 实现生成，
+# 覆盖各种后缀/括号装饰、全角字符、空白、空值。
+
+from conftest import load_fixture
+from name_cleaning import GameNameCleaner
+
+FIXTURE = load_fixture('clean_names.json')
+NAMES = [name for name, _ in FIXTURE['cases']]
+EXPECTED = [cleaned for _, cleaned in FIXTURE['cases']]
+
+def test_clean_many_matches_golden():
+    assert GameNameCleaner(FIXTURE['config']).clean_many(NAMES) == EXPECTED
+
+def test_clean_without_memo_matches_golden():
+    cleaner = GameNameCleaner(FIXTURE['config'], memo_size=0)
+    assert [cleaner.clean(name) for name in NAMES] == EXPECTED
+
+def test_repeated_names_use_memo():
+    cleaner = GameNameCleaner(FIXTURE['config'])
+    assert cleaner.clean_many(NAMES * 3) == EXPECTED * 3
@@ -0,0 +1,38 @@
+# tests/test_old_test_records.py
+# analyze_game_updates.find_old_test_records 删除集合的 golden 测试
+#
+# fixtures/old_test_records.json 是一张手工构造的测试记录表，期望删除的行标签由优化前的逐行实现生成，
+# 覆盖：相邻间隔恰好等于/超过 min_days、链式相连的冲突块、最新日期并列 (只保留排序后的第一条)、
+# 各种锁定写法 (是 / True / yes / 1，大小写与空白)、无效日期 (None 和无法解析的字符串)、
+# 其他状态、空名称，以及非默认且倒序的行索引 (返回的必须是行标签而不是位置)。
+
+import pandas as pd
+import pytest
+from conftest import load_fixture
+from analyze_game_updates import find_old_test_records
+
+FIXTURE = load_fixture('old_test_records.json')
+
+def fixture_frame():
+    rows = FIXTURE['rows']
+    return pd.DataFrame({
+        'cleaned_name': [row[0] for row in rows],
+        'status': [row[1] for row in rows],
+        'parsed_date': pd.to_datetime(pd.Series([row[2] for row in rows], dtype=object), errors='coerce').to_numpy(),
+        'manual_checked': [row[3] for row in rows],
+    }, index=FIXTURE['index'])
+
+@pytest.mark.parametrize('min_days', sorted(int(days) for days in FIXTURE['expected_deleted']))
+def test_deletion_set_matches_golden(min_days):
+    deleted = find_old_test_records(fixture_frame(), FIXTURE['status_test_name'], min_days)
+    assert sorted(deleted) == FIXTURE['expected_deleted'][str(min_days)]
+
+def test_locked_rows_are_never_deleted():
+    frame = fixture_frame()
+    locked = frame.index[frame['manual_checked'].str.strip().str.lower().isin(['true', '是', 'yes', '1'])]
+    for days in FIXTURE['expected_deleted']:
+        assert not set(FIXTURE['expected_deleted'][days]) & set(locked)
+
+def test_empty_frame():
+    frame = fixture_frame().iloc[0:0]
+    assert find_old_test_records(frame, FIXTURE['status_test_name'], 7) == set()
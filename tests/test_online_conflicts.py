@@ -0,0 +1,18 @@
+# tests/test_online_conflicts.py
+# collect_games._resolve_online_conflicts 的 golden 测试
+#
+# fixtures/online_conflicts.json 中各策略的期望输出由优化前的实现 (组内 list.index) 生成。输入覆盖：
+# 同一游戏多条上线记录、AppStore 与其他来源的上线冲突 (移除 AppStore 记录)、只有 AppStore 来源的冲突、
+# 完全相同的重复记录、已有备注的记录。
+
+import copy
+import pytest
+from conftest import load_fixture
+
+FIXTURE = load_fixture('online_conflicts.json')
+
+@pytest.mark.parametrize('strategy', ['add_note_keep_latest', 'log_only', 'disabled'])
+def test_resolve_online_conflicts_matches_golden(collect_games, monkeypatch, strategy):
+    monkeypatch.setitem(collect_games.CONFIG, 'online_conflict', dict(FIXTURE['config'], strategy=strategy))
+    result = collect_games._resolve_online_conflicts(copy.deepcopy(FIXTURE['games']))
+    assert result == FIXTURE[f'expected_{strategy}']
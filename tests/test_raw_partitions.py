@@ -0,0 +1,122 @@
+# tests/test_raw_partitions.py
+# 原始记录按月分区压缩 (raw_partitions.RawPartitions) 的测试
+#
+# 参照结果：按 (来源, 名称, 日期) 取非空字段最多的记录 (相同时取较新的一条)，
+# 压缩后读取全部分区及活动 JSONL 应得到同样的记录集合。
+
+import os
+import json
+import threading
+import pytest
+from file_lock import FileLock, LockBusyError
+from jsonl_reader import iter_jsonl
+from jsonl_writer import JsonlWriter
+from raw_partitions import RawPartitions, record_key, record_richness, record_month
+
+def append_records(path, records, tail=''):
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        f.write(tail)
+
+def scraped(start, count, **overrides):
+    return [dict({'name': f"游戏{index}", 'date': f"2025-{1 + index % 3:02d}-{1 + index % 28:02d}",
+                  'source': 'TapTap', 'status': '测试', 'rating': '7.5', 'description': '简介'}, **overrides)
+            for index in range(start, start + count)]
+
+def expected_records(records):
+    expected = {}
+    for record in records:
+        key = record_key(record)
+        if key not in expected or record_richness(record) >= record_richness(expected[key]):
+            expected[key] = record
+    return expected
+
+def read_all(archive):
+    return [record for path in archive.paths() for record in iter_jsonl(path)]
+
+def test_compact_keeps_richest_record_per_key(tmp_path):
+    path = str(tmp_path / 'taptap_games.jsonl')
+    written = scraped(0, 30) + scraped(0, 10, description='') + scraped(10, 10, rating='8.1') + \
+              [{'name': '无日期', 'source': 'TapTap'}, {'name': '只有状态日期', 'status_date': '2025-05-03', 'source': '16p'}]
+    append_records(path, written, tail='not json\n{"name": "未写完')
+
+    archive = RawPartitions(path)
+    result = archive.compact()
+    assert result['compacted'] and result['bad_lines'] == 1
+    assert result['records_read'] == len(written)
+    assert result['records_total'] == len(expected_records(written))
+    with open(path, 'rb') as f:
+        assert f.read() == '{"name": "未写完'.encode('utf-8') # 只保留未写完的半行
+
+    current = read_all(archive)
+    assert {record_key(record): record for record in current} == expected_records(written)
+    assert len(current) == len(expected_records(written))
+    manifest = archive.load_manifest()
+    assert manifest['generation'] == 1
+    assert set(manifest['partitions']) == {record_month(record) for record in written}
+
+def test_compact_is_repeatable_and_merges_new_records(tmp_path):
+    path = str(tmp_path / 'taptap_games.jsonl')
+    first = scraped(0, 20)
+    append_records(path, first)
+    archive = RawPartitions(path)
+    archive.compact()
+    assert not archive.compact()['compacted'] # 没有新内容
+    assert archive.load_manifest()['generation'] == 1
+
+    second = scraped(5, 20, rating='9.0', status='上线')
+    append_records(path, second)
+    result = archive.compact()
+    assert result['generation'] == 2
+    assert {record_key(record): record for record in read_all(archive)} == expected_records(first + second)
+
+def test_manifest_hashes_match_partition_files(tmp_path):
+    import hashlib
+    path = str(tmp_path / 'taptap_games.jsonl')
+    append_records(path, scraped(0, 40))
+    archive = RawPartitions(path)
+    archive.compact()
+    for _, partition_path, entry in archive.partitions():
+        with open(partition_path, 'rb') as f:
+            data = f.read()
+        assert hashlib.sha1(data).hexdigest() == entry['sha1']
+        assert len(data) == entry['bytes']
+    assert not os.path.exists(os.path.join(archive.directory, '.incoming'))
+
+def test_compact_refuses_while_writer_is_open(tmp_path):
+    path = str(tmp_path / 'taptap_games.jsonl')
+    append_records(path, scraped(0, 10))
+    archive = RawPartitions(path)
+    with JsonlWriter(path, flush_interval=0.01) as writer:
+        writer.write(scraped(10, 1)[0])
+        writer.flush()
+        with pytest.raises(LockBusyError):
+            archive.compact()
+        assert archive.load_manifest()['generation'] == 0 # 什么都没有修改
+        writer.write(scraped(11, 1)[0])
+    result = archive.compact() # 写入器关闭后可以压缩，期间写出的记录都在
+    assert result['records_read'] == 12
+    assert {record_key(record) for record in read_all(archive)} == {record_key(record) for record in scraped(0, 12)}
+
+def test_writer_waits_for_running_compaction(tmp_path):
+    path = str(tmp_path / 'taptap_games.jsonl')
+    append_records(path, scraped(0, 5))
+    compaction = FileLock(path) # 模拟正在进行的压缩
+    compaction.acquire(blocking=False)
+    opened = threading.Event()
+    writers = []
+    def open_writer():
+        writers.append(JsonlWriter(path))
+        opened.set()
+    thread = threading.Thread(target=open_writer)
+    thread.start()
+    assert not opened.wait(0.3) # 压缩期间不打开文件
+    assert RawPartitions(path)._compact()['compacted']
+    compaction.release()
+    assert opened.wait(5)
+    thread.join()
+    with writers[0] as writer:
+        writer.write(scraped(5, 1)[0]) # 追加到压缩后的新文件
+    archive = RawPartitions(path)
+    assert {record_key(record) for record in read_all(archive)} == {record_key(record) for record in scraped(0, 6)}
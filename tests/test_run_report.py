@@ -0,0 +1,35 @@
+# tests/test_run_report.py
+# 运行报告 (run_report.RunReport) 的 --profile 模式：工作线程中的每次调用都单独生成性能分析结果
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import run_report
+from run_report import RunReport
+
+def _work(count):
+    return sum(index * index for index in range(count))
+
+@pytest.mark.parametrize('per_thread', [True, False], ids=['per-thread', 'serialized'])
+def test_threaded_calls_each_get_a_profile(tmp_path, monkeypatch, per_thread):
+    if per_thread and not run_report.PER_THREAD_PROFILING:
+        pytest.skip('Python 3.12+ 不支持多个线程同时启用 cProfile')
+    monkeypatch.setattr(run_report, 'PER_THREAD_PROFILING', per_thread)
+    report = RunReport('collect_games', str(tmp_path), profile=True)
+    with report.stage('fetch') as stage:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(stage.call_profiled, label, _work, 20000) for label in ('TapTap', '16p')]
+            assert [future.result() for future in futures] == [_work(20000)] * 2
+        assert stage.profiler is not None # 各来源结束后阶段的 profiler 继续运行
+    assert stage.profiler is None
+    files = set(os.listdir(report.profile_dir))
+    for stem in ('01_fetch', '01_fetch.TapTap', '01_fetch.16p'):
+        assert {f"{stem}.prof", f"{stem}.txt"} <= files
+    with open(os.path.join(report.profile_dir, '01_fetch.16p.txt'), encoding='utf-8') as f:
+        assert '_work' in f.read()
+
+def test_call_profiled_without_profile_just_calls(tmp_path):
+    report = RunReport('collect_games', str(tmp_path))
+    with report.stage('fetch') as stage:
+        assert stage.call_profiled('TapTap', _work, 10) == _work(10)
+    assert report.profile_dir is None
@@ -0,0 +1,50 @@
+# tests/test_snapshot_history.py
+# 历史快照：按版本号 / 时间点解析 as_of，创建时间只从清单读取一次
+
+import json
+from datetime import datetime
+import snapshot_history
+from snapshot_history import SnapshotHistory
+
+HEADER = ['名称', '日期', '状态']
+
+def _save_version(history, created_at, rows):
+    manifest = history.save(HEADER, rows)
+    manifest['created_at'] = created_at # 固定创建时间，便于按日期解析
+    with open(history._manifest_path(manifest['version']), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest['version']
+
+def test_resolve_and_iter_rows(tmp_path):
+    history = SnapshotHistory(str(tmp_path))
+    first = _save_version(history, '2025-01-01T10:00:00', [['甲', '2025-01-01', '测试']])
+    second = _save_version(history, '2025-01-03T10:00:00', [['甲', '2025-01-01', '测试'], ['乙', '2025-01-02', '上线']])
+    reader = SnapshotHistory(str(tmp_path))
+    assert reader.resolve(str(first)) == first
+    assert reader.resolve('99') is None
+    assert reader.resolve('2025-01-02') == first
+    assert reader.resolve('2025-01-03') == second
+    assert reader.resolve('2024-12-31') is None
+    assert list(reader.iter_rows(second)) == [['甲', '2025-01-01', '测试'], ['乙', '2025-01-02', '上线']]
+
+def test_resolve_reads_each_manifest_once(tmp_path, monkeypatch):
+    history = SnapshotHistory(str(tmp_path))
+    for day in range(1, 6):
+        _save_version(history, f"2025-01-0{day}T10:00:00", [[f"游戏{day}", f"2025-01-0{day}", '测试']])
+    reader = SnapshotHistory(str(tmp_path))
+    loads = []
+    original = SnapshotHistory.load_manifest
+    monkeypatch.setattr(SnapshotHistory, 'load_manifest', lambda self, version: loads.append(version) or original(self, version))
+    assert reader.resolve('2025-01-01') == 1
+    assert sorted(loads) == [1, 2, 3, 4, 5]
+    loads.clear()
+    for _ in range(3):
+        assert reader.resolve('2025-01-01') == 1
+        assert reader.resolve('2025-01-04') == 4
+    assert loads == []
+    assert reader.created_at(2) == datetime(2025, 1, 2, 10)
+    # 新写出的版本在下次解析时读取一次清单
+    _save_version(history, '2025-01-06T10:00:00', [['游戏6', '2025-01-06', '测试']])
+    assert reader.resolve('2025-01-07') == 6
+    assert loads == [6]
+    assert snapshot_history.parse_as_of('3') == ('version', 3)
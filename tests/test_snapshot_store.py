@@ -0,0 +1,48 @@
+# tests/test_snapshot_store.py
+# 共享快照文件：历史版本写出一次后各进程直接映射
+
+import os
+import pytest
+import snapshot_store
+
+pytest.importorskip('pyarrow')
+
+class _MemorySnapshot:
+    """app.GameSnapshot 中 publish_snapshot 用到的部分"""
+
+    def __init__(self, version, games):
+        self.version = version
+        self.total_count = len(games)
+        self.valid_games = [snapshot_store.GameRecord(game) for game in games]
+        self.name_index = {}
+        for position, game in enumerate(games):
+            self.name_index.setdefault(game['name'].lower(), []).append(position)
+
+def _build(version):
+    return _MemorySnapshot(f"history-{version}", [
+        {'id': 0, 'name': f"甲{version}", 'date': '2025-01-01', 'status': '测试', 'is_featured': True},
+        {'id': 1, 'name': '乙', 'date': '2025-01-02', 'status': '上线', 'is_featured': False},
+    ])
+
+def test_history_snapshot_is_built_once_and_shared(tmp_path):
+    builds = []
+    def build(version):
+        builds.append(version)
+        return _build(version)
+
+    first = snapshot_store.open_history_snapshot(str(tmp_path), 5, build)
+    second = snapshot_store.open_history_snapshot(str(tmp_path), 5, build) # 另一个 worker：只映射文件
+    assert builds == [5]
+    assert first.path == second.path
+    assert os.path.dirname(first.path) == os.path.join(str(tmp_path), snapshot_store.HISTORY_SUBDIR)
+    assert second.version == 'history-5' and len(second) == 2
+    assert second.get_records([0])[0]['name'] == '甲5'
+    assert second.lookup_name('乙') == [1]
+    assert not os.path.exists(os.path.join(str(tmp_path), snapshot_store.CURRENT_POINTER)) # 不影响当前快照
+
+def test_history_snapshot_files_are_pruned(tmp_path):
+    for version in range(1, snapshot_store.KEEP_HISTORY_VERSIONS + 3):
+        snapshot = snapshot_store.open_history_snapshot(str(tmp_path), version, _build)
+        os.utime(snapshot.path, (version, version)) # 按写出顺序排列修改时间
+    history_dir = os.path.join(str(tmp_path), snapshot_store.HISTORY_SUBDIR)
+    assert len(os.listdir(history_dir)) == snapshot_store.KEEP_HISTORY_VERSIONS
@@ -0,0 +1,106 @@
+# tests/test_standardize.py
+# standardize_game_data (按列批量处理) 与逐条处理的参照实现在仓库自带数据上的等价性测试
+#
+# 输入为 data/ 下爬虫输出的 JSONL 记录 (原样及制造的变体：缺字段、None、已有 cleaned_name、
+# 各种评分写法、旧字段名 game_type)，分别使用默认列映射和带附加字段的自定义列映射。
+# 比较内容及每条记录的键顺序 (键顺序决定导出的列顺序)。
+
+import os
+import glob
+import json
+from datetime import datetime
+import pytest
+from conftest import DATA_DIR
+
+RECORD_VARIANTS = [
+    {}, {'cleaned_name': '已清理名称'}, {'name': None}, {'rating': 8}, {'rating': '评分 9.2'}, {'rating': None},
+    {'status': None}, {'status': '  '}, {'date': None}, {'game_type': '角色扮演'}, {'game_type_version': '', 'game_type': '策略'},
+    {'is_featured': True, 'version_checked': True, 'manual_checked': '是'}, {'extra_field': 1},
+]
+DROPPABLE_FIELDS = ['name', 'date', 'status', 'rating', 'publisher', 'source', 'icon_url', 'is_featured']
+
+def reference_standardize(games_list, excel_columns_map, cg):
+    """逐条构建字典的参照实现 (优化前的 standardize_game_data)"""
+    standardized_games = []
+    internal_field_names = list(excel_columns_map.values())
+    for game in games_list:
+        std_game = {}
+        cleaned_name_val = game.get("cleaned_name") or cg.clean_game_name(game.get("name", "未知名称"))
+        std_game["name"] = cleaned_name_val
+        std_game["cleaned_name"] = cleaned_name_val
+        std_game["date"] = game.get("date", datetime.now().strftime("%Y-%m-%d"))
+        std_game["status"] = cg.standardize_status(game.get("status", "未知状态"))
+        std_game["platform"] = game.get("platform", "未知平台")
+        std_game["category"] = game.get("category", "未知分类")
+        std_game["rating"] = cg.extract_rating_value(game.get("rating", "暂无评分"))
+        std_game["publisher"] = game.get("publisher", "未知厂商")
+        std_game["source"] = game.get("source", "未知来源")
+        std_game["link"] = game.get("link", "")
+        std_game["icon_url"] = game.get("icon_url", "")
+        std_game["description"] = game.get("description", "")
+        std_game["is_featured"] = game.get("is_featured", False)
+        std_game["version_checked"] = game.get("version_checked", False)
+        std_game["nppa_name"] = game.get("nppa_name", "")
+        std_game["approval_num"] = game.get("approval_num", "")
+        std_game["publication_num"] = game.get("publication_num", "")
+        std_game["approval_date"] = game.get("approval_date", "")
+        std_game["publisher_unit"] = game.get("publisher_unit", "")
+        std_game["operator_unit"] = game.get("operator_unit", "")
+        std_game["game_type_version"] = game.get("game_type_version") or game.get("game_type", "")
+        std_game["declaration_category"] = game.get("declaration_category", "")
+        std_game["multiple_results"] = game.get("multiple_results", "")
+        std_game["manual_checked"] = game.get("manual_checked", "")
+        for field in internal_field_names:
+            if field not in std_game:
+                if field == "rating": std_game[field] = 0.0
+                elif field in ["is_featured", "version_checked"]: std_game[field] = False
+                else: std_game[field] = ""
+        standardized_games.append(std_game)
+    return standardized_games
+
+def load_shipped_records():
+    records = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, '*_games.jsonl'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass
+    return records
+
+def with_variants(records):
+    """每条记录依次套用一种变体，每隔 7 条再删掉一个字段"""
+    variants = []
+    for index, record in enumerate(records):
+        variant = dict(record, **RECORD_VARIANTS[index % len(RECORD_VARIANTS)])
+        if index % 7 == 0:
+            variant.pop(DROPPABLE_FIELDS[index % len(DROPPABLE_FIELDS)], None)
+        variants.append(variant)
+    return variants
+
+@pytest.fixture(scope='module')
+def shipped_records():
+    records = load_shipped_records()
+    assert records, "data/ 下没有可用的 JSONL 记录"
+    return records
+
+@pytest.mark.parametrize('custom_columns', [False, True], ids=['default_columns', 'custom_columns'])
+@pytest.mark.parametrize('variants', [False, True], ids=['shipped', 'variants'])
+def test_columnar_output_matches_reference(collect_games, shipped_records, custom_columns, variants):
+    cg = collect_games
+    excel_columns_map = cg.get_excel_columns()
+    if custom_columns:
+        excel_columns_map = dict(excel_columns_map, 额外列='extra_field', 标记列='is_featured')
+    records = with_variants(shipped_records) if variants else shipped_records
+
+    expected = reference_standardize(records, excel_columns_map, cg)
+    actual = cg.standardize_game_data(records, excel_columns_map)
+    assert [record.to_dict() for record in actual] == expected
+    assert [list(record.keys()) for record in actual] == [list(record) for record in expected]
+
+def test_input_records_are_not_modified(collect_games, shipped_records):
+    records = with_variants(shipped_records)
+    before = json.dumps(records, ensure_ascii=False, sort_keys=True)
+    collect_games.standardize_game_data(records, collect_games.get_excel_columns())
+    assert json.dumps(records, ensure_ascii=False, sort_keys=True) == before
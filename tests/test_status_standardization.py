@@ -0,0 +1,19 @@
+# tests/test_status_standardization.py
+# 状态标准化 (status_standardization.StatusStandardizer) 的 golden 测试
+#
+# fixtures/statuses.json 中的期望输出由优化前按优先级逐组扫描关键词的实现生成，
+# 覆盖样本数据中的全部状态、多组关键词同时命中、大小写、空白、None 和非字符串取值。
+
+from conftest import load_fixture
+from status_standardization import StatusStandardizer
+
+FIXTURE = load_fixture('statuses.json')
+STATUSES = [status for status, _ in FIXTURE['cases']]
+EXPECTED = [standardized for _, standardized in FIXTURE['cases']]
+
+def test_standardize_many_matches_golden():
+    assert StatusStandardizer(FIXTURE['config']).standardize_many(STATUSES) == EXPECTED
+
+def test_standardize_matches_golden():
+    standardizer = StatusStandardizer(FIXTURE['config'])
+    assert [standardizer.standardize(status) for status in STATUSES] == EXPECTED